@@ -1,18 +1,19 @@
 # rpi_counter_fastapi-dev2/app/api/v1/camera.py
 
 import os
-import io
-import zipfile
 from datetime import datetime as dt_datetime, date
-from typing import Optional
+from typing import List, Optional
 from fastapi import APIRouter, Depends, Request, Query, HTTPException, Path, Body
 from fastapi.responses import StreamingResponse
 import asyncio
 import redis.asyncio as redis
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import json
 
 from app.core.camera_manager import AsyncCameraManager
+from app.services.thumbnail_service import AsyncThumbnailService, thumbnail_path
+from app.services.capture_catalog import AsyncCaptureCatalog, PageCursor
+from app.utils.zip_stream import stream_zip
 from config import settings, ACTIVE_CAMERA_IDS
 from pathlib import Path
 
@@ -25,37 +26,51 @@ def get_camera_manager(request: Request) -> AsyncCameraManager:
 def get_redis_client(request: Request) -> redis.Redis:
     return request.app.state.redis_client
 
+def get_thumbnail_service(request: Request) -> Optional[AsyncThumbnailService]:
+    return getattr(request.app.state, "thumbnail_service", None)
+
+def get_capture_catalog(request: Request) -> Optional[AsyncCaptureCatalog]:
+    return getattr(request.app.state, "capture_catalog", None)
+
 class CameraPreviewSettings(BaseModel):
     exposure: Optional[int] = None
     gain: Optional[int] = None
     white_balance_temp: Optional[int] = None
     brightness: Optional[int] = None
     autofocus: Optional[bool] = None
+    # [x, y, width, height] as fractions of the frame; [0, 0, 1, 1] restores the full frame.
+    roi: Optional[List[float]] = Field(None, min_length=4, max_length=4)
 
 @router.get("/status/{camera_id}")
 async def get_camera_status(camera_id: str, camera: AsyncCameraManager = Depends(get_camera_manager)):
     status = camera.get_health_status(camera_id)
     return {"camera_id": camera_id, "status": status.value}
 
+@router.get("/telemetry")
+async def get_camera_telemetry(camera: AsyncCameraManager = Depends(get_camera_manager)):
+    """Per-camera pipeline statistics: FPS, stage timings, transport latency and drop counters."""
+    return await camera.get_telemetry()
+
 @router.get("/stream/{camera_id}")
-async def get_camera_stream(camera_id: str, camera: AsyncCameraManager = Depends(get_camera_manager)):
-    """Provides the live MJPEG stream for a given camera."""
-    async def frame_generator():
-        frame_queue = await camera.start_stream(camera_id)
-        if not frame_queue:
-            print(f"API ERROR: start_stream() for '{camera_id}' returned None. Cannot start stream.")
-            return
+async def get_camera_stream(
+    camera_id: str,
+    width: Optional[int] = Query(None, ge=1, le=4096, description="Target frame width in pixels; omit for full resolution."),
+    max_fps: Optional[float] = Query(None, gt=0, le=120, description="Per-client frame rate cap; omit for the camera rate."),
+    camera: AsyncCameraManager = Depends(get_camera_manager)
+):
+    """Provides the live MJPEG stream for a given camera, optionally downscaled and rate-limited."""
+    if not camera.has_camera(camera_id):
+        print(f"API ERROR: Camera '{camera_id}' is not active. Cannot start stream.")
+        raise HTTPException(status_code=404, detail=f"Camera '{camera_id}' is not active or does not exist.")
 
+    async def frame_generator():
         print(f"API INFO: Client connected to stream for '{camera_id}'. Waiting for the first frame...")
+        first_frame = True
         try:
-            # Wait for the first frame with a timeout
-            first_frame = await asyncio.wait_for(frame_queue.get(), timeout=7.0)
-            print(f"API INFO: First frame received for '{camera_id}'. Starting stream.")
-            yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + first_frame + b'\r\n')
-
-            # Continue with the rest of the frames
-            while True:
-                frame_bytes = await frame_queue.get()
+            async for frame_bytes in camera.stream_frames(camera_id, width=width, max_fps=max_fps, first_frame_timeout=7.0):
+                if first_frame:
+                    print(f"API INFO: First frame received for '{camera_id}'. Starting stream.")
+                    first_frame = False
                 yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
         except asyncio.TimeoutError:
             print(f"API WARNING: Timed out after 7s waiting for the first frame from camera '{camera_id}'. Closing stream. Is the camera service running and publishing to Redis?")
@@ -63,9 +78,6 @@ async def get_camera_stream(camera_id: str, camera: AsyncCameraManager = Depends
             print(f"API INFO: Client disconnected from '{camera_id}' stream.")
         except Exception as e:
             print(f"API ERROR: An unexpected error occurred in the frame generator for '{camera_id}': {e}")
-        finally:
-            print(f"API INFO: Cleaning up stream resources for '{camera_id}'.")
-            await camera.stop_stream(camera_id, frame_queue)
 
     return StreamingResponse(frame_generator(), media_type="multipart/x-mixed-replace; boundary=frame")
     
@@ -89,19 +101,46 @@ async def apply_preview_settings(
     
     return {"message": f"Preview settings applied to camera '{camera_id}'.", "settings": command["settings"]}
 
+def _thumbnail_url(image_file: Path, web_path: str, thumbnails: Optional[AsyncThumbnailService]) -> str:
+    """Best available thumbnail URL for a capture; queues generation and falls back to the full image if missing."""
+    if thumbnails and thumbnails.webp_enabled and thumbnail_path(image_file, ".webp").exists():
+        return str(thumbnail_path(Path(web_path), ".webp"))
+    if thumbnail_path(image_file).exists():
+        return str(thumbnail_path(Path(web_path)))
+    if thumbnails:
+        thumbnails.enqueue(image_file)
+    return web_path
+
 @router.get("/captures/{camera_id}")
-async def get_captured_images(camera_id: str, page: int = Query(1, ge=1), page_size: int = Query(8, ge=1, le=100)):
+async def get_captured_images(
+    camera_id: str, page: int = Query(1, ge=1), page_size: int = Query(8, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; takes precedence over page."),
+    thumbnails: Optional[AsyncThumbnailService] = Depends(get_thumbnail_service),
+    catalog: Optional[AsyncCaptureCatalog] = Depends(get_capture_catalog)
+):
     captures_dir = Path(settings.CAMERA_CAPTURES_DIR) / camera_id
     if not captures_dir.exists():
-        return {"images": [], "has_more": False}
+        return {"images": [], "thumbnails": [], "has_more": False, "next_cursor": None}
     try:
-        image_files = sorted([p for p in captures_dir.glob("*.jpg")], key=lambda p: p.stat().st_mtime, reverse=True)
-        start_index = (page - 1) * page_size
-        end_index = start_index + page_size
-        paginated_files = image_files[start_index:end_index]
-        has_more = len(image_files) > end_index
+        after = PageCursor.decode(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    try:
+        next_cursor = None
+        if catalog and catalog.covers(camera_id) and (after is not None or page == 1):
+            # Indexed keyset lookup: only this page's rows are read, however deep the page.
+            records, has_more, next_page = await catalog.list_page(camera_id, page_size, after)
+            paginated_files = [captures_dir / r.filename for r in records]
+            next_cursor = next_page.encode() if next_page else None
+        else:
+            image_files = sorted([p for p in captures_dir.glob("*.jpg")], key=lambda p: p.stat().st_mtime, reverse=True)
+            start_index = (page - 1) * page_size
+            end_index = start_index + page_size
+            paginated_files = image_files[start_index:end_index]
+            has_more = len(image_files) > end_index
         web_paths = [f"/captures/{camera_id}/{p.name}" for p in paginated_files]
-        return {"images": web_paths, "has_more": has_more}
+        thumbnail_urls = [_thumbnail_url(p, w, thumbnails) for p, w in zip(paginated_files, web_paths)]
+        return {"images": web_paths, "thumbnails": thumbnail_urls, "has_more": has_more, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -110,33 +149,35 @@ class ZipRequestPayload(BaseModel):
     start_date: date
     end_date: date
 
-def create_zip_in_memory_sync(camera_id: str, start_date: date, end_date: date) -> io.BytesIO:
-    captures_dir = PROJECT_ROOT / settings.CAMERA_CAPTURES_DIR / camera_id
-    if not captures_dir.is_dir():
-        return None
+def _find_files_in_range_sync(captures_dir: Path, start_date: date, end_date: date) -> List[Path]:
+    """Directory scan used when the capture catalogue is not available."""
     start_ts = dt_datetime.combine(start_date, dt_datetime.min.time()).timestamp()
     end_ts = dt_datetime.combine(end_date, dt_datetime.max.time()).timestamp()
-    files_to_zip = [f for f in captures_dir.glob("*.jpg") if start_ts <= f.stat().st_mtime <= end_ts]
-    zip_buffer = io.BytesIO()
-    if not files_to_zip:
-        return zip_buffer
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for file_path in files_to_zip:
-            zipf.write(file_path, arcname=file_path.name)
-    zip_buffer.seek(0)
-    return zip_buffer
+    return [f for f in captures_dir.glob("*.jpg") if start_ts <= f.stat().st_mtime <= end_ts]
 
 @router.post("/captures/download-zip")
-async def download_captures_as_zip(payload: ZipRequestPayload = Body(...)):
-    zip_buffer = await asyncio.to_thread(
-        create_zip_in_memory_sync, payload.camera_id, payload.start_date, payload.end_date
-    )
-    if zip_buffer is None:
+async def download_captures_as_zip(
+    payload: ZipRequestPayload = Body(...),
+    catalog: Optional[AsyncCaptureCatalog] = Depends(get_capture_catalog)
+):
+    captures_dir = PROJECT_ROOT / settings.CAMERA_CAPTURES_DIR / payload.camera_id
+    if not captures_dir.is_dir():
         raise HTTPException(status_code=404, detail=f"Capture directory for camera '{payload.camera_id}' not found.")
-    if not zip_buffer.getbuffer().nbytes > 0:
+    if catalog and catalog.covers(payload.camera_id):
+        records = await catalog.list_range(
+            payload.camera_id,
+            dt_datetime.combine(payload.start_date, dt_datetime.min.time()),
+            dt_datetime.combine(payload.end_date, dt_datetime.max.time())
+        )
+        files_to_zip = [captures_dir / r.filename for r in records]
+    else:
+        files_to_zip = await asyncio.to_thread(_find_files_in_range_sync, captures_dir, payload.start_date, payload.end_date)
+    if not files_to_zip:
         raise HTTPException(status_code=404, detail="No images found in the specified date range.")
+    # The archive is produced while it is sent (ZIP_STORED, constant memory);
+    # StreamingResponse runs the blocking generator in the threadpool.
     return StreamingResponse(
-        zip_buffer,
+        stream_zip((path, None) for path in files_to_zip),
         media_type="application/zip",
         headers={"Content-Disposition": f"attachment; filename=captures_{payload.camera_id}_{payload.start_date}_to_{payload.end_date}.zip"}
     )
@@ -3,31 +3,36 @@ Debug endpoints for testing purposes.
 This router should only be mounted in a 'development' environment.
 """
 from fastapi import APIRouter, Depends, Request, HTTPException, Body
-from app.services.detection_service import AsyncDetectionService
-from app.core.sensor_events import SensorEvent, SensorState
+from app.core.sensor_dispatcher import AsyncSensorEventDispatcher
+from app.core.sensor_events import SensorEvent, SensorState, channel_role_map
+from config import settings
 
 router = APIRouter()
 
-def get_detection_service(request: Request) -> AsyncDetectionService:
-    return request.app.state.detection_service
+def get_sensor_dispatcher(request: Request) -> AsyncSensorEventDispatcher:
+    return request.app.state.sensor_dispatcher
 
 @router.post("/sensor-event")
 async def trigger_sensor_event(
-    service: AsyncDetectionService = Depends(get_detection_service),
+    dispatcher: AsyncSensorEventDispatcher = Depends(get_sensor_dispatcher),
     sensor_id: int = Body(..., embed=True),
     new_state: SensorState = Body(..., embed=True)
 ):
     """
     Manually triggers a sensor event to test the detection state machine.
     This provides a 'backdoor' for end-to-end testing without physical hardware.
-    
+    The event gets the role wired to `sensor_id` (SENSORS_*_CHANNEL) and is queued
+    behind any real sensor events, exactly as if the poller had seen the edge.
+
     Example Body:
     {
         "sensor_id": 1,
         "new_state": "triggered"
     }
     """
-    print(f"DEBUG: Manually triggering event: Sensor {sensor_id} -> {new_state.name}")
-    event = SensorEvent(sensor_id=sensor_id, new_state=new_state)
-    await service.handle_sensor_event(event)
-    return {"message": "Debug sensor event triggered successfully.", "new_state": service._state.name}
+    role = channel_role_map(settings.SENSORS).get(sensor_id)
+    if role is None:
+        raise HTTPException(status_code=400, detail=f"Input channel {sensor_id} has no sensor role assigned.")
+    print(f"DEBUG: Manually triggering event: Sensor {sensor_id} ({role.value}) -> {new_state.name}")
+    dispatcher.dispatch(SensorEvent(sensor_id=sensor_id, new_state=new_state, role=role))
+    return {"message": "Debug sensor event queued successfully.", "role": role.value, "queue_depth": dispatcher.snapshot()["queue_depth"]}
@@ -34,14 +34,16 @@ async def toggle_output_by_name(
     if address is None:
         raise HTTPException(status_code=404, detail=f"Output name '{output_name_str}' not found in configuration.")
 
-    all_coils = await io.read_coils()
-    if all_coils is None:
-        raise HTTPException(status_code=503, detail="Could not read current coil states from Modbus device.")
-
-    if address >= len(all_coils):
-         raise HTTPException(status_code=500, detail=f"Address {address} for '{output_name_str}' is out of bounds for the reported coils.")
-
-    current_state = all_coils[address]
+    # The controller's shadow knows every coil it has written; only read the
+    # device if nothing has been read or written yet.
+    current_state = io.get_coil_state(address)
+    if current_state is None:
+        all_coils = await io.read_coils()
+        if all_coils is None:
+            raise HTTPException(status_code=503, detail="Could not read current coil states from Modbus device.")
+        if address >= len(all_coils):
+            raise HTTPException(status_code=500, detail=f"Address {address} for '{output_name_str}' is out of bounds for the reported coils.")
+        current_state = all_coils[address]
     
     # --- THIS IS THE FIX: Invert logic for NC-wired lights ---
     # For the camera lights, the logic is inverted. The UI sends a command to achieve a logical state (e.g., "turn ON").
@@ -14,7 +14,7 @@ from sqlalchemy.orm import selectinload
 from app.models import get_async_session, CameraProfile, ObjectProfile, Product
 from app.schemas.profiles import (
     CameraProfileCreate, CameraProfileUpdate, CameraProfileOut,
-    ObjectProfileCreate, ObjectProfileUpdate, ObjectProfileOut
+    ObjectProfileCreate, ObjectProfileUpdate, ObjectProfileOut, roi_error
 )
 
 router = APIRouter()
@@ -67,6 +67,11 @@ async def update_camera_profile(
         raise HTTPException(status_code=404, detail="Camera profile not found")
     
     update_data = profile_in.model_dump(exclude_unset=True)
+    # A partial update may touch only some ROI fields; validate the result, not the request.
+    roi = [update_data.get(k, getattr(profile, k)) for k in ("roi_x", "roi_y", "roi_width", "roi_height")]
+    error = roi_error(*roi)
+    if error:
+        raise HTTPException(status_code=422, detail=error)
     for key, value in update_data.items():
         setattr(profile, key, value)
         
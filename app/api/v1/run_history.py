@@ -1,7 +1,5 @@
 # rpi_counter_fastapi-dev2/app/api/v1/run_history.py
 
-import io
-import zipfile
 from pathlib import Path
 from typing import List, Optional
 from datetime import datetime
@@ -15,6 +13,8 @@ import asyncio
 
 from app.models import get_async_session, RunLog, DetectionEventLog
 from app.schemas.run_log import RunLogOut, DetectionEventLogOut
+from app.services.retention_service import COLD_WEB_PREFIX
+from app.utils.zip_stream import stream_zip
 from config import settings
 
 router = APIRouter()
@@ -98,30 +98,25 @@ async def get_run_detection_events(
     )
     return result.scalars().all()
 
-def create_zip_from_paths_sync(image_web_paths: List[str]) -> io.BytesIO:
-    """Synchronously creates a ZIP archive from a list of web paths."""
+def resolve_image_paths_sync(image_web_paths: List[str]) -> List[Path]:
+    """Converts web paths to the capture files that still exist on disk."""
     captures_base_dir = PROJECT_ROOT / settings.CAMERA_CAPTURES_DIR
+    cold_prefix = f"{COLD_WEB_PREFIX}/"
     
     files_to_zip = []
     for web_path in image_web_paths:
         if not web_path: continue
-        # Convert web path (/captures/cam_id/file.jpg) to a full system path
-        relative_path = web_path.lstrip('/').lstrip('captures').lstrip('/')
-        full_path = captures_base_dir / relative_path
+        if web_path.startswith(cold_prefix):
+            # Moved to cold storage by the retention service (/cold/cam_id/file.jpg)
+            if not settings.RETENTION_COLD_DIR: continue
+            full_path = PROJECT_ROOT / settings.RETENTION_COLD_DIR / web_path[len(cold_prefix):]
+        else:
+            # Convert web path (/captures/cam_id/file.jpg) to a full system path
+            relative_path = web_path.lstrip('/').lstrip('captures').lstrip('/')
+            full_path = captures_base_dir / relative_path
         if full_path.exists():
             files_to_zip.append(full_path)
-
-    zip_buffer = io.BytesIO()
-    if not files_to_zip:
-        return zip_buffer
-
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for file_path in files_to_zip:
-            # Add file to zip using its name, not the full path
-            zipf.write(file_path, arcname=file_path.name)
-    
-    zip_buffer.seek(0)
-    return zip_buffer
+    return files_to_zip
 
 @router.get("/{run_id}/download-images")
 async def download_run_images_zip(
@@ -143,15 +138,17 @@ async def download_run_images_zip(
     if not any(image_paths):
         raise HTTPException(status_code=404, detail="No images were logged for this run.")
     
-    # Run the blocking ZIP creation in a separate thread to avoid blocking the server
-    zip_buffer = await asyncio.to_thread(create_zip_from_paths_sync, image_paths)
+    # Check the files in a separate thread to avoid blocking the server
+    files_to_zip = await asyncio.to_thread(resolve_image_paths_sync, image_paths)
     
-    if not zip_buffer.getbuffer().nbytes > 0:
+    if not files_to_zip:
          raise HTTPException(status_code=404, detail="Images for this run were logged, but the files could not be found on disk.")
 
     filename = f"run_{run_id}_{run_log.batch_code}_images.zip"
+    # Streamed while it is built (ZIP_STORED, constant memory); the blocking
+    # generator runs in StreamingResponse's threadpool.
     return StreamingResponse(
-        zip_buffer,
+        stream_zip((path, None) for path in files_to_zip),
         media_type="application/zip",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
\ No newline at end of file
@@ -28,6 +28,11 @@ async def get_system_status(service: AsyncSystemService = Depends(get_system_ser
     """Get overall system health status."""
     return await service.get_system_status()
 
+@router.get("/modbus")
+async def get_modbus_metrics(service: AsyncSystemService = Depends(get_system_service)):
+    """Modbus bus statistics: latency histograms per function code, errors, timeouts and the achieved poll rate."""
+    return service.get_modbus_metrics()
+
 @router.post("/reset-all", status_code=200)
 async def reset_all_state(service: AsyncSystemService = Depends(get_system_service)):
     """Resets all counters and stops all hardware. A full system state reset."""
@@ -1,14 +1,25 @@
 import asyncio
+import json
 import time
 import redis.asyncio as redis
+from collections import deque
 from enum import Enum
-from typing import Optional, Dict, Set, List, Tuple
-import cv2
-import numpy as np
+from typing import Optional, Dict, Deque, List, NamedTuple, Tuple, AsyncIterator, Any, Callable
 from pathlib import Path
 
 from redis import exceptions as redis_exceptions
+from app.core.capture_writer import AsyncFileWriter, is_jpeg
+from app.utils.jpeg_codec import get_jpeg_codec
+from app.utils.image_quality import select_sharpest
+from app.core.frame_transport import (
+    SharedFrameRing, frame_channel, shm_notify_channel, telemetry_key, unpack_frame,
+    publish_policy_key, command_channel, PUBLISH_POLICY_FULL, PUBLISH_POLICY_IDLE
+)
+from app.core.stream_fanout import StreamVariantCache, normalize_width
 from app.services.notification_service import AsyncNotificationService
+from app.services.thumbnail_service import AsyncThumbnailService
+from app.services.capture_catalog import AsyncCaptureCatalog
+from app.utils.metrics import Counters, RollingStats
 from config import settings # Import settings to get the base directory
 
 PROJECT_ROOT = Path(__file__).parent.parent.parent
@@ -18,16 +29,58 @@ class CameraHealthStatus(str, Enum):
     DISCONNECTED = "disconnected"
     ERROR = "error"
 
+class CameraFrame(NamedTuple):
+    # Capture time as time.monotonic() in the camera service (same clock as SensorEvent.timestamp).
+    timestamp: float
+    data: bytes
+
+class CameraTelemetry:
+    """Receive-side statistics for one camera, kept by AsyncCameraManager."""
+    def __init__(self):
+        self.receive_interval_ms = RollingStats()
+        # Capture (camera service) to receive (main app), only for timestamped frames.
+        self.transport_latency_ms = RollingStats()
+        # How long capture_and_save_image waited for its frame.
+        self.capture_wait_ms = RollingStats()
+        # Time spent scoring burst frames for sharpness.
+        self.burst_select_ms = RollingStats()
+        self.counters = Counters(
+            "frames_received", "untimestamped_frames", "frame_queue_drops", "ring_read_misses",
+            "stream_frames_skipped", "capture_timeouts", "disconnects", "burst_captures"
+        )
+        self.last_frame_at: Optional[float] = None
+
+    def receive_fps(self) -> Optional[float]:
+        mean = self.receive_interval_ms.snapshot()["mean"]
+        return round(1000.0 / mean, 2) if mean else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "receive_fps": self.receive_fps(),
+            "seconds_since_last_frame": round(time.monotonic() - self.last_frame_at, 2) if self.last_frame_at else None,
+            "counters": self.counters.snapshot(),
+            "receive_interval_ms": self.receive_interval_ms.snapshot(),
+            "transport_latency_ms": self.transport_latency_ms.snapshot(),
+            "capture_wait_ms": self.capture_wait_ms.snapshot(),
+            "burst_select_ms": self.burst_select_ms.snapshot(),
+        }
+
 class AsyncCameraManager:
     def __init__(
         self,
         notification_service: AsyncNotificationService,
         captures_dir: str,
         redis_client: redis.Redis,
-        active_camera_ids: List[str]
+        active_camera_ids: List[str],
+        thumbnail_service: Optional[AsyncThumbnailService] = None,
+        capture_catalog: Optional[AsyncCaptureCatalog] = None,
+        line_active_provider: Optional[Callable[[], bool]] = None
     ):
         self.redis_client = redis_client
         self._notification_service = notification_service
+        self._thumbnail_service = thumbnail_service
+        self._capture_catalog = capture_catalog
+        self._line_active_provider = line_active_provider
         # --- FIX: Store the absolute base path for captures ---
         self._captures_dir_base = PROJECT_ROOT / captures_dir
         self._active_camera_ids = active_camera_ids
@@ -35,48 +88,126 @@ class AsyncCameraManager:
         self._listener_tasks: Dict[str, asyncio.Task] = {}
         self._health_status: Dict[str, CameraHealthStatus] = {cam_id: CameraHealthStatus.DISCONNECTED for cam_id in self._active_camera_ids}
         self._frame_queues: Dict[str, asyncio.Queue] = {cam_id: asyncio.Queue(maxsize=5) for cam_id in self._active_camera_ids}
-        self._stream_listeners: Dict[str, Set[asyncio.Queue]] = {cam_id: set() for cam_id in self._active_camera_ids}
+        # Live stream clients pull the newest frame at their own pace; see stream_frames().
+        self._frame_seq: Dict[str, int] = {cam_id: 0 for cam_id in self._active_camera_ids}
+        self._stream_client_count: Dict[str, int] = {cam_id: 0 for cam_id in self._active_camera_ids}
+        self._telemetry: Dict[str, CameraTelemetry] = {cam_id: CameraTelemetry() for cam_id in self._active_camera_ids}
         self._last_event_image_paths: Dict[str, Optional[str]] = {cam_id: None for cam_id in self._active_camera_ids}
-        self._stream_lock = asyncio.Lock()
+        self._frame_rings: Dict[str, Optional[SharedFrameRing]] = {cam_id: None for cam_id in self._active_camera_ids}
+        self._ring_read_failures: Dict[str, int] = {cam_id: 0 for cam_id in self._active_camera_ids}
+        # Short, time-ordered history of recent frames per camera for trigger-aligned capture.
+        self._frame_history: Dict[str, Deque[CameraFrame]] = {cam_id: deque(maxlen=settings.CAMERA_FRAME_HISTORY_SIZE) for cam_id in self._active_camera_ids}
+        self._frame_arrived: Dict[str, asyncio.Condition] = {cam_id: asyncio.Condition() for cam_id in self._active_camera_ids}
+        self._save_mode = settings.CAMERA_SAVE_MODE
+        self._codec = codec = get_jpeg_codec(settings.JPEG_CODEC)
+        self._file_writer = AsyncFileWriter(
+            max_workers=settings.CAMERA_WRITER_THREADS,
+            codec=codec, reencode_quality=settings.JPEG_QUALITY
+        )
+        self._stream_variants: Dict[str, StreamVariantCache] = {
+            cam_id: StreamVariantCache(codec, settings.CAMERA_STREAM_JPEG_QUALITY) for cam_id in self._active_camera_ids
+        }
+        # Publish policy last sent to each camera service; see _publish_policy_worker().
+        self._publish_policy: Dict[str, str] = {cam_id: PUBLISH_POLICY_FULL for cam_id in self._active_camera_ids}
+        self._publish_policy_changed = asyncio.Event()
+        self._publish_policy_task: Optional[asyncio.Task] = None
 
     def start(self):
         for cam_id in self._active_camera_ids:
             if cam_id not in self._listener_tasks or self._listener_tasks[cam_id].done():
                 self._listener_tasks[cam_id] = asyncio.create_task(self._redis_listener(cam_id))
+        if self._publish_policy_task is None or self._publish_policy_task.done():
+            self._publish_policy_task = asyncio.create_task(self._publish_policy_worker())
 
     async def stop(self):
-        for task in self._listener_tasks.values():
+        for task in [*self._listener_tasks.values(), self._publish_policy_task]:
             if task and not task.done():
                 task.cancel()
+        for cam_id, ring in self._frame_rings.items():
+            if ring:
+                ring.close()
+                self._frame_rings[cam_id] = None
+        self._file_writer.shutdown()
+
+    def _read_shared_frame(self, cam_id: str, seq: int) -> Optional[CameraFrame]:
+        """Reads a frame announced on the shared-memory notify channel."""
+        ring = self._frame_rings.get(cam_id)
+        if ring is None:
+            try:
+                ring = SharedFrameRing.attach(cam_id)
+            except (FileNotFoundError, ValueError) as e:
+                print(f"[Camera Manager] Cannot attach to shared-memory ring for '{cam_id}': {e}")
+                return None
+            self._frame_rings[cam_id] = ring
+            print(f"[Camera Manager] Attached to shared-memory frame ring for '{cam_id}'.")
+        # One copy out of the slot: the frame is kept in the trigger history far
+        # longer than the ring takes to recycle the slot.
+        result = ring.read(seq)
+        if result is None:
+            self._telemetry[cam_id].counters.inc("ring_read_misses")
+            # An occasional miss means the writer lapped us. A run of misses means the
+            # camera service was restarted with a fresh segment, so reattach.
+            self._ring_read_failures[cam_id] += 1
+            if self._ring_read_failures[cam_id] >= ring.slot_count:
+                ring.close()
+                self._frame_rings[cam_id] = None
+                self._ring_read_failures[cam_id] = 0
+            return None
+        self._ring_read_failures[cam_id] = 0
+        return CameraFrame(timestamp=result[1], data=result[2])
 
     async def _redis_listener(self, cam_id: str):
-        channel_name = f"camera:frames:{cam_id}"
+        # The camera service either publishes full frames on the frame channel or,
+        # in shared-memory mode, only sequence numbers on the notify channel.
+        # Subscribing to both lets each service pick its transport independently.
+        channel_name = frame_channel(cam_id)
+        notify_channel_name = shm_notify_channel(cam_id)
+        notify_channel_bytes = notify_channel_name.encode()
         pubsub = self.redis_client.pubsub()
+        telemetry = self._telemetry[cam_id]
         while True:
             try:
-                await pubsub.subscribe(channel_name)
-                print(f"[Camera Manager] Subscribed to Redis channel: {channel_name}")
+                await pubsub.subscribe(channel_name, notify_channel_name)
+                print(f"[Camera Manager] Subscribed to Redis channels: {channel_name}, {notify_channel_name}")
                 while True:
                     message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=5.0)
                     if message:
+                        if message['channel'] in (notify_channel_bytes, notify_channel_name):
+                            frame = self._read_shared_frame(cam_id, int(message['data']))
+                            if frame is None:
+                                continue
+                        else:
+                            captured_at, jpeg_bytes = unpack_frame(message['data'])
+                            if captured_at is None:
+                                telemetry.counters.inc("untimestamped_frames")
+                            # Frames from services without timestamps are stamped on arrival.
+                            frame = CameraFrame(timestamp=captured_at or time.monotonic(), data=jpeg_bytes)
+                        frame_data = frame.data
+
+                        received_at = time.monotonic()
+                        if telemetry.last_frame_at is not None:
+                            telemetry.receive_interval_ms.add((received_at - telemetry.last_frame_at) * 1000)
+                        telemetry.last_frame_at = received_at
+                        if frame.timestamp < received_at:
+                            telemetry.transport_latency_ms.add((received_at - frame.timestamp) * 1000)
+                        telemetry.counters.inc("frames_received")
+
                         if self._health_status[cam_id] != CameraHealthStatus.CONNECTED:
                             print(f"[Camera Manager] Re-established frame stream for '{cam_id}'.")
                         self._health_status[cam_id] = CameraHealthStatus.CONNECTED
-                        frame_data = message['data']
+
+                        self._frame_history[cam_id].append(frame)
+                        self._frame_seq[cam_id] += 1
+                        async with self._frame_arrived[cam_id]:
+                            self._frame_arrived[cam_id].notify_all()
                         
                         while not self._frame_queues[cam_id].empty():
                             self._frame_queues[cam_id].get_nowait()
+                            telemetry.counters.inc("frame_queue_drops")
                         self._frame_queues[cam_id].put_nowait(frame_data)
-                        
-                        async with self._stream_lock:
-                            listeners = list(self._stream_listeners[cam_id])
-                        
-                        for queue in listeners:
-                            if not queue.full():
-                                try: queue.put_nowait(frame_data)
-                                except asyncio.QueueFull: pass
                     else:
                         if self._health_status.get(cam_id) == CameraHealthStatus.CONNECTED:
+                            telemetry.counters.inc("disconnects")
                             await self._notification_service.send_alert("WARNING", f"Camera '{cam_id}' has stopped publishing frames.")
                         self._health_status[cam_id] = CameraHealthStatus.DISCONNECTED
             except redis_exceptions.ConnectionError:
@@ -92,59 +223,298 @@ class AsyncCameraManager:
                 await asyncio.sleep(10)
         await pubsub.close()
     
-    async def start_stream(self, cam_id: str) -> Optional[asyncio.Queue]:
-        if cam_id not in self._active_camera_ids: return None
-        q = asyncio.Queue(maxsize=2)
-        async with self._stream_lock: self._stream_listeners[cam_id].add(q)
-        print(f"[Camera Manager] New stream client connected for '{cam_id}'. Total listeners: {len(self._stream_listeners[cam_id])}")
-        return q
-
-    async def stop_stream(self, cam_id: str, queue: asyncio.Queue):
-        if cam_id not in self._active_camera_ids: return
-        async with self._stream_lock: self._stream_listeners[cam_id].discard(queue)
-        print(f"[Camera Manager] Stream client disconnected for '{cam_id}'. Remaining listeners: {len(self._stream_listeners[cam_id])}")
+    def _desired_publish_policy(self, cam_id: str) -> str:
+        if not settings.CAMERA_IDLE_PUBLISH_ENABLED or self._stream_client_count[cam_id] > 0:
+            return PUBLISH_POLICY_FULL
+        if self._line_active_provider is None or self._line_active_provider():
+            return PUBLISH_POLICY_FULL
+        return PUBLISH_POLICY_IDLE
+
+    async def _apply_publish_policies(self, ttl: int):
+        for cam_id in self._active_camera_ids:
+            mode = self._desired_publish_policy(cam_id)
+            policy = {"mode": mode}
+            # The key is the source of truth (and expires if the app dies, so the
+            # service falls back to full rate); the command makes a change take
+            # effect immediately instead of on the service's next poll.
+            await self.redis_client.set(publish_policy_key(cam_id), json.dumps(policy), ex=ttl)
+            if mode != self._publish_policy[cam_id]:
+                await self.redis_client.publish(command_channel(cam_id), json.dumps({"action": "set_publish_policy", "policy": policy}))
+                print(f"[Camera Manager] Publish policy for '{cam_id}': {mode}.")
+                self._publish_policy[cam_id] = mode
+
+    async def _publish_policy_worker(self):
+        """
+        Tells the camera services to publish at full rate while the line runs or a
+        live view is open, and only keep-alive/changed frames otherwise.
+        """
+        interval = settings.CAMERA_PUBLISH_POLICY_INTERVAL_SEC
+        ttl = max(5, int(interval * 10))
+        while True:
+            try:
+                await self._apply_publish_policies(ttl)
+                try:
+                    await asyncio.wait_for(self._publish_policy_changed.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._publish_policy_changed.clear()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"[Camera Manager] Failed to update publish policy: {e}")
+                await asyncio.sleep(5)
+
+    def has_camera(self, cam_id: str) -> bool:
+        return cam_id in self._active_camera_ids
+
+    async def stream_frames(
+        self, cam_id: str, width: Optional[int] = None, max_fps: Optional[float] = None, first_frame_timeout: float = 7.0
+    ) -> AsyncIterator[bytes]:
+        """
+        Yields JPEG frames for one live-stream client.
+
+        The client pulls the newest frame when it is ready for one instead of
+        having every frame pushed to it: frames that arrive while it is throttled
+        (`max_fps`) or still sending are skipped. With `width`, frames are
+        downscaled once per width and shared by all clients at that width.
+        Raises asyncio.TimeoutError if no frame arrives within `first_frame_timeout`.
+        """
+        width = normalize_width(width, settings.CAMERA_STREAM_MIN_WIDTH)
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        variants = self._stream_variants[cam_id]
+        cond = self._frame_arrived[cam_id]
+        history = self._frame_history[cam_id]
+
+        variants.subscribe(width)
+        self._stream_client_count[cam_id] += 1
+        self._publish_policy_changed.set()
+        print(f"[Camera Manager] New stream client connected for '{cam_id}' (width={width or 'full'}, max_fps={max_fps or 'camera'}). Total clients: {self._stream_client_count[cam_id]}")
+        try:
+            last_seq = 0
+            next_due = 0.0
+            while True:
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                async with cond:
+                    await asyncio.wait_for(
+                        cond.wait_for(lambda: self._frame_seq[cam_id] > last_seq),
+                        timeout=first_frame_timeout if last_seq == 0 else None
+                    )
+                    # Sequence and history are updated together, so history[-1] is frame `seq`.
+                    seq, frame = self._frame_seq[cam_id], history[-1]
+                if last_seq and seq - last_seq > 1:
+                    self._telemetry[cam_id].counters.inc("stream_frames_skipped", seq - last_seq - 1)
+                data = await variants.get(seq, frame.data, width)
+                last_seq = seq
+                next_due = time.monotonic() + min_interval
+                yield data
+        finally:
+            variants.unsubscribe(width)
+            self._stream_client_count[cam_id] -= 1
+            self._publish_policy_changed.set()
+            print(f"[Camera Manager] Stream client disconnected for '{cam_id}'. Remaining clients: {self._stream_client_count[cam_id]}")
+
+    def get_stream_client_counts(self) -> Dict[str, int]:
+        return dict(self._stream_client_count)
+
+    async def get_telemetry(self, summary: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-camera pipeline statistics: the receive side measured here plus the
+        capture/encode/publish stats the camera service stores in Redis.
+        `summary=True` returns a compact form for the status WebSocket.
+        """
+        keys = [telemetry_key(cam_id) for cam_id in self._active_camera_ids]
+        try:
+            raw_reports = await self.redis_client.mget(keys) if keys else []
+        except redis_exceptions.RedisError as e:
+            print(f"[Camera Manager] Could not read camera service telemetry: {e}")
+            raw_reports = [None] * len(keys)
+
+        result = {}
+        for cam_id, raw in zip(self._active_camera_ids, raw_reports):
+            try:
+                service = json.loads(raw) if raw else None
+            except ValueError:
+                service = None
+            telemetry = self._telemetry[cam_id]
+            if summary:
+                counters = telemetry.counters.snapshot()
+                service_counters = service["counters"] if service else {}
+                result[cam_id] = {
+                    "status": self.get_health_status(cam_id).value,
+                    "capture_fps": service["capture_fps"] if service else None,
+                    "receive_fps": telemetry.receive_fps(),
+                    "encode_p95_ms": service["encode_ms"]["p95"] if service else None,
+                    "transport_p95_ms": telemetry.transport_latency_ms.snapshot()["p95"],
+                    "capture_wait_p95_ms": telemetry.capture_wait_ms.snapshot()["p95"],
+                    "service_drops": sum(service_counters.get(k, 0) for k in ("capture_dropped", "publish_dropped", "stale_dropped")),
+                    "manager_drops": counters["frame_queue_drops"] + counters["ring_read_misses"],
+                    "stream_clients": self._stream_client_count[cam_id],
+                    "publish_policy": self._publish_policy[cam_id],
+                }
+            else:
+                result[cam_id] = {
+                    "status": self.get_health_status(cam_id).value,
+                    "stream_clients": self._stream_client_count[cam_id],
+                    "publish_policy": self._publish_policy[cam_id],
+                    "manager": telemetry.snapshot(),
+                    "service": service,
+                }
+        return result
         
-    async def capture_and_save_image(self, cam_id: str, filename_prefix: str) -> Tuple[Optional[str], Optional[str], Optional[bytes]]:
+    def _nearest_frame(self, cam_id: str, target_time: float) -> Optional[CameraFrame]:
+        """Returns the frame in the history whose capture time is closest to `target_time`."""
+        best: Optional[CameraFrame] = None
+        # History is ordered by capture time, so walk back from the newest frame
+        # and stop as soon as the distance starts growing again.
+        for frame in reversed(self._frame_history[cam_id]):
+            if best is not None and abs(frame.timestamp - target_time) > abs(best.timestamp - target_time):
+                break
+            best = frame
+        return best
+
+    async def get_frame_near(self, cam_id: str, target_time: float, timeout: float = 1.0) -> Optional[CameraFrame]:
+        """
+        Returns the frame captured closest to `target_time` (a time.monotonic() value).
+        If the target is still in the future this waits until a frame captured at
+        or after it arrives, instead of sleeping for a fixed delay.
+        """
+        history = self._frame_history.get(cam_id)
+        if history is None:
+            return None
+        wait_budget = max(0.0, target_time - time.monotonic()) + timeout
+        try:
+            async with self._frame_arrived[cam_id]:
+                await asyncio.wait_for(
+                    self._frame_arrived[cam_id].wait_for(lambda: bool(history) and history[-1].timestamp >= target_time),
+                    timeout=wait_budget
+                )
+        except asyncio.TimeoutError:
+            # Fall back to the closest frame we have, as long as it is not stale.
+            frame = self._nearest_frame(cam_id, target_time)
+            if frame is None or abs(frame.timestamp - target_time) > timeout:
+                return None
+            return frame
+        return self._nearest_frame(cam_id, target_time)
+
+    async def get_frames_around(self, cam_id: str, target_time: float, count: int, timeout: float = 1.0) -> List[CameraFrame]:
+        """
+        Returns up to `count` consecutive frames centred on the one captured closest
+        to `target_time`, waiting for the frames after the target to arrive. On
+        timeout, whatever part of the window is already in the history is returned.
+        """
+        history = self._frame_history.get(cam_id)
+        if history is None:
+            return []
+        before, after = (count - 1) // 2, count // 2
+
+        def frames_at_or_after_target() -> int:
+            n = 0
+            for frame in reversed(history):
+                if frame.timestamp < target_time:
+                    break
+                n += 1
+            return n
+
+        wait_budget = max(0.0, target_time - time.monotonic()) + timeout
+        try:
+            async with self._frame_arrived[cam_id]:
+                await asyncio.wait_for(
+                    self._frame_arrived[cam_id].wait_for(lambda: frames_at_or_after_target() > after),
+                    timeout=wait_budget
+                )
+        except asyncio.TimeoutError:
+            pass
+
+        frames = list(history)
+        if not frames:
+            return []
+        nearest = min(range(len(frames)), key=lambda i: abs(frames[i].timestamp - target_time))
+        if abs(frames[nearest].timestamp - target_time) > timeout:
+            return []
+        return frames[max(0, nearest - before):nearest + after + 1]
+
+    async def _select_burst_frame(self, cam_id: str, target_time: float, burst_size: int) -> Optional[CameraFrame]:
+        """Picks the sharpest of the `burst_size` frames around `target_time`."""
+        frames = await self.get_frames_around(cam_id, target_time, burst_size)
+        if not frames:
+            return None
+        if len(frames) == 1:
+            return frames[0]
+        start = time.perf_counter()
+        best_index, scores = await asyncio.to_thread(
+            select_sharpest, self._codec, [f.data for f in frames], settings.CAMERA_BURST_DECODE_SCALE
+        )
+        telemetry = self._telemetry[cam_id]
+        telemetry.burst_select_ms.add((time.perf_counter() - start) * 1000)
+        telemetry.counters.inc("burst_captures")
+        score_text = ", ".join("n/a" if sc is None else f"{sc:.0f}" for sc in scores)
+        print(f"[Camera Manager] Burst capture for '{cam_id}': picked frame {best_index + 1}/{len(frames)} "
+              f"({(frames[best_index].timestamp - target_time) * 1000:+.0f} ms from target). Sharpness: [{score_text}]")
+        return frames[best_index]
+
+    async def capture_and_save_image(
+        self, cam_id: str, filename_prefix: str, target_time: Optional[float] = None, burst_size: int = 1
+    ) -> Tuple[Optional[str], Optional[str], Optional[bytes]]:
+        """
+        Saves a frame to disk. With `target_time` (time.monotonic()), the frame captured
+        closest to that moment is used; otherwise the next frame to arrive is used.
+        With `target_time` and `burst_size` > 1, the sharpest of the `burst_size`
+        frames around the target is saved instead (see _select_burst_frame).
+        """
         if self._health_status.get(cam_id) != CameraHealthStatus.CONNECTED:
             print(f"CAMERA MANAGER ERROR: Cannot capture image. Camera '{cam_id}' is not connected.")
             return None, None, None
+        telemetry = self._telemetry[cam_id]
+        wait_start = time.monotonic()
         try:
-            jpeg_bytes = await asyncio.wait_for(self._frame_queues[cam_id].get(), timeout=1.0)
-            self._frame_queues[cam_id].task_done()
+            if target_time is not None:
+                if burst_size > 1:
+                    frame = await self._select_burst_frame(cam_id, target_time, burst_size)
+                else:
+                    frame = await self.get_frame_near(cam_id, target_time)
+                if frame is None:
+                    telemetry.counters.inc("capture_timeouts")
+                    print(f"CAMERA MANAGER TIMEOUT: No frame from '{cam_id}' near the requested capture time.")
+                    return None, None, None
+                jpeg_bytes = frame.data
+            else:
+                jpeg_bytes = await asyncio.wait_for(self._frame_queues[cam_id].get(), timeout=1.0)
+                self._frame_queues[cam_id].task_done()
+            telemetry.capture_wait_ms.add((time.monotonic() - wait_start) * 1000)
             
             captures_dir = self._captures_dir_base / cam_id
             captures_dir.mkdir(parents=True, exist_ok=True)
             filename = f"{filename_prefix}_{int(time.time())}.jpg"
             full_path = captures_dir / filename
 
-            def save_image_sync():
-                try:
-                    np_array = np.frombuffer(jpeg_bytes, np.uint8)
-                    img_decoded = cv2.imdecode(np_array, cv2.IMREAD_COLOR)
-                    if img_decoded is None: 
-                        print(f"CAMERA MANAGER ERROR: OpenCV failed to decode image buffer for '{filename}'.")
-                        return None, None
-                    
-                    cv2.imwrite(str(full_path), img_decoded)
-                    
-                    if not full_path.exists():
-                        print(f"CAMERA MANAGER ERROR: Failed to save image to disk at '{full_path}'. Check permissions.")
-                        return None, None
-                    
-                    web_path = f"/captures/{cam_id}/{filename}"
-                    return web_path, str(full_path)
-                except Exception as e:
-                    print(f"CAMERA MANAGER ERROR in save_image_sync: {e}")
-                    return None, None
-            
-            web_path, physical_path = await asyncio.to_thread(save_image_sync)
-            
-            if web_path:
-                self._last_event_image_paths[cam_id] = web_path
+            if self._save_mode == "passthrough":
+                # The frame is already a JPEG: write it as-is. Pixels are only
+                # decoded later by consumers that need them (e.g. annotation).
+                if not is_jpeg(jpeg_bytes):
+                    print(f"CAMERA MANAGER ERROR: Frame from '{cam_id}' is not a valid JPEG. Not saving '{filename}'.")
+                    return None, None, None
+                saved = await self._file_writer.write(full_path, jpeg_bytes)
+                saved_size = len(jpeg_bytes)
+            else:
+                saved = await self._file_writer.write_reencoded(full_path, jpeg_bytes)
+                saved_size = full_path.stat().st_size if saved else 0
+
+            if not saved:
+                print(f"CAMERA MANAGER ERROR: Failed to save image to disk at '{full_path}'. Check permissions.")
+                return None, None, None
+            web_path = f"/captures/{cam_id}/{filename}"
+            self._last_event_image_paths[cam_id] = web_path
+            if self._thumbnail_service:
+                self._thumbnail_service.enqueue(full_path, jpeg_bytes)
+            if self._capture_catalog:
+                self._capture_catalog.record(cam_id, full_path, saved_size)
             
-            return web_path, physical_path, jpeg_bytes
+            return web_path, str(full_path), jpeg_bytes
             
         except asyncio.TimeoutError:
+            telemetry.counters.inc("capture_timeouts")
             print(f"CAMERA MANAGER TIMEOUT: Did not receive frame from '{cam_id}' within 1 second.")
             return None, None, None
         except Exception as e:
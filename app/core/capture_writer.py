@@ -0,0 +1,69 @@
+"""
+Disk writers for captured frames.
+
+The camera services already deliver encoded JPEGs, so the default
+"passthrough" path writes those bytes straight to disk on a dedicated
+thread pool. The legacy "reencode" path (decode, then encode again with
+the configured JPEG codec) is kept for comparison and for setups that want
+files re-encoded at a fixed quality.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from app.utils.jpeg_codec import JpegCodec, OpenCvJpegCodec
+
+JPEG_SOI = b"\xff\xd8"
+
+def is_jpeg(data: bytes) -> bool:
+    """Cheap sanity check (start-of-image marker) that avoids a full decode."""
+    return len(data) > 4 and data[:2] == JPEG_SOI
+
+def write_bytes_sync(path: Path, data: bytes) -> bool:
+    """Writes via a temporary file and an atomic rename so readers never see a partial image."""
+    tmp_path = path.with_name(path.name + ".part")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"CAPTURE WRITER ERROR: Failed to write '{path}': {e}")
+        try: tmp_path.unlink()
+        except OSError: pass
+        return False
+
+def write_reencoded_sync(path: Path, data: bytes, codec: Optional[JpegCodec] = None, quality: int = 95) -> bool:
+    """The legacy path: decode the JPEG into pixels and encode it again before writing."""
+    codec = codec or OpenCvJpegCodec()
+    img_decoded = codec.decode(data)
+    if img_decoded is None:
+        print(f"CAPTURE WRITER ERROR: {codec.name} failed to decode image buffer for '{path.name}'.")
+        return False
+    return write_bytes_sync(path, codec.encode(img_decoded, quality))
+
+class AsyncFileWriter:
+    """
+    A small, dedicated thread pool for capture writes.
+
+    Using our own executor (instead of asyncio.to_thread and the loop's shared
+    default pool) keeps slow SD-card writes from starving other blocking work,
+    and bounds how many writes hit the card at once.
+    """
+    def __init__(self, max_workers: int = 2, codec: Optional[JpegCodec] = None, reencode_quality: int = 95):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="capture-writer")
+        self._codec = codec
+        self._reencode_quality = reencode_quality
+
+    async def write(self, path: Path, data: bytes) -> bool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, write_bytes_sync, path, data)
+
+    async def write_reencoded(self, path: Path, data: bytes) -> bool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, write_reencoded_sync, path, data, self._codec, self._reencode_quality)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=False)
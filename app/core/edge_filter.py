@@ -0,0 +1,89 @@
+"""
+Edge timing and debounce for one polled sensor input.
+
+A polled input only tells us that the level changed somewhere between two
+samples. The poller timestamps each sample at the midpoint of the bus read
+that produced it, and the edge is estimated at the midpoint between the last
+sample at the old level and the first at the new one. That halves the
+average timing error compared to stamping the edge when it is seen.
+
+A new level is only accepted once it has been held for the debounce time;
+a flicker that reverts earlier is dropped. Blocking (NPN: LOW) additionally
+has to last the minimum pulse time, so debris or a loose wire does not count
+as a product. Blocks longer than the maximum pulse time are accepted but
+reported, as they usually mean touching boxes or a jam.
+"""
+from typing import NamedTuple, Optional
+
+from app.utils.metrics import Counters
+
+class AcceptedEdge(NamedTuple):
+    level: bool               # Raw input level (NPN: False = blocked).
+    timestamp: float          # Estimated edge time, time.monotonic().
+    pulse_ms: Optional[float] # For a release: how long the input was blocked.
+    too_long: bool            # The block exceeded the maximum pulse time.
+
+class SensorEdgeFilter:
+    def __init__(self, idle_level: bool = True):
+        self.level = idle_level
+        self._idle_level = idle_level
+        self._candidate: Optional[tuple] = None  # (level, estimated edge time)
+        self._blocked_at: Optional[float] = None
+        self.counters = Counters("glitches_filtered", "short_pulses_filtered", "long_pulses")
+
+    @property
+    def pending(self) -> bool:
+        """A level change is waiting for its debounce/minimum pulse time; keep sampling."""
+        return self._candidate is not None
+
+    def update(
+        self, level: bool, sampled_at: float, previous_sample_at: Optional[float] = None,
+        debounce_sec: float = 0.0, min_pulse_sec: float = 0.0, max_pulse_sec: Optional[float] = None
+    ) -> Optional[AcceptedEdge]:
+        """
+        Feeds one sample taken at `sampled_at`; `previous_sample_at` is when the input
+        was last sampled (at the old level). Only needs calling when the level differs
+        from `level` or a change is pending. Returns the edge once it is accepted.
+        """
+        if level == self.level:
+            if self._candidate is not None:
+                held = sampled_at - self._candidate[1]
+                blocking = self._candidate[0] != self._idle_level
+                if blocking and held >= debounce_sec:
+                    self.counters.inc("short_pulses_filtered")
+                else:
+                    self.counters.inc("glitches_filtered")
+                self._candidate = None
+            return None
+
+        if self._candidate is None:
+            edge_at = (previous_sample_at + sampled_at) / 2 if previous_sample_at is not None else sampled_at
+            self._candidate = (level, edge_at)
+        edge_at = self._candidate[1]
+        blocking = level != self._idle_level
+        hold_sec = max(debounce_sec, min_pulse_sec) if blocking else debounce_sec
+        if sampled_at - edge_at < hold_sec:
+            return None
+
+        self._candidate = None
+        self.level = level
+        if blocking:
+            self._blocked_at = edge_at
+            return AcceptedEdge(level, edge_at, None, False)
+        pulse_ms = (edge_at - self._blocked_at) * 1000 if self._blocked_at is not None else None
+        self._blocked_at = None
+        too_long = pulse_ms is not None and max_pulse_sec is not None and pulse_ms > max_pulse_sec * 1000
+        if too_long:
+            self.counters.inc("long_pulses")
+        return AcceptedEdge(level, edge_at, pulse_ms, too_long)
+
+    def reset(self) -> bool:
+        """
+        Returns to the idle level (e.g. the bus was lost). True if the input was
+        blocked, i.e. the caller should report a release.
+        """
+        was_blocked = self.level != self._idle_level
+        self.level = self._idle_level
+        self._candidate = None
+        self._blocked_at = None
+        return was_blocked
@@ -0,0 +1,268 @@
+"""
+Frame transport shared by the standalone camera services and AsyncCameraManager.
+
+Two transports are supported for moving encoded JPEG frames from a camera
+service into the main application:
+
+- "redis": every frame is published in full on `camera:frames:{cam_id}`.
+  This is the original transport and is always available as a fallback.
+- "shm": frames are written into a fixed-slot ring buffer in POSIX shared
+  memory (`multiprocessing.shared_memory`). Only the slot sequence number is
+  published on `camera:frames:{cam_id}:shm`, so the JPEG payload never
+  travels through the Redis socket.
+
+Every frame carries its capture timestamp, taken with time.monotonic() in
+the camera service right after the frame was read from the sensor. On Linux
+CLOCK_MONOTONIC is system-wide, so it is directly comparable with
+SensorEvent.timestamp in the main application. On the Redis transport the
+timestamp travels in a 12-byte envelope in front of the JPEG; bare JPEGs
+(from older services) are still accepted and get no timestamp.
+
+This module only depends on the standard library so the camera services can
+import it without pulling in the application settings.
+
+Ring buffer layout (little-endian):
+
+    header:  magic (4s) | version (I) | slot_count (I) | slot_size (I) | write_seq (Q)
+    slot[i]: seq (Q) | length (I) | timestamp (d) | payload (slot_size bytes)
+
+Each slot works like a seqlock: the writer zeroes the slot sequence, copies
+the payload, then publishes the new sequence. A reader copies the payload
+and re-checks the sequence afterwards, so a torn read (the writer lapped the
+reader) is detected and discarded instead of producing a corrupt JPEG.
+
+The hand-off is not fully zero-copy: `read()` makes one copy of the payload.
+A slot is recycled after slot_count frames (well under a second at 30 fps),
+while the main app keeps frames for seconds (trigger-aligned capture history,
+stream fan-out, capture writes). `view()` gives the zero-copy memoryview for
+callers that finish with the frame immediately and re-check `is_current()`.
+"""
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Tuple
+
+TRANSPORT_REDIS = "redis"
+TRANSPORT_SHM = "shm"
+
+_MAGIC = b"RCFR"
+_VERSION = 2
+_HEADER = struct.Struct("<4sIIIQ")
+_WRITE_SEQ_OFFSET = 16
+_SLOT_HEADER = struct.Struct("<QId")
+
+_ENVELOPE_MAGIC = b"RCF1"
+_ENVELOPE = struct.Struct("<4sd")
+
+# Publish policies (see services/camera_pipeline.PublishPolicy).
+PUBLISH_POLICY_FULL = "full"
+PUBLISH_POLICY_IDLE = "idle"
+
+DEFAULT_SLOT_COUNT = 8
+DEFAULT_SLOT_SIZE = 2 * 1024 * 1024
+
+
+def frame_channel(cam_id: str) -> str:
+    """Redis channel carrying full JPEG frames (the pub/sub transport)."""
+    return f"camera:frames:{cam_id}"
+
+
+def shm_notify_channel(cam_id: str) -> str:
+    """Redis channel carrying only the sequence numbers of shared-memory frames."""
+    return f"camera:frames:{cam_id}:shm"
+
+
+def telemetry_key(cam_id: str) -> str:
+    """Redis key holding the camera service's latest pipeline statistics (JSON, with expiry)."""
+    return f"camera:telemetry:{cam_id}"
+
+
+def publish_policy_key(cam_id: str) -> str:
+    """Redis key holding the publish policy the main app wants (JSON, with expiry). Missing means full rate."""
+    return f"camera:publish_policy:{cam_id}"
+
+
+def command_channel(cam_id: str) -> str:
+    """Redis channel the camera service listens on for apply_settings / set_publish_policy commands."""
+    return f"camera:commands:{cam_id}"
+
+
+def shm_segment_name(cam_id: str) -> str:
+    return f"rpi_counter_frames_{cam_id}"
+
+
+def pack_frame(jpeg_bytes: bytes, timestamp: float) -> bytes:
+    """Prefixes a JPEG with its capture timestamp for the Redis transport."""
+    return _ENVELOPE.pack(_ENVELOPE_MAGIC, timestamp) + jpeg_bytes
+
+
+def unpack_frame(data: bytes) -> Tuple[Optional[float], bytes]:
+    """Splits a Redis frame message into (capture timestamp or None, JPEG bytes)."""
+    if data[:4] == _ENVELOPE_MAGIC:
+        timestamp = _ENVELOPE.unpack_from(data, 0)[1]
+        return timestamp, data[_ENVELOPE.size:]
+    return None, data
+
+
+class SharedFrameRing:
+    """A single-writer, multi-reader ring of JPEG frames in shared memory."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+        self._buf = shm.buf
+        magic, version, slot_count, slot_size, write_seq = _HEADER.unpack_from(self._buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Shared memory segment '{shm.name}' is not a frame ring (v{_VERSION}).")
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self._write_seq = write_seq
+        self._stride = _SLOT_HEADER.size + slot_size
+
+    @classmethod
+    def create(cls, cam_id: str, slot_count: int = DEFAULT_SLOT_COUNT, slot_size: int = DEFAULT_SLOT_SIZE) -> "SharedFrameRing":
+        """Creates (or re-creates) the ring for a camera. Called by the camera service."""
+        name = shm_segment_name(cam_id)
+        try:
+            # A previous service instance that crashed leaves its segment behind.
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        size = _HEADER.size + slot_count * (_SLOT_HEADER.size + slot_size)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, slot_count, slot_size, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, cam_id: str) -> "SharedFrameRing":
+        """Attaches to an existing ring. Raises FileNotFoundError if the service has not created it."""
+        shm = shared_memory.SharedMemory(name=shm_segment_name(cam_id))
+        # The reader must not unlink the segment when the app exits; only the
+        # camera service owns its lifetime.
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return cls(shm, owner=False)
+
+    def _slot_offset(self, seq: int) -> int:
+        return _HEADER.size + (seq % self.slot_count) * self._stride
+
+    def write(self, data: bytes, timestamp: float) -> Optional[int]:
+        """Writes one frame and returns its sequence number, or None if it does not fit in a slot."""
+        length = len(data)
+        if length > self.slot_size:
+            return None
+        seq = self._write_seq + 1
+        offset = self._slot_offset(seq)
+        payload = offset + _SLOT_HEADER.size
+        _SLOT_HEADER.pack_into(self._buf, offset, 0, 0, 0.0)
+        self._buf[payload:payload + length] = data
+        _SLOT_HEADER.pack_into(self._buf, offset, seq, length, timestamp)
+        struct.pack_into("<Q", self._buf, _WRITE_SEQ_OFFSET, seq)
+        self._write_seq = seq
+        return seq
+
+    def latest_seq(self) -> int:
+        return struct.unpack_from("<Q", self._buf, _WRITE_SEQ_OFFSET)[0]
+
+    def view(self, seq: int) -> Optional[Tuple[float, memoryview]]:
+        """
+        Returns (capture timestamp, zero-copy view of the payload) for `seq`, or
+        None if that slot has already been recycled. The view is only valid until
+        the writer laps the ring, so callers must check `is_current(seq)` after
+        using it.
+        """
+        if seq <= 0:
+            return None
+        offset = self._slot_offset(seq)
+        slot_seq, length, timestamp = _SLOT_HEADER.unpack_from(self._buf, offset)
+        if slot_seq != seq:
+            return None
+        payload = offset + _SLOT_HEADER.size
+        return timestamp, self._buf[payload:payload + length]
+
+    def is_current(self, seq: int) -> bool:
+        return _SLOT_HEADER.unpack_from(self._buf, self._slot_offset(seq))[0] == seq
+
+    def read(self, seq: Optional[int] = None) -> Optional[Tuple[int, float, bytes]]:
+        """
+        Reads frame `seq` (default: the latest one) into a bytes object and
+        returns (seq, capture timestamp, data). This is the only copy made on
+        the receiving side, and it is deliberate: the frame outlives its slot.
+        Returns None if the slot was overwritten before or during the copy.
+        """
+        if seq is None:
+            seq = self.latest_seq()
+        slot = self.view(seq)
+        if slot is None:
+            return None
+        timestamp, view = slot
+        try:
+            data = bytes(view)
+        finally:
+            view.release()
+        if not self.is_current(seq):
+            return None
+        return seq, timestamp, data
+
+    def close(self):
+        try:
+            self._buf = None
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+        except (FileNotFoundError, BufferError):
+            pass
+
+
+class FramePublisher:
+    """
+    Publishes encoded frames from a camera service using the configured
+    transport. Used from the (synchronous) camera service processes.
+
+    If the shared-memory ring cannot be created, or a frame is larger than a
+    ring slot, the frame is published over plain Redis pub/sub instead.
+    """
+
+    def __init__(self, redis_client, cam_id: str, transport: str = TRANSPORT_REDIS,
+                 slot_count: int = DEFAULT_SLOT_COUNT, slot_size: int = DEFAULT_SLOT_SIZE):
+        self._redis = redis_client
+        self._cam_id = cam_id
+        self._frame_channel = frame_channel(cam_id)
+        self._notify_channel = shm_notify_channel(cam_id)
+        self._ring: Optional[SharedFrameRing] = None
+        if transport == TRANSPORT_SHM:
+            try:
+                self._ring = SharedFrameRing.create(cam_id, slot_count, slot_size)
+                print(f"[Frame Publisher] Shared-memory ring '{shm_segment_name(cam_id)}' created "
+                      f"({slot_count} slots x {slot_size // 1024} KiB).", flush=True)
+            except Exception as e:
+                print(f"[Frame Publisher] WARNING: Could not create shared-memory ring ({e}). "
+                      f"Falling back to Redis pub/sub.", flush=True)
+
+    @property
+    def transport(self) -> str:
+        return TRANSPORT_SHM if self._ring else TRANSPORT_REDIS
+
+    @property
+    def channel(self) -> str:
+        return self._notify_channel if self._ring else self._frame_channel
+
+    def publish(self, jpeg_bytes: bytes, timestamp: Optional[float] = None):
+        """Publishes one frame. `timestamp` is the time.monotonic() capture time."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if self._ring:
+            seq = self._ring.write(jpeg_bytes, timestamp)
+            if seq is not None:
+                self._redis.publish(self._notify_channel, str(seq))
+                return
+        self._redis.publish(self._frame_channel, pack_frame(jpeg_bytes, timestamp))
+
+    def close(self):
+        if self._ring:
+            self._ring.close()
+            self._ring = None
@@ -1,10 +1,15 @@
 import asyncio
+import itertools
+import random
+import time
 from enum import Enum
-from typing import Optional, List
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
 from pymodbus.client import AsyncModbusSerialClient
 from pymodbus.exceptions import ConnectionException, ModbusIOException
 from pymodbus.framer import ModbusRtuFramer
 
+from app.utils.metrics import Counters, Histogram, RollingStats
+from app.core.modbus_scheduler import ModbusTransactionScheduler, TransactionPriority
 from config import settings
 
 class ModbusHealthStatus(str, Enum):
@@ -12,13 +17,140 @@ class ModbusHealthStatus(str, Enum):
     ERROR = "error"
     DISCONNECTED = "disconnected"
 
+COIL_COUNT = 8
+
+# Returned by read_digital_inputs when the request went stale in the bus queue.
+# Unlike None (the read failed), it says nothing about the link.
+READ_EXPIRED = object()
+
+class InputSample(NamedTuple):
+    bits: List[bool]
+    # Midpoint of the bus transaction (time.monotonic()), excluding time spent queued.
+    sampled_at: float
+
+# Modbus function codes used by this controller, keyed by their telemetry name.
+FUNCTION_CODES = {"fc01_read_coils": 1, "fc02_read_discrete_inputs": 2, "fc05_write_coil": 5, "fc15_write_coils": 15}
+LATENCY_BUCKETS_MS = (5, 10, 20, 50, 100, 200, 500, 1000)
+
+class ModbusTelemetry:
+    """Round-trip statistics for the Modbus link, kept by AsyncModbusController."""
+    def __init__(self):
+        self.latency_ms = {name: RollingStats() for name in FUNCTION_CODES}
+        self.latency_histogram_ms = {name: Histogram(LATENCY_BUCKETS_MS) for name in FUNCTION_CODES}
+        self.counters = {name: Counters("requests", "errors", "timeouts") for name in FUNCTION_CODES}
+        # Time between successful input reads; the poll rate actually achieved.
+        self.input_poll_interval_ms = RollingStats(window=200)
+        self.consecutive_failures = 0
+        self.max_consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self._last_input_read_at: Optional[float] = None
+        self.outage_sec = RollingStats(window=100)
+        self.connection = Counters("outages", "reconnect_attempts", "reconnects")
+        self.outage_started_at: Optional[float] = None
+
+    def record_success(self, name: str, started: float):
+        now = time.perf_counter()
+        elapsed_ms = (now - started) * 1000
+        self.latency_ms[name].add(elapsed_ms)
+        self.latency_histogram_ms[name].add(elapsed_ms)
+        self.counters[name].inc("requests")
+        self.consecutive_failures = 0
+        if name == "fc02_read_discrete_inputs":
+            if self._last_input_read_at is not None:
+                self.input_poll_interval_ms.add((now - self._last_input_read_at) * 1000)
+            self._last_input_read_at = now
+
+    def record_failure(self, name: str, error: Exception):
+        self.counters[name].inc("requests")
+        # pymodbus reports an unanswered request as a ModbusIOException "No response received ...".
+        self.counters[name].inc("timeouts" if "No response" in str(error) else "errors")
+        self.consecutive_failures += 1
+        self.max_consecutive_failures = max(self.max_consecutive_failures, self.consecutive_failures)
+        self.last_error = str(error)
+        if name == "fc02_read_discrete_inputs":
+            # The next interval would span the failed poll; a failed write says nothing about the poll rate.
+            self._last_input_read_at = None
+
+    def record_outage_start(self):
+        if self.outage_started_at is None:
+            self.outage_started_at = time.monotonic()
+            self.connection.inc("outages")
+
+    def record_outage_end(self) -> Optional[float]:
+        """Ends the current outage and returns its duration in seconds."""
+        if self.outage_started_at is None:
+            return None
+        duration = time.monotonic() - self.outage_started_at
+        self.outage_sec.add(duration)
+        self.outage_started_at = None
+        return duration
+
+    def current_outage_sec(self) -> Optional[float]:
+        return round(time.monotonic() - self.outage_started_at, 2) if self.outage_started_at is not None else None
+
+    def poll_rate_hz(self) -> Optional[float]:
+        mean = self.input_poll_interval_ms.snapshot()["mean"]
+        return round(1000.0 / mean, 2) if mean else None
+
+    def snapshot(self, summary: bool = False) -> Dict[str, Any]:
+        if summary:
+            return {
+                "poll_rate_hz": self.poll_rate_hz(),
+                "consecutive_failures": self.consecutive_failures,
+                "input_read_p95_ms": self.latency_ms["fc02_read_discrete_inputs"].snapshot()["p95"],
+                "errors": sum(c.get("errors") for c in self.counters.values()),
+                "timeouts": sum(c.get("timeouts") for c in self.counters.values()),
+                "current_outage_sec": self.current_outage_sec(),
+                "outages": self.connection.get("outages"),
+            }
+        return {
+            "poll_rate_hz": self.poll_rate_hz(),
+            "input_poll_interval_ms": self.input_poll_interval_ms.snapshot(),
+            "consecutive_failures": self.consecutive_failures,
+            "max_consecutive_failures": self.max_consecutive_failures,
+            "last_error": self.last_error,
+            "current_outage_sec": self.current_outage_sec(),
+            "outage_sec": self.outage_sec.snapshot(),
+            "connection": self.connection.snapshot(),
+            "function_codes": {
+                name: {
+                    "function_code": code,
+                    "counters": self.counters[name].snapshot(),
+                    "latency_ms": self.latency_ms[name].snapshot(),
+                    "latency_histogram_ms": self.latency_histogram_ms[name].snapshot(),
+                }
+                for name, code in FUNCTION_CODES.items()
+            },
+        }
+
 class AsyncModbusController:
+    """
+    Single owner of the RS-485 Modbus RTU link to the input and output modules.
+
+    Every coil this controller writes is recorded in a shadow copy, so the
+    current output state is known without a read_coils round trip on the bus.
+    The poller reads the coils only on a slow schedule to catch changes made
+    behind our back, e.g. a module power cycle.
+
+    All bus traffic goes through a ModbusTransactionScheduler, so concurrent
+    callers are serialised by priority instead of racing on the serial port.
+    Callers pick a priority with the `priority` argument; the defaults suit
+    ordinary use (see modbus_scheduler.py).
+
+    A failed transaction marks the link as broken and the shadow as unknown.
+    The connection supervisor (start_supervisor) then reconnects with
+    exponential backoff and jitter and re-reads the coils, so a serial glitch
+    heals itself without a restart.
+    """
+    # A queued status read older than this is dropped; a fresher one will follow.
+    STATUS_READ_DEADLINE_SEC = 1.0
     _instance: Optional['AsyncModbusController'] = None
     _lock = asyncio.Lock()
 
     def __init__(self):
         if not hasattr(self, 'initialized'):
             self._config = settings.MODBUS
+            self.input_count = self._config.INPUT_COUNT
             self.client = AsyncModbusSerialClient(
                 port=self._config.PORT, framer=ModbusRtuFramer,
                 baudrate=self._config.BAUDRATE, bytesize=8, parity="N", stopbits=1,
@@ -27,6 +159,24 @@ class AsyncModbusController:
             self.initialized = True
             self.health_status = ModbusHealthStatus.DISCONNECTED
             self._is_connected = False
+            # Set while the link is down; wakes the connection supervisor.
+            self._link_down = asyncio.Event()
+            self._link_down.set()
+            self._supervisor_task: Optional[asyncio.Task] = None
+            # Last known coil states. Updated on every successful write and read.
+            self._coil_shadow: List[bool] = [False] * COIL_COUNT
+            self._coil_shadow_valid = False
+            self.coil_mismatches = 0
+            self.scheduler = ModbusTransactionScheduler()
+            self.telemetry = ModbusTelemetry()
+            # Most recently requested value per coil that is not on the bus yet,
+            # as (request number, state). A write always sends the newest request,
+            # so a queued older write executed after a newer, higher-priority one
+            # (e.g. an emergency stop) cannot undo it.
+            self._requested_outputs: Dict[int, Tuple[int, bool]] = {}
+            self._request_counter = itertools.count()
+            # An input poll that waited longer than two poll intervals is stale.
+            self._input_poll_deadline_sec = max(0.1, 2 * self._config.POLLING_MS / 1000)
             self._output_name_to_address_map = {k.lower(): v for k, v in settings.OUTPUTS.model_dump().items()}
             print("--- Modbus Controller Initialized ---")
             print(f"    Loaded output map: {self._output_name_to_address_map}")
@@ -41,6 +191,34 @@ class AsyncModbusController:
     def get_output_address(self, name: str) -> Optional[int]:
         return self._output_name_to_address_map.get(name.lower())
 
+    def get_coil_states(self) -> List[bool]:
+        """The shadow coil states (no bus traffic)."""
+        return list(self._coil_shadow)
+
+    def get_coil_state(self, address: int) -> Optional[bool]:
+        """Shadow state of one coil, or None if it has never been read or written."""
+        if not 0 <= address < COIL_COUNT or not self._coil_shadow_valid:
+            return None
+        return self._coil_shadow[address]
+
+    @property
+    def coil_shadow_valid(self) -> bool:
+        return self._coil_shadow_valid
+
+    @property
+    def is_connected(self) -> bool:
+        return self._is_connected
+
+    def _mark_link_broken(self):
+        self.health_status = ModbusHealthStatus.ERROR
+        # The failed request may or may not have reached the module, and the module
+        # may reset while the link is down: the shadow is unknown until re-read.
+        self._coil_shadow_valid = False
+        if self._is_connected:
+            self.telemetry.record_outage_start()
+        self._is_connected = False
+        self._link_down.set()
+
     async def connect(self) -> bool:
         if self._is_connected: return True
         try:
@@ -49,6 +227,7 @@ class AsyncModbusController:
                 print("Modbus Controller: Successfully connected to serial port.")
                 self.health_status = ModbusHealthStatus.OK
                 self._is_connected = True
+                self._link_down.clear()
                 return True
             else:
                 print(f"Modbus Controller: Failed to connect to serial port {self._config.PORT}.")
@@ -62,53 +241,226 @@ class AsyncModbusController:
             return False
 
     async def disconnect(self):
+        self.stop_supervisor()
+        self.scheduler.stop()
         if self._is_connected:
             self.client.close()
             self._is_connected = False
             self.health_status = ModbusHealthStatus.DISCONNECTED
             print("Modbus Controller: Connection closed.")
 
-    async def read_digital_inputs(self) -> Optional[List[bool]]:
+    def start_supervisor(self):
+        if self._supervisor_task is None or self._supervisor_task.done():
+            self._supervisor_task = asyncio.create_task(self._supervise_connection())
+
+    def stop_supervisor(self):
+        if self._supervisor_task and not self._supervisor_task.done():
+            self._supervisor_task.cancel()
+
+    async def _supervise_connection(self):
+        min_delay, max_delay = self._config.RECONNECT_MIN_SEC, self._config.RECONNECT_MAX_SEC
+        while True:
+            try:
+                await self._link_down.wait()
+                self.telemetry.record_outage_start()
+                delay = min_delay
+                while not self._is_connected:
+                    # Full jitter keeps retries from locking into step with a flapping adapter.
+                    await asyncio.sleep(random.uniform(0, delay))
+                    self.telemetry.connection.inc("reconnect_attempts")
+                    # Drop the old transport first; pymodbus will not reopen a port it thinks is open.
+                    self.client.close()
+                    if await self.connect():
+                        break
+                    delay = min(delay * 2, max_delay)
+                self.telemetry.connection.inc("reconnects")
+                # Re-sync the shadow before queued writes build frames from it. The device wins.
+                coils = await self.read_coils(priority=TransactionPriority.EMERGENCY)
+                duration = self.telemetry.record_outage_end()
+                if duration is not None:
+                    print(f"Modbus Controller: Link restored after {duration:.2f}s outage"
+                          f"{'' if coils is not None else ' (coil re-sync failed)'}.")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Error in Modbus connection supervisor: {e}")
+                await asyncio.sleep(max_delay)
+
+    def get_metrics(self, summary: bool = False) -> Dict[str, Any]:
+        """Bus round-trip statistics and scheduler queue statistics."""
+        metrics = {"health_status": self.health_status.value, **self.telemetry.snapshot(summary)}
+        if summary:
+            metrics["queue_depth"] = self.scheduler.queue_depth()
+        else:
+            metrics["scheduler"] = self.scheduler.snapshot()
+        metrics["coil_mismatches"] = self.coil_mismatches
+        return metrics
+
+    async def read_digital_inputs(self, priority: TransactionPriority = TransactionPriority.INPUT_POLL) -> Union[InputSample, None, object]:
+        """Reads discrete inputs. Returns None on failure, READ_EXPIRED if the request went stale in the queue."""
+        deadline = self._input_poll_deadline_sec if priority != TransactionPriority.EMERGENCY else None
+        return await self.scheduler.submit(priority, self._read_digital_inputs_now, READ_EXPIRED, deadline, key="read_inputs")
+
+    async def _read_digital_inputs_now(self) -> Optional[InputSample]:
         """Reads discrete inputs. Assumes connection is already established."""
         # --- THIS IS THE FIX: REMOVED connect() and disconnect() calls ---
         if not self._is_connected: return None
+        started = time.perf_counter()
+        request_sent = time.monotonic()
         try:
-            result = await self.client.read_discrete_inputs(address=0, count=4, slave=self._config.DEVICE_ADDRESS_INPUTS)
+            result = await self.client.read_discrete_inputs(address=0, count=self.input_count, slave=self._config.DEVICE_ADDRESS_INPUTS)
+            # The module sampled its inputs somewhere during the round trip; take the midpoint.
+            sampled_at = (request_sent + time.monotonic()) / 2
             if result.isError(): raise ModbusIOException(f"Modbus error on input read: {result}")
-            return result.bits[:4] if result.bits else [True] * 4
+            self.telemetry.record_success("fc02_read_discrete_inputs", started)
+            bits = result.bits[:self.input_count] if result.bits else [True] * self.input_count
+            return InputSample(bits, sampled_at)
         except (ModbusIOException, ConnectionException) as e:
+            self.telemetry.record_failure("fc02_read_discrete_inputs", e)
             print(f"Modbus read_digital_inputs failed: {e}")
-            self.health_status = ModbusHealthStatus.ERROR
-            self._is_connected = False  # Mark connection as broken
+            self._mark_link_broken()
             return None
         # --- END OF FIX ---
 
-    async def read_coils(self) -> Optional[List[bool]]:
+    async def read_coils(self, priority: TransactionPriority = TransactionPriority.STATUS_READ) -> Optional[List[bool]]:
+        """Reads coils (and refreshes the shadow). Returns None on failure or if the request went stale."""
+        deadline = self.STATUS_READ_DEADLINE_SEC if priority == TransactionPriority.STATUS_READ else None
+        return await self.scheduler.submit(priority, self._read_coils_now, None, deadline, key="read_coils")
+
+    async def _read_coils_now(self) -> Optional[List[bool]]:
         """Reads coils. Assumes connection is already established."""
         # --- THIS IS THE FIX: REMOVED connect() and disconnect() calls ---
         if not self._is_connected: return None
+        started = time.perf_counter()
         try:
-            result = await self.client.read_coils(address=0, count=8, slave=self._config.DEVICE_ADDRESS_OUTPUTS)
+            result = await self.client.read_coils(address=0, count=COIL_COUNT, slave=self._config.DEVICE_ADDRESS_OUTPUTS)
             if result.isError(): raise ModbusIOException(f"Modbus error on coil read: {result}")
-            return result.bits[:8] if result.bits else [False] * 8
+            self.telemetry.record_success("fc01_read_coils", started)
+            coils = list(result.bits[:COIL_COUNT]) if result.bits else [False] * COIL_COUNT
+            self._update_shadow_from_device(coils)
+            return coils
         except (ModbusIOException, ConnectionException) as e:
+            self.telemetry.record_failure("fc01_read_coils", e)
             print(f"Modbus read_coils failed: {e}")
-            self.health_status = ModbusHealthStatus.ERROR
-            self._is_connected = False # Mark connection as broken
+            self._mark_link_broken()
             return None
         # --- END OF FIX ---
 
-    async def write_coil(self, address: int, state: bool) -> bool:
+    def _update_shadow_from_device(self, coils: List[bool]):
+        # The device wins: a mismatch means the outputs changed outside this
+        # controller (module reset, another master), and re-asserting a stale
+        # shadow could restart a conveyor nobody asked for.
+        if self._coil_shadow_valid and coils != self._coil_shadow:
+            self.coil_mismatches += 1
+            changed = [i for i, (a, b) in enumerate(zip(self._coil_shadow, coils)) if a != b]
+            print(f"Modbus Controller: Coil state differs from shadow at address(es) {changed}. Adopting device state.")
+        self._coil_shadow = list(coils)
+        self._coil_shadow_valid = True
+
+    def _request_outputs(self, states: Dict[int, bool]):
+        for address, state in states.items():
+            self._requested_outputs[address] = (next(self._request_counter), bool(state))
+
+    def _pending_request(self, address: int) -> Optional[Tuple[int, bool]]:
+        """
+        The newest request for a coil, or None if it has already been sent by a
+        newer transaction (in which case the shadow holds the newest value).
+        """
+        return self._requested_outputs.get(address)
+
+    def _settle_outputs(self, sent: Dict[int, Tuple[int, bool]]):
+        # Forget requests that are now on the bus (or failed); newer ones stay pending.
+        for address, request in sent.items():
+            if self._requested_outputs.get(address) == request:
+                del self._requested_outputs[address]
+
+    def _resolve_outputs(self, outputs: Dict[Union[str, int], bool]) -> Dict[int, bool]:
+        states = {}
+        for output, state in outputs.items():
+            address = self.get_output_address(output) if isinstance(output, str) else output
+            if address is None or not 0 <= address < COIL_COUNT:
+                raise ValueError(f"Unknown output '{output}'")
+            states[address] = bool(state)
+        return states
+
+    async def write_coil(self, address: int, state: bool, priority: TransactionPriority = TransactionPriority.ACTUATOR_WRITE) -> bool:
+        """
+        Writes a single coil. Writes are never dropped, but a queued write to the
+        same coil is superseded by this one, as only the last value matters.
+        """
+        if 0 <= address < COIL_COUNT:
+            self._request_outputs({address: state})
+        return await self.scheduler.submit(
+            priority, lambda: self._write_coil_now(address, state), False,
+            key=("write_coil", address), merge=ModbusTransactionScheduler.MERGE_SUPERSEDE,
+        )
+
+    async def write_outputs(self, outputs: Dict[Union[str, int], bool], priority: TransactionPriority = TransactionPriority.ACTUATOR_WRITE) -> bool:
+        """
+        Sets several outputs, given by name or coil address, in one Write Multiple
+        Coils (FC15) transaction. Coils not mentioned keep their shadow state, so
+        the whole change costs a single RTU round trip instead of one per coil.
+        """
+        states = self._resolve_outputs(outputs)
+        if not states:
+            return True
+        self._request_outputs(states)
+        return await self.scheduler.submit(priority, lambda: self._write_outputs_now(states), False)
+
+    async def _write_outputs_now(self, states: Dict[int, bool]) -> bool:
+        if not self._is_connected: return False
+        sent = {address: self._pending_request(address) for address in states}
+        sent = {address: request for address, request in sent.items() if request is not None}
+        if not sent:
+            return True
+        try:
+            if not self._coil_shadow_valid and len(states) < COIL_COUNT:
+                # Unchanged bits must be known before the whole block is overwritten.
+                # A write that sets every coil (emergency stop) needs no read-back.
+                if await self._read_coils_now() is None:
+                    return False
+            started = time.perf_counter()
+            coils = list(self._coil_shadow)
+            for address, (_, state) in sent.items():
+                coils[address] = state
+            result = await self.client.write_coils(address=0, values=coils, slave=self._config.DEVICE_ADDRESS_OUTPUTS)
+            if result.isError(): raise ModbusIOException(f"Modbus error on multiple coil write: {result}")
+            self.telemetry.record_success("fc15_write_coils", started)
+            self._coil_shadow = coils
+            self._coil_shadow_valid = True
+            return True
+        except (ModbusIOException, ConnectionException) as e:
+            self.telemetry.record_failure("fc15_write_coils", e)
+            print(f"Modbus write_coils failed for addresses {sorted(sent)}: {e}")
+            self._mark_link_broken()
+            return False
+        finally:
+            self._settle_outputs(sent)
+
+    async def _write_coil_now(self, address: int, state: bool) -> bool:
         """Writes a single coil. Assumes connection is already established."""
         # --- THIS IS THE FIX: REMOVED connect() and disconnect() calls ---
         if not self._is_connected: return False
+        request = None
+        if 0 <= address < COIL_COUNT:
+            request = self._pending_request(address)
+            if request is None:
+                return True
+            state = request[1]
+        started = time.perf_counter()
         try:
             result = await self.client.write_coil(address=address, value=state, slave=self._config.DEVICE_ADDRESS_OUTPUTS)
             if result.isError(): raise ModbusIOException(f"Modbus error on coil write: {result}")
+            self.telemetry.record_success("fc05_write_coil", started)
+            if 0 <= address < COIL_COUNT:
+                self._coil_shadow[address] = bool(state)
             return True
         except (ModbusIOException, ConnectionException) as e:
+            self.telemetry.record_failure("fc05_write_coil", e)
             print(f"Modbus write_coil failed for address {address}: {e}")
-            self.health_status = ModbusHealthStatus.ERROR
-            self._is_connected = False # Mark connection as broken
+            self._mark_link_broken()
             return False
-        # --- END OF FIX ---
\ No newline at end of file
+        finally:
+            if request is not None:
+                self._settle_outputs({address: request})
+        # --- END OF FIX ---
@@ -1,42 +1,93 @@
 """
 REVISED: Now acts as the Modbus Poller Service.
-- It continuously polls BOTH the input and output modules.
+- It polls the input module on every tick. Output (coil) states come from the
+  controller's shadow copy; the coils are only read back every
+  MODBUS_COIL_RECONCILE_SEC to verify it, which halves bus traffic per tick.
+  That read-back runs as a background task, never inside the poll tick.
 - It maintains a complete, up-to-date state of all hardware I/O.
-- It detects changes in inputs and fires sensor events.
+- It detects changes in inputs and fires sensor events. Events are handed to a
+  non-blocking sink (the sensor dispatcher), which delivers them in order.
 - It correctly inverts the NPN sensor signal (LOW signal = TRIGGERED).
+- Ticks are scheduled against deadlines, so the poll period is MODBUS_POLLING_MS
+  including the bus transactions rather than on top of them. While no run is
+  active it polls every MODBUS_IDLE_POLLING_MS instead. A tick that overruns its
+  period is counted and the schedule restarts from now (no catch-up bursts).
+- Each input read is bracketed with timestamps around the bus transaction
+  itself (InputSample.sampled_at), so time queued for the bus does not count.
+  Edges are timed at the midpoint between the samples either side of them and
+  debounced (SENSORS_DEBOUNCE_MS); blocks shorter than the active product's
+  min_sensor_block_time_ms are dropped (see edge_filter.py and set_pulse_limits).
 
 DEFINITIVE FIX: The poller now uses the injected sensor configuration to determine
 which physical channels to monitor, instead of hardcoding a 1-to-1 mapping. This
 makes the SENSORS_ENTRY_CHANNEL and SENSORS_EXIT_CHANNEL settings work correctly.
+
+Channels are monitored as a bitmask: each read is packed into one integer and
+XORed with the previous one, so only channels that changed (or are waiting out
+a debounce) are looked at, whatever the module size (MODBUS_INPUT_COUNT) and
+however many roles are wired (see SensorRole).
 """
 import asyncio
-from typing import Callable, Coroutine, Optional, List
-from .modbus_controller import AsyncModbusController, ModbusHealthStatus
-from .sensor_events import SensorState, SensorEvent
+import time
+from typing import Any, Callable, Dict, Optional, List
+from app.utils.metrics import RollingStats
+from .edge_filter import AcceptedEdge, SensorEdgeFilter
+from .modbus_controller import READ_EXPIRED, AsyncModbusController, ModbusHealthStatus
+from .sensor_events import SensorEvent, SensorRole, SensorState, channel_role_map
 from config import settings
 
-AsyncEventCallback = Callable[[SensorEvent], Coroutine[None, None, None]]
+# Called synchronously from the poll loop; must not block (see AsyncSensorEventDispatcher.dispatch).
+SensorEventSink = Callable[[SensorEvent], None]
 
 class AsyncModbusPoller:
     def __init__(
         self,
         modbus_controller: AsyncModbusController,
-        event_callback: AsyncEventCallback,
-        sensor_config  # <-- ADDED: Inject the sensor settings object
+        event_callback: SensorEventSink,
+        sensor_config,  # <-- ADDED: Inject the sensor settings object
+        line_active_provider: Optional[Callable[[], bool]] = None
     ):
         self.modbus_controller = modbus_controller
         self.event_callback = event_callback
         # --- ADDED: Store the sensor configuration ---
         self._sensor_config = sensor_config
         self.polling_interval_sec = settings.MODBUS.POLLING_MS / 1000.0
+        self.idle_polling_interval_sec = settings.MODBUS.IDLE_POLLING_MS / 1000.0
+        # Without a provider the line is assumed active, i.e. always the fast rate.
+        self._line_active = line_active_provider or (lambda: True)
+        self._tick_interval_ms = RollingStats(window=200)
+        self._overruns = 0
+        self._ticks = 0
+        self._expired_polls = 0
+        self._fast_mode = True
+        self.coil_reconcile_interval_sec = settings.MODBUS.COIL_RECONCILE_SEC
+        self._next_coil_reconcile = 0.0
+        self._coil_reconcile_task: Optional[asyncio.Task] = None
         self._monitoring_task: Optional[asyncio.Task] = None
         self._verbose = settings.LOGGING.VERBOSE_LOGGING
 
         # Initialize all states to True (cleared for NPN sensors)
-        self._input_channels: List[bool] = [True] * 4
-        self._output_channels: List[bool] = [False] * 8
-        self._last_known_entry_state: bool = True
-        self._last_known_exit_state: bool = True
+        input_count = self.modbus_controller.input_count
+        self._input_channels: List[bool] = [True] * input_count
+        self._channel_roles: Dict[int, SensorRole] = {}
+        for channel, role in channel_role_map(self._sensor_config).items():
+            if channel > input_count:
+                print(f"Modbus Poller WARNING: {role.value} channel {channel} exceeds the {input_count} module inputs; ignored.")
+                continue
+            self._channel_roles[channel] = role
+        self._edge_filters: Dict[int, SensorEdgeFilter] = {
+            channel: SensorEdgeFilter(idle_level=True) for channel in self._channel_roles
+        }
+        # Bit (channel - 1) set for every monitored channel.
+        self._watch_mask = sum(1 << (channel - 1) for channel in self._channel_roles)
+        self._idle_word = (1 << input_count) - 1  # NPN: all inputs HIGH.
+        self._last_word = self._idle_word
+        self._last_sampled_at: Optional[float] = None
+        # Channels whose filter is waiting for the new level to be held.
+        self._pending_mask = 0
+        self._debounce_sec = self._sensor_config.DEBOUNCE_MS / 1000.0
+        self._min_pulse_sec = 0.0
+        self._max_pulse_sec: Optional[float] = None
         self._health_status: ModbusHealthStatus = ModbusHealthStatus.DISCONNECTED
 
     def get_io_health(self) -> ModbusHealthStatus:
@@ -45,88 +96,165 @@ class AsyncModbusPoller:
     def get_current_input_states(self) -> List[bool]:
         return self._input_channels
 
+    def triggered_roles(self) -> List[SensorRole]:
+        """Roles whose input reads TRIGGERED (NPN: LOW) in the latest sample."""
+        return [role for channel, role in sorted(self._channel_roles.items()) if not self._input_channels[channel - 1]]
+
     def get_current_output_states(self) -> List[bool]:
-        return self._output_channels
+        return self.modbus_controller.get_coil_states()
+
+    def set_pulse_limits(self, min_ms: Optional[int], max_ms: Optional[int]):
+        """Block-time limits of the product on the line; None clears a limit."""
+        self._min_pulse_sec = (min_ms or 0) / 1000.0
+        self._max_pulse_sec = max_ms / 1000.0 if max_ms else None
+        print(f"Modbus Poller: Sensor pulse limits set to min={min_ms}ms, max={max_ms}ms.")
+
+    def get_filter_stats(self) -> Dict[int, Dict[str, int]]:
+        return {channel: f.counters.snapshot() for channel, f in self._edge_filters.items()}
+
+    def current_interval_sec(self) -> float:
+        return self.polling_interval_sec if self._fast_mode else self.idle_polling_interval_sec
+
+    def get_poll_stats(self) -> Dict[str, Any]:
+        """Target vs achieved poll frequency and the number of overrun ticks."""
+        mean = self._tick_interval_ms.snapshot()["mean"]
+        return {
+            "mode": "fast" if self._fast_mode else "idle",
+            "target_hz": round(1.0 / self.current_interval_sec(), 2),
+            "achieved_hz": round(1000.0 / mean, 2) if mean else None,
+            "ticks": self._ticks,
+            "overruns": self._overruns,
+            "expired_polls": self._expired_polls,
+            "sensor_filters": self.get_filter_stats(),
+        }
 
     def start(self):
         if self._monitoring_task and not self._monitoring_task.done():
             return
-        print(f"Modbus Poller: Starting polling every {self.polling_interval_sec * 1000}ms.")
-        print(f"   -> Monitoring Entry Sensor on Channel: {self._sensor_config.ENTRY_CHANNEL}")
-        print(f"   -> Monitoring Exit Sensor on Channel:  {self._sensor_config.EXIT_CHANNEL}")
+        print(f"Modbus Poller: Starting polling every {self.polling_interval_sec * 1000}ms "
+              f"({self.idle_polling_interval_sec * 1000}ms while idle).")
+        for channel, role in sorted(self._channel_roles.items()):
+            print(f"   -> Monitoring {role.value} on Channel: {channel}")
         self._monitoring_task = asyncio.create_task(self._poll_hardware())
 
     async def stop(self):
-        if self._monitoring_task:
-            self._monitoring_task.cancel()
-            try:
-                await self._monitoring_task
-            except asyncio.CancelledError:
-                pass
+        for task in (self._monitoring_task, self._coil_reconcile_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+    def _start_coil_reconcile(self):
+        # Runs beside the poll loop so a coil read queued behind other bus traffic
+        # never delays the next input tick. At most one is in flight.
+        if self._coil_reconcile_task and not self._coil_reconcile_task.done():
+            return
+        self._coil_reconcile_task = asyncio.create_task(self._reconcile_coils())
+        self._next_coil_reconcile = time.monotonic() + self.coil_reconcile_interval_sec
+
+    async def _reconcile_coils(self):
+        try:
+            # Verifies the controller's coil shadow; adopts the device state on mismatch.
+            await self.modbus_controller.read_coils()
+        except Exception as e:
+            print(f"Modbus Poller: Coil reconcile failed: {e}")
+
+    def _process_inputs(self, inputs: List[bool], sampled_at: float):
+        word = 0
+        for index, level in enumerate(inputs):
+            if level:
+                word |= 1 << index
+        changed = ((word ^ self._last_word) & self._watch_mask) | self._pending_mask
+        self._last_word = word
+        pending = 0
+        while changed:
+            bit = changed & -changed  # Lowest changed channel.
+            changed ^= bit
+            channel = bit.bit_length()
+            role = self._channel_roles[channel]
+            product_sensor = role in (SensorRole.ENTRY, SensorRole.EXIT)
+            edge_filter = self._edge_filters[channel]
+            edge = edge_filter.update(
+                bool(word & bit), sampled_at, self._last_sampled_at, self._debounce_sec,
+                self._min_pulse_sec if product_sensor else 0.0,
+                self._max_pulse_sec if product_sensor else None
+            )
+            if edge is not None:
+                self._emit_edge(channel, role, edge)
+            if edge_filter.pending:
+                pending |= bit
+        self._pending_mask = pending
+        self._last_sampled_at = sampled_at
+
+    def _emit_edge(self, channel: int, role: SensorRole, edge: AcceptedEdge):
+        is_triggered = not edge.level  # NPN Logic Inversion
+        if self._verbose:
+            print(f"[Sensor Event] {role.value} (Channel {channel}): Raw={edge.level} -> {'TRIGGERED' if is_triggered else 'CLEARED'}"
+                  f"{f' after {edge.pulse_ms:.0f}ms' if edge.pulse_ms is not None else ''}")
+        if edge.too_long:
+            print(f"Modbus Poller: Channel {channel} was blocked for {edge.pulse_ms:.0f}ms, longer than the product maximum.")
+        event = SensorEvent(
+            sensor_id=channel,
+            new_state=SensorState.TRIGGERED if is_triggered else SensorState.CLEARED,
+            role=role,
+            timestamp=edge.timestamp,
+            pulse_ms=edge.pulse_ms
+        )
+        self.event_callback(event)
 
     async def _poll_hardware(self):
+        next_tick = time.monotonic()
+        last_tick: Optional[float] = None
         while True:
-            raw_inputs = await self.modbus_controller.read_digital_inputs()
-            raw_outputs = await self.modbus_controller.read_coils()
-
-            if raw_inputs is not None:
+            tick_started = time.monotonic()
+            if last_tick is not None:
+                self._tick_interval_ms.add((tick_started - last_tick) * 1000)
+            last_tick = tick_started
+            self._ticks += 1
+            sample = await self.modbus_controller.read_digital_inputs()
+            if sample is READ_EXPIRED:
+                # The read went stale behind higher-priority bus traffic. The link is
+                # fine, so keep the sensor state and just skip this sample.
+                self._expired_polls += 1
+            elif sample is not None:
                 if self._health_status != ModbusHealthStatus.OK:
                     print("Modbus Poller: Re-established connection to IO modules.")
                 self._health_status = ModbusHealthStatus.OK
-                self._input_channels = raw_inputs
-                
-                # Update output channels if read was successful
-                if raw_outputs is not None:
-                    self._output_channels = raw_outputs
-
-                # --- THE REWRITTEN LOGIC ---
-                # Convert 1-based config channels to 0-based list indices
-                entry_idx = self._sensor_config.ENTRY_CHANNEL - 1
-                exit_idx = self._sensor_config.EXIT_CHANNEL - 1
-
-                # Check Entry Sensor state if index is valid
-                if 0 <= entry_idx < len(self._input_channels):
-                    current_entry_state = self._input_channels[entry_idx]
-                    if current_entry_state != self._last_known_entry_state:
-                        is_triggered = not current_entry_state  # NPN Logic Inversion
-                        if self._verbose:
-                            print(f"[Sensor Event] Entry Sensor (Channel {entry_idx + 1}): Raw={current_entry_state} -> {'TRIGGERED' if is_triggered else 'CLEARED'}")
-                        event = SensorEvent(
-                            sensor_id=self._sensor_config.ENTRY_CHANNEL,
-                            new_state=SensorState.TRIGGERED if is_triggered else SensorState.CLEARED
-                        )
-                        asyncio.create_task(self.event_callback(event))
-                        self._last_known_entry_state = current_entry_state
-
-                # Check Exit Sensor state if index is valid
-                if 0 <= exit_idx < len(self._input_channels):
-                    current_exit_state = self._input_channels[exit_idx]
-                    if current_exit_state != self._last_known_exit_state:
-                        is_triggered = not current_exit_state  # NPN Logic Inversion
-                        if self._verbose:
-                            print(f"[Sensor Event] Exit Sensor (Channel {exit_idx + 1}): Raw={current_exit_state} -> {'TRIGGERED' if is_triggered else 'CLEARED'}")
-                        event = SensorEvent(
-                            sensor_id=self._sensor_config.EXIT_CHANNEL,
-                            new_state=SensorState.TRIGGERED if is_triggered else SensorState.CLEARED
-                        )
-                        asyncio.create_task(self.event_callback(event))
-                        self._last_known_exit_state = current_exit_state
-                # --- END OF REWRITTEN LOGIC ---
-                
+                self._input_channels = sample.bits
+
+                # Timestamped around the bus transaction itself, not the wait in the queue.
+                self._process_inputs(sample.bits, sample.sampled_at)
+
+                if time.monotonic() >= self._next_coil_reconcile:
+                    self._start_coil_reconcile()
+
             else:
                 if self._health_status == ModbusHealthStatus.OK:
                     print("Modbus Poller: Lost connection to IO modules.")
                 self._health_status = self.modbus_controller.health_status
                 
                 # If connection is lost, force sensors to a 'cleared' state
-                if not self._last_known_entry_state:
-                    self._last_known_entry_state = True
-                    event = SensorEvent(sensor_id=self._sensor_config.ENTRY_CHANNEL, new_state=SensorState.CLEARED)
-                    asyncio.create_task(self.event_callback(event))
-
-                if not self._last_known_exit_state:
-                    self._last_known_exit_state = True
-                    event = SensorEvent(sensor_id=self._sensor_config.EXIT_CHANNEL, new_state=SensorState.CLEARED)
-                    asyncio.create_task(self.event_callback(event))
+                for channel, edge_filter in self._edge_filters.items():
+                    if edge_filter.reset():
+                        event = SensorEvent(sensor_id=channel, new_state=SensorState.CLEARED, role=self._channel_roles[channel])
+                        self.event_callback(event)
+                self._last_word, self._pending_mask, self._last_sampled_at = self._idle_word, 0, None
 
-            await asyncio.sleep(self.polling_interval_sec)
\ No newline at end of file
+            fast_mode = self._line_active()
+            if fast_mode != self._fast_mode:
+                self._fast_mode = fast_mode
+                # Switch at once rather than finishing a long idle period, and
+                # measure the achieved rate for the new mode only.
+                next_tick = tick_started
+                self._tick_interval_ms.reset()
+                last_tick = None
+                if self._verbose:
+                    print(f"Modbus Poller: Switching to {'fast' if fast_mode else 'idle'} polling.")
+            next_tick += self.current_interval_sec()
+            now = time.monotonic()
+            if now > next_tick:
+                self._overruns += 1
+                next_tick = now
+            await asyncio.sleep(next_tick - now)
\ No newline at end of file
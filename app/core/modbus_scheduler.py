@@ -0,0 +1,203 @@
+"""
+Priority scheduler for transactions on the half-duplex RS-485 Modbus bus.
+
+Only one RTU request can be on the wire at a time, and the poller, buzzer
+manager, run start/stop, emergency stop and the manual output toggle all
+want the bus. Every transaction goes through one queue and a single worker
+executes them one after another, highest priority first:
+
+    EMERGENCY       emergency stop writes
+    INPUT_POLL      sensor input reads (edge latency depends on these)
+    ACTUATOR_WRITE  conveyor, gate, diverter, LEDs, buzzer
+    STATUS_READ     coil read-back and other informational reads
+
+A transaction may carry a deadline. If it is still queued when the deadline
+passes it is dropped and resolves to its failure value; a late input poll
+or status read is worthless, and the next one is already on its way.
+
+Transactions with the same coalescing key are merged while queued:
+- reads share a single bus transaction and all callers get its result;
+- writes to the same target are superseded by the newest one (only the
+  final value goes on the bus, the older callers get its result).
+
+Time spent waiting in the queue is measured per priority class.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.utils.metrics import Counters, RollingStats
+
+class TransactionPriority(IntEnum):
+    EMERGENCY = 0
+    INPUT_POLL = 1
+    ACTUATOR_WRITE = 2
+    STATUS_READ = 3
+
+class _Transaction:
+    __slots__ = ("priority", "operation", "failure_value", "deadline", "key", "merge", "future", "enqueued_at", "started")
+
+    def __init__(self, priority, operation, failure_value, deadline, key, merge, future):
+        self.priority = priority
+        self.operation = operation
+        self.failure_value = failure_value
+        self.deadline = deadline
+        self.key = key
+        self.merge = merge
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.started = False
+
+class ModbusTransactionScheduler:
+    MERGE_SHARE = "share"          # Identical reads: callers share one execution.
+    MERGE_SUPERSEDE = "supersede"  # Writes to one target: the newest value wins.
+
+    def __init__(self):
+        self._heap: List[Tuple[int, int, _Transaction]] = []
+        self._order = itertools.count()
+        self._pending: Dict[Hashable, _Transaction] = {}
+        # The transaction on the bus right now, if any.
+        self._current: Optional[_Transaction] = None
+        self._wakeup = asyncio.Event()
+        self._worker_task: Optional[asyncio.Task] = None
+        self.queue_wait_ms: Dict[TransactionPriority, RollingStats] = {p: RollingStats() for p in TransactionPriority}
+        self.counters = Counters("executed", "expired", "coalesced", "cancelled")
+
+    def start(self):
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._bus_worker())
+
+    def stop(self):
+        if self._worker_task and not self._worker_task.done():
+            self._worker_task.cancel()
+        self._fail_all_pending()
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, t in self._heap if not t.started and not t.future.done())
+
+    def submit(
+        self,
+        priority: TransactionPriority,
+        operation: Callable[[], Awaitable[Any]],
+        failure_value: Any = None,
+        deadline_sec: Optional[float] = None,
+        key: Optional[Hashable] = None,
+        merge: str = MERGE_SHARE,
+    ) -> "asyncio.Future":
+        """
+        Queues `operation` (a coroutine function doing exactly one bus transaction)
+        and returns a future with its result, or `failure_value` if it expired.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + deadline_sec if deadline_sec is not None else None
+
+        existing = self._pending.get(key) if key is not None else None
+        if existing is not None and not existing.started and not existing.future.done():
+            self.counters.inc("coalesced")
+            if merge == self.MERGE_SHARE:
+                if priority < existing.priority:
+                    existing.priority = priority
+                    self._push(existing)
+                if deadline is None or (existing.deadline is not None and deadline > existing.deadline):
+                    existing.deadline = deadline
+                return existing.future
+            # Supersede: the older caller gets the result of the newer write.
+            txn = _Transaction(min(priority, existing.priority), operation, failure_value, deadline, key, merge, loop.create_future())
+            txn.enqueued_at = existing.enqueued_at
+            existing.started = True  # Never executed.
+            _chain(txn.future, existing.future)
+        else:
+            txn = _Transaction(priority, operation, failure_value, deadline, key, merge, loop.create_future())
+
+        if key is not None:
+            self._pending[key] = txn
+        self._push(txn)
+        return txn.future
+
+    def _push(self, txn: _Transaction):
+        heapq.heappush(self._heap, (txn.priority, next(self._order), txn))
+        self._wakeup.set()
+
+    def _next_transaction(self) -> Optional[_Transaction]:
+        while self._heap:
+            _, _, txn = heapq.heappop(self._heap)
+            # Stale heap entries: priority upgrades push a transaction twice.
+            if txn.started or txn.future.done():
+                continue
+            return txn
+        return None
+
+    async def _bus_worker(self):
+        while True:
+            try:
+                txn = self._next_transaction()
+                if txn is None:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                txn.started = True
+                if txn.key is not None and self._pending.get(txn.key) is txn:
+                    del self._pending[txn.key]
+                now = time.monotonic()
+                self.queue_wait_ms[TransactionPriority(txn.priority)].add((now - txn.enqueued_at) * 1000)
+                if txn.deadline is not None and now > txn.deadline:
+                    self.counters.inc("expired")
+                    if not txn.future.done():
+                        txn.future.set_result(txn.failure_value)
+                    continue
+                self._current = txn
+                try:
+                    result = await txn.operation()
+                except Exception as e:
+                    if not txn.future.done():
+                        txn.future.set_exception(e)
+                    continue
+                finally:
+                    self._current = None
+                self.counters.inc("executed")
+                if not txn.future.done():
+                    txn.future.set_result(result)
+            except asyncio.CancelledError:
+                # Cancelled mid-transaction: its callers must not wait forever.
+                self._fail(txn)
+                break
+            except Exception as e:
+                print(f"Error in Modbus scheduler: {e}")
+
+    def _fail(self, txn: Optional[_Transaction]):
+        if txn is not None and not txn.future.done():
+            self.counters.inc("cancelled")
+            txn.future.set_result(txn.failure_value)
+
+    def _fail_all_pending(self):
+        """Resolves the in-flight transaction and everything queued with their failure values."""
+        self._fail(self._current)
+        self._current = None
+        for _, _, txn in self._heap:
+            self._fail(txn)
+        self._heap.clear()
+        self._pending.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth(),
+            "counters": self.counters.snapshot(),
+            "queue_wait_ms": {p.name.lower(): stats.snapshot() for p, stats in self.queue_wait_ms.items()},
+        }
+
+def _chain(source: "asyncio.Future", target: "asyncio.Future"):
+    """Completes `target` with the outcome of `source`."""
+    def _copy(f: "asyncio.Future"):
+        if target.done():
+            return
+        if f.cancelled():
+            target.cancel()
+        elif f.exception() is not None:
+            target.set_exception(f.exception())
+        else:
+            target.set_result(f.result())
+    source.add_done_callback(_copy)
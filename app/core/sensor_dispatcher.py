@@ -0,0 +1,85 @@
+"""
+Ordered hand-off of sensor events from the Modbus poller to their handler.
+
+The poller must never wait for the handler (it would delay the next poll), but
+the handler must see each sensor's edges one at a time and in order: an entry
+CLEARED must not overtake its TRIGGERED while the first is still being
+handled. Events therefore go into one FIFO drained by a single consumer task.
+Handlers keep their per-edge work short and start background tasks for slow
+work (capture, database), see AsyncDetectionService.
+
+The backlog is bounded. When it is full, new product-sensor events are dropped
+and counted; e-stop and door interlock events are always queued.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Coroutine, Deque, Dict, Optional, Tuple
+
+from app.utils.metrics import Counters, RollingStats
+from .sensor_events import SensorEvent, SensorRole
+
+SensorEventHandler = Callable[[SensorEvent], Coroutine[None, None, None]]
+
+_NEVER_DROPPED = (SensorRole.ESTOP, SensorRole.DOOR_INTERLOCK)
+
+class AsyncSensorEventDispatcher:
+    def __init__(self, handler: SensorEventHandler, max_backlog: int = 256):
+        self._handler = handler
+        self._max_backlog = max_backlog
+        self._queue: Deque[Tuple[float, SensorEvent]] = deque()
+        self._wakeup = asyncio.Event()
+        self._worker_task: Optional[asyncio.Task] = None
+        # Enqueue to handler start, and time spent in the handler.
+        self.dispatch_latency_ms = RollingStats()
+        self.handler_ms = RollingStats()
+        self.max_depth = 0
+        self.counters = Counters("dispatched", "dropped", "handler_errors")
+
+    def start(self):
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._dispatch_worker())
+
+    def stop(self):
+        if self._worker_task and not self._worker_task.done():
+            self._worker_task.cancel()
+
+    def dispatch(self, event: SensorEvent):
+        """Queues an event without waiting. Safe to call from the poll loop."""
+        if len(self._queue) >= self._max_backlog and event.role not in _NEVER_DROPPED:
+            self.counters.inc("dropped")
+            print(f"Sensor Dispatcher WARNING: Backlog full ({self._max_backlog}); dropped channel {event.sensor_id} {event.new_state.value} event.")
+            return
+        self._queue.append((time.monotonic(), event))
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._wakeup.set()
+
+    async def _dispatch_worker(self):
+        while True:
+            try:
+                if not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                queued_at, event = self._queue.popleft()
+                started = time.monotonic()
+                self.dispatch_latency_ms.add((started - queued_at) * 1000)
+                try:
+                    await self._handler(event)
+                except Exception as e:
+                    self.counters.inc("handler_errors")
+                    print(f"Error handling sensor event {event}: {e}")
+                self.handler_ms.add((time.monotonic() - started) * 1000)
+                self.counters.inc("dispatched")
+            except asyncio.CancelledError:
+                break
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "max_backlog": self._max_backlog,
+            "counters": self.counters.snapshot(),
+            "dispatch_latency_ms": self.dispatch_latency_ms.snapshot(),
+            "handler_ms": self.handler_ms.snapshot(),
+        }
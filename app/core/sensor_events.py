@@ -5,6 +5,7 @@ and Enums for clear state representation.
 """
 import time
 from enum import Enum
+from typing import Dict, Optional
 from pydantic import BaseModel, Field
 
 class SensorState(str, Enum):
@@ -12,8 +13,38 @@ class SensorState(str, Enum):
     TRIGGERED = "triggered" # Object detected
     CLEARED = "cleared"   # No object detected
 
+class SensorRole(str, Enum):
+    """What a sensor input is wired to. Set per channel in SENSORS_*_CHANNEL."""
+    ENTRY = "entry"
+    EXIT = "exit"
+    REJECT_CONFIRM = "reject_confirm"     # Confirms a rejected item left the line.
+    ESTOP = "estop"                       # Emergency stop button (stops the line, any mode).
+    DOOR_INTERLOCK = "door_interlock"     # Guard door switch (stops the line when opened).
+
+def channel_role_map(sensor_config) -> Dict[int, SensorRole]:
+    """1-based input channel -> role, from the sensor settings. Channel 0 means not wired."""
+    channels = {
+        SensorRole.ENTRY: sensor_config.ENTRY_CHANNEL,
+        SensorRole.EXIT: sensor_config.EXIT_CHANNEL,
+        SensorRole.REJECT_CONFIRM: sensor_config.REJECT_CONFIRM_CHANNEL,
+        SensorRole.ESTOP: sensor_config.ESTOP_CHANNEL,
+        SensorRole.DOOR_INTERLOCK: sensor_config.DOOR_INTERLOCK_CHANNEL,
+    }
+    roles: Dict[int, SensorRole] = {}
+    for role, channel in channels.items():
+        if not channel:
+            continue
+        if channel in roles:
+            raise ValueError(f"Input channel {channel} is assigned to both '{roles[channel].value}' and '{role.value}'.")
+        roles[channel] = role
+    return roles
+
 class SensorEvent(BaseModel):
     """Data model for a sensor state change event."""
     sensor_id: int
     new_state: SensorState
+    role: Optional[SensorRole] = None
+    # Estimated edge time (time.monotonic()); see edge_filter.py.
     timestamp: float = Field(default_factory=time.monotonic)
+    # For CLEARED events: how long the sensor was blocked.
+    pulse_ms: Optional[float] = None
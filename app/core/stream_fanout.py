@@ -0,0 +1,96 @@
+"""
+Shared, downscaled variants of the live camera stream.
+
+MJPEG clients can ask for a smaller frame width. Each distinct width is
+produced once per camera frame and the result is shared by every client
+that asked for that width, so ten dashboards at 640px cost one resize, not
+ten. Requested widths are rounded to a multiple of 16 (the JPEG block size)
+so near-identical requests share a variant.
+
+Downscaling decodes at the largest JPEG scale factor (1/2, 1/4, 1/8) that
+still covers the target width, so most of the reduction happens inside the
+decoder, then resizes the remainder and re-encodes.
+"""
+import asyncio
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.utils.jpeg_codec import JpegCodec, SUPPORTED_SCALES, jpeg_dimensions
+
+WIDTH_STEP = 16
+
+def normalize_width(width: Optional[int], min_width: int) -> Optional[int]:
+    """Rounds a requested width to the variant grid. None means full resolution."""
+    if not width:
+        return None
+    width = max(min_width, width)
+    return max(WIDTH_STEP, (width // WIDTH_STEP) * WIDTH_STEP)
+
+def decode_to_width(codec: JpegCodec, data: bytes, width: int) -> Optional[np.ndarray]:
+    """Decodes `data` at no more than `width` pixels wide (aspect ratio kept). Returns None on decode failure."""
+    dims = jpeg_dimensions(data)
+    scale = 1
+    if dims:
+        for candidate in SUPPORTED_SCALES:
+            if dims[0] // candidate >= width:
+                scale = candidate
+    image = codec.decode(data, scale=scale)
+    if image is None:
+        return None
+    src_h, src_w = image.shape[:2]
+    if src_w > width:
+        height = max(1, round(src_h * width / src_w))
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    return image
+
+def downscale_jpeg(codec: JpegCodec, data: bytes, width: int, quality: int) -> Optional[bytes]:
+    """Returns `data` re-encoded at `width` pixels wide (aspect ratio kept). Returns None on decode failure."""
+    image = decode_to_width(codec, data, width)
+    return codec.encode(image, quality) if image is not None else None
+
+class StreamVariantCache:
+    """Latest downscaled frame per requested width for one camera."""
+    def __init__(self, codec: JpegCodec, quality: int):
+        self._codec = codec
+        self._quality = quality
+        self._variants: Dict[int, Tuple[int, bytes]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._subscribers: Dict[int, int] = {}
+
+    def subscribe(self, width: Optional[int]):
+        if width is not None:
+            self._subscribers[width] = self._subscribers.get(width, 0) + 1
+
+    def unsubscribe(self, width: Optional[int]):
+        if width is None or width not in self._subscribers:
+            return
+        self._subscribers[width] -= 1
+        if self._subscribers[width] <= 0:
+            # Nobody watches this width any more: drop its cached frame.
+            del self._subscribers[width]
+            self._variants.pop(width, None)
+            self._locks.pop(width, None)
+
+    def active_widths(self) -> Dict[int, int]:
+        return dict(self._subscribers)
+
+    async def get(self, seq: int, data: bytes, width: Optional[int]) -> bytes:
+        """Returns frame `seq` at `width`, producing it only if no client has done so yet."""
+        if width is None:
+            return data
+        dims = jpeg_dimensions(data)
+        if dims and dims[0] <= width:
+            return data
+        lock = self._locks.setdefault(width, asyncio.Lock())
+        async with lock:
+            cached = self._variants.get(width)
+            # A newer variant is just as good for a client that is behind.
+            if cached and cached[0] >= seq:
+                return cached[1]
+            variant = await asyncio.to_thread(downscale_jpeg, self._codec, data, width, self._quality)
+            if variant is None:
+                return data
+            self._variants[width] = (seq, variant)
+            return variant
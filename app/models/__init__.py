@@ -17,6 +17,7 @@ from .profiles import CameraProfile, ObjectProfile
 from .product import Product, ProductStatus
 from .operator import Operator, OperatorStatus
 from .run_log import RunLog, RunStatus
+from .capture import CaptureRecord
 
 
 __all__ = [
@@ -36,4 +37,5 @@ __all__ = [
     "OperatorStatus",
     "RunLog",
     "RunStatus",
+    "CaptureRecord",
 ]
\ No newline at end of file
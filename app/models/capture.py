@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from sqlalchemy import Integer, String, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .database import Base
+
+class CaptureRecord(Base):
+    """
+    One saved capture image. The gallery and ZIP export query this table
+    (newest-first by camera) instead of listing and stat()-ing the captures
+    directory on every request.
+    """
+    __tablename__ = "capture_records"
+    __table_args__ = (
+        UniqueConstraint("camera_id", "filename", name="uq_capture_records_camera_filename"),
+        Index("ix_capture_records_camera_captured_at", "camera_id", "captured_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    camera_id: Mapped[str] = mapped_column(String(32))
+    filename: Mapped[str] = mapped_column(String(255))
+    # Local wall-clock time (file mtime), matching the gallery's date filters.
+    captured_at: Mapped[datetime] = mapped_column(DateTime)
+    size_bytes: Mapped[int] = mapped_column(Integer, default=0)
+
+    @property
+    def web_path(self) -> str:
+        return f"/captures/{self.camera_id}/{self.filename}"
+
+    def __repr__(self) -> str:
+        return f"<CaptureRecord(id={self.id}, camera_id='{self.camera_id}', filename='{self.filename}')>"
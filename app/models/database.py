@@ -9,6 +9,8 @@ from sqlalchemy.ext.asyncio import (
     AsyncSession,
     AsyncAttrs
 )
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import DeclarativeBase
 from config import settings
 
@@ -54,4 +56,29 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     Ensures the session is always closed, even if errors occur.
     """
     async with AsyncSessionFactory() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+# Nullable columns added to existing tables after their first release. create_all()
+# never alters a table that already exists, so upgraded installs need these added.
+ADDED_COLUMNS = {
+    "camera_profiles": ("roi_x", "roi_y", "roi_width", "roi_height"),
+}
+
+def add_missing_columns(conn: Connection):
+    """
+    Adds the ADDED_COLUMNS that an existing database lacks. Runs on every
+    startup after create_all(); columns that already exist are left alone.
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table_name, column_names in ADDED_COLUMNS.items():
+        if table_name not in existing_tables:
+            continue
+        table = Base.metadata.tables[table_name]
+        present = {column["name"] for column in inspector.get_columns(table_name)}
+        for name in column_names:
+            if name in present:
+                continue
+            column_type = table.columns[name].type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}"))
+            print(f"Database migration: added column {table_name}.{name}.")
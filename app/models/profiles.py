@@ -3,7 +3,7 @@ NEW: Database models for storing dynamic camera and object profiles.
 This allows for on-the-fly management of "recipes" for different
 production runs.
 """
-from typing import Optional
+from typing import List, Optional
 from sqlalchemy import Integer, String, Boolean, Float, Text, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -27,9 +27,23 @@ class CameraProfile(Base):
     white_balance_temp: Mapped[int] = mapped_column(Integer, default=0)
     brightness: Mapped[int] = mapped_column(Integer, default=128)
     autofocus: Mapped[bool] = mapped_column(Boolean, default=True)
+
+    # Optional region of interest as fractions (0-1) of the frame. The camera
+    # services crop to it before encoding, so only the conveyor lane is
+    # published, saved and sent for inference. NULL means the full frame.
+    roi_x: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    roi_y: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    roi_width: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    roi_height: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
+    @property
+    def roi(self) -> Optional[List[float]]:
+        """[x, y, width, height] as sent to the camera services, or None for the full frame."""
+        values = [self.roi_x, self.roi_y, self.roi_width, self.roi_height]
+        return None if any(v is None for v in values) else values
+
     def __repr__(self) -> str:
         return f"<CameraProfile(id={self.id}, name='{self.name}')>"
 
@@ -7,12 +7,23 @@ for the CameraProfile and ObjectProfile models.
 These schemas define the expected request and response bodies for the
 profile management API endpoints.
 """
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from typing import Optional
 from .products import ProductOut
 
 # --- CameraProfile Schemas ---
 
+def roi_error(x: Optional[float], y: Optional[float], width: Optional[float], height: Optional[float]) -> Optional[str]:
+    """Returns why a region of interest is invalid, or None if it is valid (or unset)."""
+    values = [x, y, width, height]
+    if any(v is None for v in values):
+        if any(v is not None for v in values):
+            return "roi_x, roi_y, roi_width and roi_height must be given together."
+        return None
+    if x + width > 1 or y + height > 1:
+        return "The region of interest must lie inside the frame."
+    return None
+
 class CameraProfileBase(BaseModel):
     name: str
     exposure: int = 0
@@ -20,8 +31,20 @@ class CameraProfileBase(BaseModel):
     white_balance_temp: int = 0
     brightness: int = 128
     autofocus: bool = True
+    # Region of interest as fractions of the frame; all four or none.
+    roi_x: Optional[float] = Field(None, ge=0, le=1)
+    roi_y: Optional[float] = Field(None, ge=0, le=1)
+    roi_width: Optional[float] = Field(None, gt=0, le=1)
+    roi_height: Optional[float] = Field(None, gt=0, le=1)
     description: Optional[str] = None
 
+    @model_validator(mode="after")
+    def check_roi(self):
+        error = roi_error(self.roi_x, self.roi_y, self.roi_width, self.roi_height)
+        if error:
+            raise ValueError(error)
+        return self
+
 class CameraProfileCreate(CameraProfileBase):
     pass
 
@@ -38,8 +61,22 @@ class CameraProfileUpdate(BaseModel):
     
     brightness: Optional[int] = None
     autofocus: Optional[bool] = None
+    roi_x: Optional[float] = Field(None, ge=0, le=1)
+    roi_y: Optional[float] = Field(None, ge=0, le=1)
+    roi_width: Optional[float] = Field(None, gt=0, le=1)
+    roi_height: Optional[float] = Field(None, gt=0, le=1)
     description: Optional[str] = None
 
+    @model_validator(mode="after")
+    def check_roi_bounds(self):
+        # Completeness depends on the stored profile, so the endpoint checks the
+        # merged values; here only reject pairs that already overflow the frame.
+        if self.roi_x is not None and self.roi_width is not None and self.roi_x + self.roi_width > 1:
+            raise ValueError("The region of interest must lie inside the frame.")
+        if self.roi_y is not None and self.roi_height is not None and self.roi_y + self.roi_height > 1:
+            raise ValueError("The region of interest must lie inside the frame.")
+        return self
+
 class CameraProfileOut(CameraProfileBase):
     model_config = ConfigDict(from_attributes=True)
     id: int
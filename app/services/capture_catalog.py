@@ -0,0 +1,197 @@
+"""
+Indexed catalogue of saved capture images.
+
+AsyncCameraManager reports every file it saves; the catalogue batches those
+into `capture_records` rows from a background worker so the capture path
+never waits on the database. The gallery and ZIP export then page and
+filter by (camera_id, captured_at) through an index instead of globbing and
+stat()-ing the captures directory on every request.
+
+On startup each camera directory is reconciled once against the table
+(in a worker thread), which backfills captures saved before the catalogue
+existed and drops rows for files removed by hand.
+"""
+import asyncio
+from datetime import datetime
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from app.models.capture import CaptureRecord
+
+class _PendingCapture(NamedTuple):
+    camera_id: str
+    filename: str
+    captured_at: datetime
+    size_bytes: int
+
+class PageCursor(NamedTuple):
+    """Position of the last capture on a gallery page; the next page starts after it."""
+    captured_at: datetime
+    id: int
+
+    def encode(self) -> str:
+        return f"{self.captured_at.isoformat()}_{self.id}"
+
+    @classmethod
+    def decode(cls, value: str) -> "PageCursor":
+        """Raises ValueError for a malformed cursor."""
+        captured_at, _, record_id = value.rpartition("_")
+        return cls(datetime.fromisoformat(captured_at), int(record_id))
+
+def _to_record(entry: _PendingCapture) -> CaptureRecord:
+    return CaptureRecord(camera_id=entry.camera_id, filename=entry.filename, captured_at=entry.captured_at, size_bytes=entry.size_bytes)
+
+def _scan_directory_sync(captures_dir: Path) -> List[_PendingCapture]:
+    camera_id = captures_dir.name
+    entries = []
+    for path in captures_dir.glob("*.jpg"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append(_PendingCapture(camera_id, path.name, datetime.fromtimestamp(stat.st_mtime), stat.st_size))
+    return entries
+
+class AsyncCaptureCatalog:
+    def __init__(self, db_session_factory, captures_dir: Path, camera_ids: List[str], batch_size: int = 50):
+        self._get_db_session = db_session_factory
+        self._captures_dir = Path(captures_dir)
+        self._camera_ids = camera_ids
+        self._batch_size = batch_size
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=1000)
+        self._worker_task: Optional[asyncio.Task] = None
+        self._backfill_task: Optional[asyncio.Task] = None
+        self._reconciled = set()
+
+    def start(self):
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._catalog_worker())
+        if self._backfill_task is None or self._backfill_task.done():
+            self._backfill_task = asyncio.create_task(self.reconcile_all())
+
+    def stop(self):
+        for task in (self._worker_task, self._backfill_task):
+            if task and not task.done():
+                task.cancel()
+
+    @property
+    def camera_ids(self) -> List[str]:
+        return list(self._camera_ids)
+
+    def covers(self, camera_id: str) -> bool:
+        """True once the camera's directory has been reconciled, so queries return complete results."""
+        return camera_id in self._reconciled
+
+    def record(self, camera_id: str, path: Path, size_bytes: int, captured_at: Optional[datetime] = None):
+        """Queues a newly saved capture for insertion. Never blocks."""
+        entry = _PendingCapture(camera_id, Path(path).name, captured_at or datetime.now(), size_bytes)
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            # The startup reconcile will pick the file up on the next restart.
+            print(f"Capture Catalog Warning: Queue is full. '{entry.filename}' will be indexed on next reconcile.")
+
+    async def _catalog_worker(self):
+        while True:
+            try:
+                batch = [await self._queue.get()]
+                while len(batch) < self._batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                await self._insert(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Error in capture catalog worker: {e}")
+
+    async def _insert(self, entries: List[_PendingCapture]):
+        async with self._get_db_session() as session:
+            session.add_all([_to_record(e) for e in entries])
+            try:
+                await session.commit()
+                return
+            except IntegrityError:
+                await session.rollback()
+        # A file was already indexed (live capture vs. startup reconcile): insert one by one, skipping duplicates.
+        for entry in entries:
+            async with self._get_db_session() as session:
+                session.add(_to_record(entry))
+                try:
+                    await session.commit()
+                except IntegrityError:
+                    await session.rollback()
+
+    async def reconcile_all(self):
+        for camera_id in self._camera_ids:
+            try:
+                await self.reconcile(camera_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Capture Catalog ERROR: Reconcile failed for '{camera_id}': {e}")
+
+    async def reconcile(self, camera_id: str):
+        """Brings the rows for one camera in line with the files on disk."""
+        captures_dir = self._captures_dir / camera_id
+        scan_started = datetime.now()
+        on_disk = await asyncio.to_thread(_scan_directory_sync, captures_dir) if captures_dir.is_dir() else []
+        async with self._get_db_session() as session:
+            result = await session.execute(
+                select(CaptureRecord.filename, CaptureRecord.captured_at).where(CaptureRecord.camera_id == camera_id)
+            )
+            indexed = {filename: captured_at for filename, captured_at in result.all()}
+            disk_names = {e.filename for e in on_disk}
+            missing = [e for e in on_disk if e.filename not in indexed]
+            # Rows recorded while the scan was running are not stale, just newer than the scan.
+            stale_names = [name for name, captured_at in indexed.items() if name not in disk_names and captured_at < scan_started]
+            # Chunked to stay under SQLite's bound-parameter limit.
+            for i in range(0, len(stale_names), 500):
+                await session.execute(delete(CaptureRecord).where(
+                    CaptureRecord.camera_id == camera_id, CaptureRecord.filename.in_(stale_names[i:i + 500])
+                ))
+            await session.commit()
+        if missing:
+            await self._insert(missing)
+        self._reconciled.add(camera_id)
+        if missing or stale_names:
+            print(f"[Capture Catalog] '{camera_id}': indexed {len(missing)} existing file(s), removed {len(stale_names)} stale row(s).")
+
+    async def list_page(
+        self, camera_id: str, page_size: int, after: Optional[PageCursor] = None
+    ) -> Tuple[List[CaptureRecord], bool, Optional[PageCursor]]:
+        """
+        Newest-first page of captures, starting after `after` (the previous page's
+        cursor). Keyset pagination on (captured_at, id) through the camera index,
+        so every page costs the same however deep the gallery is scrolled.
+        Returns (records, has_more, next_cursor).
+        """
+        query = select(CaptureRecord).where(CaptureRecord.camera_id == camera_id)
+        if after is not None:
+            # The outer <= keeps the condition a range scan on the index.
+            query = query.where(
+                CaptureRecord.captured_at <= after.captured_at,
+                or_(CaptureRecord.captured_at < after.captured_at, CaptureRecord.id < after.id)
+            )
+        async with self._get_db_session() as session:
+            result = await session.execute(
+                query.order_by(CaptureRecord.captured_at.desc(), CaptureRecord.id.desc()).limit(page_size + 1)
+            )
+            records = list(result.scalars().all())
+        has_more = len(records) > page_size
+        records = records[:page_size]
+        next_cursor = PageCursor(records[-1].captured_at, records[-1].id) if has_more else None
+        return records, has_more, next_cursor
+
+    async def list_range(self, camera_id: str, start: datetime, end: datetime) -> List[CaptureRecord]:
+        """All captures for a camera with start <= captured_at <= end, oldest first."""
+        async with self._get_db_session() as session:
+            result = await session.execute(
+                select(CaptureRecord)
+                .where(CaptureRecord.camera_id == camera_id, CaptureRecord.captured_at >= start, CaptureRecord.captured_at <= end)
+                .order_by(CaptureRecord.captured_at, CaptureRecord.id)
+            )
+            return list(result.scalars().all())
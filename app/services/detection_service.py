@@ -2,7 +2,7 @@ import asyncio
 import uuid
 import json
 from collections import deque
-from typing import Dict, Deque, List, Optional, Any, TYPE_CHECKING
+from typing import Dict, Deque, List, Optional, Any, Set, TYPE_CHECKING
 import httpx
 import cv2
 import numpy as np
@@ -12,15 +12,19 @@ from sqlalchemy.orm.attributes import flag_modified
 
 from app.core.modbus_controller import AsyncModbusController
 from app.core.camera_manager import AsyncCameraManager
-from app.core.sensor_events import SensorEvent, SensorState
+from app.core.sensor_events import SensorEvent, SensorRole, SensorState
 from app.models.detection import DetectionEventLog
 from config import settings
 from app.services.audio_service import AsyncAudioService
 from app.services.llm_service import LlmApiService
+from app.utils.jpeg_codec import get_jpeg_codec
+from app.core.capture_writer import write_bytes_sync
+from app.services.thumbnail_service import AsyncThumbnailService
 
 # --- FIX: Use TYPE_CHECKING to prevent circular import at runtime ---
 if TYPE_CHECKING:
     from app.services.orchestration_service import AsyncOrchestrationService, OperatingMode
+    from app.services.system_service import AsyncSystemService
 
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 
@@ -41,7 +45,7 @@ class QcApiService:
             return None
 
 class AsyncDetectionService:
-    def __init__(self, modbus_controller: AsyncModbusController, camera_manager: AsyncCameraManager, orchestration_service: "AsyncOrchestrationService", redis_client: redis.Redis, conveyor_settings, db_session_factory, active_camera_ids: List[str], audio_service: AsyncAudioService, llm_service: LlmApiService):
+    def __init__(self, modbus_controller: AsyncModbusController, camera_manager: AsyncCameraManager, orchestration_service: "AsyncOrchestrationService", redis_client: redis.Redis, conveyor_settings, db_session_factory, active_camera_ids: List[str], audio_service: AsyncAudioService, llm_service: LlmApiService, thumbnail_service: Optional[AsyncThumbnailService] = None):
         self._camera_manager = camera_manager
         self._orchestration = orchestration_service
         self._redis = redis_client
@@ -50,10 +54,17 @@ class AsyncDetectionService:
         self._active_camera_ids = active_camera_ids
         self._audio_service = audio_service
         self._llm_service = llm_service
+        self._thumbnail_service = thumbnail_service
         self._qc_api_service = QcApiService(base_url=settings.AI_API.BASE_URL)
         self._in_flight_objects: Deque[str] = deque()
         self._stalled_product_timers: Dict[str, asyncio.TimerHandle] = {}
         self._entry_sensor_is_blocked = False
+        self._background_tasks: Set[asyncio.Task] = set()
+        self._system_service: Optional["AsyncSystemService"] = None
+
+    def set_system_service(self, system_service: "AsyncSystemService"):
+        """The system service is created after this one; it performs safety stops."""
+        self._system_service = system_service
 
     def get_in_flight_count(self) -> int:
         return len(self._in_flight_objects)
@@ -75,7 +86,8 @@ class AsyncDetectionService:
             if not Path(image_path).exists():
                 print(f"ANNOTATION ERROR: Source image file not found at {image_path}")
                 return image_path
-            image = cv2.imread(image_path)
+            codec = get_jpeg_codec(settings.JPEG_CODEC)
+            image = codec.decode(Path(image_path).read_bytes())
             if image is None: return image_path
             
             original_path = Path(image_path)
@@ -94,7 +106,11 @@ class AsyncDetectionService:
                         cv2.putText(image, label, (contour[0][0], contour[0][1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (36, 255, 12), 2)
 
             save_path = str(annotated_dir / original_path.name)
-            cv2.imwrite(save_path, image)
+            annotated_bytes = codec.encode(image, settings.JPEG_QUALITY)
+            if not write_bytes_sync(Path(save_path), annotated_bytes):
+                return image_path
+            if self._thumbnail_service:
+                self._thumbnail_service.enqueue(Path(save_path), annotated_bytes)
             relative_path = Path(save_path).relative_to(PROJECT_ROOT / "web")
             return f"/{relative_path.as_posix()}"
         except Exception as e:
@@ -175,12 +191,60 @@ class AsyncDetectionService:
             "annotated_path": annotated_path, "results": analysis_summary
         }))
 
+    def _start_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _capture_and_log_item(self, serial_number: str, edge_time: float, active_run_id: Optional[int]):
+        try:
+            # Use the frame captured closest to the sensor edge plus the trigger offset,
+            # rather than sleeping and taking whichever frame arrives next. With burst
+            # capture enabled, the sharpest frame around that moment is used instead.
+            capture_time = edge_time + settings.CAMERA_TRIGGER_DELAY_MS / 1000.0
+            web_path, full_path, image_bytes = await self._camera_manager.capture_and_save_image(
+                self._active_camera_ids[0], f'event_{serial_number}', target_time=capture_time,
+                burst_size=settings.CAMERA_BURST_SIZE
+            )
+            
+            if active_run_id and web_path and full_path and image_bytes:
+                async with self._get_db_session() as session:
+                    new_event = DetectionEventLog(run_log_id=active_run_id, image_path=web_path, serial_number=serial_number)
+                    session.add(new_event); await session.commit(); await session.refresh(new_event)
+                    asyncio.create_task(self._run_qc_and_update_db(new_event.id, serial_number, web_path, full_path, image_bytes))
+        except Exception as e:
+            print(f"Error capturing item {serial_number}: {e}")
+
+    async def _safety_stop(self, reason: str):
+        """
+        E-stop / door interlock, in any mode: the outputs go off first (one FC15
+        frame at EMERGENCY priority), then the run is stopped (which also cancels
+        a pending next batch) and the alarm is raised.
+        """
+        print(f"SAFETY STOP: {reason}.")
+        if self._system_service:
+            await self._system_service.emergency_stop()
+        else:
+            print("Detection Service ERROR: No system service set; cannot switch outputs off directly.")
+        await self._orchestration.stop_run()
+        await self._orchestration.trigger_persistent_alarm(reason)
+
     async def handle_sensor_event(self, event: SensorEvent):
+        """
+        Called in edge order by the sensor dispatcher, one event at a time. Keep this
+        short: slow work is started with _start_background.
+        """
         from app.services.orchestration_service import OperatingMode
         
+        if event.role in (SensorRole.ESTOP, SensorRole.DOOR_INTERLOCK):
+            if event.new_state == SensorState.TRIGGERED:
+                reason = "Emergency stop pressed" if event.role == SensorRole.ESTOP else "Guard door opened"
+                await self._safety_stop(f"{reason} (input {event.sensor_id})")
+            return
+
         if self._orchestration.get_status()["mode"] != OperatingMode.RUNNING.value: return
 
-        if event.sensor_id == settings.SENSORS.ENTRY_CHANNEL:
+        if event.role == SensorRole.ENTRY:
             if event.new_state == SensorState.TRIGGERED and not self._entry_sensor_is_blocked:
                 self._entry_sensor_is_blocked = True
                 serial_number = str(uuid.uuid4())
@@ -193,21 +257,16 @@ class AsyncDetectionService:
                 
                 await self._orchestration.on_item_entered(serial_number)
                 
-                if settings.CAMERA_TRIGGER_DELAY_MS > 0: await asyncio.sleep(settings.CAMERA_TRIGGER_DELAY_MS / 1000.0)
-                
-                web_path, full_path, image_bytes = await self._camera_manager.capture_and_save_image(self._active_camera_ids[0], f'event_{serial_number}')
-                
-                active_run_id = self._orchestration.get_active_run_id()
-                if active_run_id and web_path and full_path and image_bytes:
-                    async with self._get_db_session() as session:
-                        new_event = DetectionEventLog(run_log_id=active_run_id, image_path=web_path, serial_number=serial_number)
-                        session.add(new_event); await session.commit(); await session.refresh(new_event)
-                        asyncio.create_task(self._run_qc_and_update_db(new_event.id, serial_number, web_path, full_path, image_bytes))
+                # Capture and logging wait on the camera and the database, so they run in
+                # the background; the dispatcher can deliver the next edge meanwhile.
+                self._start_background(self._capture_and_log_item(
+                    serial_number, event.timestamp, self._orchestration.get_active_run_id()
+                ))
 
             elif event.new_state == SensorState.CLEARED:
                 self._entry_sensor_is_blocked = False
 
-        elif event.sensor_id == settings.SENSORS.EXIT_CHANNEL and event.new_state == SensorState.TRIGGERED:
+        elif event.role == SensorRole.EXIT and event.new_state == SensorState.TRIGGERED:
             if self._in_flight_objects:
                 serial = self._in_flight_objects.popleft()
                 if serial in self._stalled_product_timers:
@@ -11,6 +11,7 @@ from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
 from app.core.modbus_controller import AsyncModbusController
+from app.core.sensor_events import SensorRole
 from app.models.profiles import ObjectProfile
 from app.models.run_log import RunLog, RunStatus
 from app.models.operator import Operator
@@ -22,6 +23,7 @@ from app.websocket.connection_manager import manager as websocket_manager
 
 if TYPE_CHECKING:
     from app.services.detection_service import AsyncDetectionService
+    from app.core.modbus_poller import AsyncModbusPoller
 
 class OperatingMode(str, Enum):
     STOPPED = "Stopped"
@@ -30,6 +32,9 @@ class OperatingMode(str, Enum):
     PAUSED_BETWEEN_BATCHES = "Paused (Between Batches)"
     POST_RUN_DELAY = "Post-Run Delay"
 
+# Inputs that must be released before a run may start.
+_START_INTERLOCKS = {SensorRole.ESTOP: "emergency stop is pressed", SensorRole.DOOR_INTERLOCK: "guard door is open"}
+
 def _get_summary_from_llm_response(llm_response: Dict[str, Any]) -> str | None:
     try:
         return llm_response['analysis']['plain_text_summary']
@@ -60,12 +65,16 @@ class AsyncOrchestrationService:
         self._output_map = self._settings.OUTPUTS
         self._completion_task: Optional[asyncio.Task] = None
         self._detection_service: Optional["AsyncDetectionService"] = None
+        self._modbus_poller: Optional["AsyncModbusPoller"] = None
         self._buzzer_queue = asyncio.Queue()
         self._buzzer_task: Optional[asyncio.Task] = None
 
     def set_detection_service(self, detection_service: "AsyncDetectionService"):
         self._detection_service = detection_service
 
+    def set_modbus_poller(self, modbus_poller: "AsyncModbusPoller"):
+        self._modbus_poller = modbus_poller
+
     def beep_for(self, duration_ms: int):
         if duration_ms > 0:
             try: self._buzzer_queue.put_nowait(duration_ms)
@@ -100,11 +109,11 @@ class AsyncOrchestrationService:
         if self._completion_task and not self._completion_task.done(): self._completion_task.cancel()
 
     async def initialize_hardware_state(self):
-        await asyncio.gather(
-            self._io.write_coil(self._output_map.CONVEYOR, False),
-            self._io.write_coil(self._output_map.LED_GREEN, False),
-            self._io.write_coil(self._output_map.LED_RED, True)
-        )
+        await self._io.write_outputs({
+            self._output_map.CONVEYOR: False,
+            self._output_map.LED_GREEN: False,
+            self._output_map.LED_RED: True,
+        })
 
     def get_active_run_id(self) -> Optional[int]: return self._active_run_id
     
@@ -182,6 +191,12 @@ class AsyncOrchestrationService:
             return await self._execute_start_sequence()
             
     async def _execute_start_sequence(self) -> bool:
+        if self._modbus_poller:
+            held = [_START_INTERLOCKS[r] for r in self._modbus_poller.triggered_roles() if r in _START_INTERLOCKS]
+            if held:
+                await self._trigger_persistent_alarm_nolock(f"Failed to start: {' and '.join(held)}.")
+                return False
+
         async with self._get_db_session() as session:
             result = await session.execute(select(ObjectProfile).options(selectinload(ObjectProfile.camera_profile), selectinload(ObjectProfile.product)).where(ObjectProfile.id == self._run_profile_id))
             profile = result.scalar_one_or_none()
@@ -206,18 +221,23 @@ class AsyncOrchestrationService:
         
         self._active_profile = profile
         await self._acknowledge_alarm_nolock()
+        if self._modbus_poller:
+            self._modbus_poller.set_pulse_limits(profile.product.min_sensor_block_time_ms, profile.product.max_sensor_block_time_ms)
         
         cam_settings = profile.camera_profile
-        settings_payload = {"autofocus": cam_settings.autofocus, "exposure": cam_settings.exposure, "gain": cam_settings.gain, "white_balance_temp": cam_settings.white_balance_temp, "brightness": cam_settings.brightness}
+        settings_payload = {"autofocus": cam_settings.autofocus, "exposure": cam_settings.exposure, "gain": cam_settings.gain, "white_balance_temp": cam_settings.white_balance_temp, "brightness": cam_settings.brightness, "roi": cam_settings.roi}
         command = {"action": "apply_settings", "settings": settings_payload}
         for cam_id in ACTIVE_CAMERA_IDS:
             await self._redis.publish(f"camera:commands:{cam_id}", json.dumps(command))
         
         self._current_count = 0
         self._mode = OperatingMode.RUNNING
-        await self._io.write_coil(self._output_map.LED_RED, False)
-        await self._io.write_coil(self._output_map.LED_GREEN, True)
-        await self._io.write_coil(self._output_map.CONVEYOR, True)
+        # One FC15 frame, so the lamps and the conveyor switch together.
+        await self._io.write_outputs({
+            self._output_map.LED_RED: False,
+            self._output_map.LED_GREEN: True,
+            self._output_map.CONVEYOR: True,
+        })
         return True
 
     async def _update_run_log_status(self, status: RunStatus):
@@ -305,8 +325,13 @@ class AsyncOrchestrationService:
             
             await self.initialize_hardware_state()
             if self._detection_service: await self._detection_service.reset_state()
+            if self._modbus_poller: self._modbus_poller.set_pulse_limits(None, None)
             print("Orchestration: System stopped and reset.")
 
+    def is_line_active(self) -> bool:
+        """True while product is moving through the line (cameras should publish at full rate)."""
+        return self._mode in (OperatingMode.RUNNING, OperatingMode.POST_RUN_DELAY)
+
     def get_status(self) -> dict:
         return {
             "mode": self._mode.value,
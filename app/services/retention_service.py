@@ -0,0 +1,301 @@
+"""
+Disk-budget retention for saved captures.
+
+The captures directory lives on the SD card and otherwise grows until the
+card is full, at which point every write in the capture path slows down.
+This service runs in the background and, every RETENTION_INTERVAL_SEC:
+
+  1. Evicts captures older than RETENTION_MAX_AGE_DAYS.
+  2. Evicts the oldest captures until the catalogued captures fit in
+     RETENTION_MAX_CAPTURES_GB and the card has RETENTION_MIN_FREE_PERCENT free.
+     Free space is only chased up to the size of the catalogued captures, and
+     not at all when the cold directory is on the same filesystem (moving a
+     file there frees nothing).
+  3. Deletes cold-tier files older than RETENTION_COLD_MAX_AGE_DAYS.
+
+"Evict" means delete, or, when RETENTION_COLD_DIR is set, move to the cold
+directory (optionally re-encoded at a lower quality). The capture's
+annotated copy and thumbnails go with it:
+
+    captures/rpi/event_X.jpg            -> cold/rpi/event_X.jpg
+    captures/rpi/annotated/event_X.jpg  -> cold/rpi/annotated/event_X.jpg
+    captures/rpi/thumbs/event_X.*          (deleted)
+
+Candidates come from the capture catalogue, oldest first, so no directory
+walk is needed for the hot tier. DetectionEventLog rows that point at an
+evicted image are rewritten to its /cold/ web path, or cleared if deleted,
+so run history never links to a missing file.
+
+File work happens in a worker thread, one file at a time, and is paced to
+RETENTION_IO_MAX_MBPS so retention never competes with live captures for
+the card's write bandwidth.
+"""
+import asyncio
+import os
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+
+from app.core.capture_writer import write_bytes_sync
+from app.models.capture import CaptureRecord
+from app.models.detection import DetectionEventLog
+from app.services.thumbnail_service import thumbnail_path
+from app.utils.jpeg_codec import JpegCodec
+
+ANNOTATED_DIR_NAME = "annotated"
+COLD_WEB_PREFIX = "/cold"
+_THUMBNAIL_SUFFIXES = (".jpg", ".webp")
+
+class EvictionResult(NamedTuple):
+    bytes_freed: int
+    removed: bool           # The capture is no longer in the hot tier.
+    moved: bool             # ...because it is now in the cold tier.
+    annotated_moved: bool
+
+def _remove_thumbnails(image_path: Path):
+    for suffix in _THUMBNAIL_SUFFIXES:
+        try:
+            thumbnail_path(image_path, suffix).unlink()
+        except FileNotFoundError:
+            pass
+
+def _move_file_sync(source: Path, target: Path, codec: Optional[JpegCodec], quality: int) -> bool:
+    """
+    Moves `source` to `target`, re-encoding at `quality` when it is non-zero and
+    makes the file smaller. The source is only removed once the target is complete.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if quality and codec is not None:
+        data = source.read_bytes()
+        image = codec.decode(data)
+        if image is not None:
+            smaller = codec.encode(image, quality)
+            if len(smaller) < len(data):
+                data = smaller
+        if not write_bytes_sync(target, data):
+            return False
+    else:
+        try:
+            os.replace(source, target)
+            return True
+        except OSError:
+            # Different filesystem: copy to a temporary name, then rename into place.
+            temp = target.with_name(target.name + ".part")
+            shutil.copyfile(source, temp)
+            os.replace(temp, target)
+    source.unlink()
+    return True
+
+def evict_capture_sync(
+    image_path: Path, cold_dir: Optional[Path], codec: Optional[JpegCodec] = None, quality: int = 0
+) -> EvictionResult:
+    """
+    Deletes one capture (or moves it under `cold_dir`/<camera_id>/) together with
+    its annotated copy and thumbnails. Returns the bytes freed in the hot tier.
+    """
+    annotated_path = image_path.parent / ANNOTATED_DIR_NAME / image_path.name
+    bytes_freed = 0
+    moved = {image_path: False, annotated_path: False}
+    for path in (image_path, annotated_path):
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            continue
+        if cold_dir is not None:
+            relative = path.relative_to(image_path.parent.parent)
+            try:
+                moved[path] = _move_file_sync(path, cold_dir / relative, codec, quality)
+            except OSError as e:
+                print(f"RETENTION ERROR: Failed to move '{path}' to cold storage: {e}")
+                continue
+            if not moved[path]:
+                continue
+        else:
+            path.unlink()
+        bytes_freed += size
+        _remove_thumbnails(path)
+    removed = not image_path.exists()
+    return EvictionResult(bytes_freed, removed, moved[image_path], moved[annotated_path])
+
+def same_filesystem_sync(a: Path, b: Path) -> bool:
+    """True if `a` and `b` (or their nearest existing ancestors) are on the same device."""
+    def device(path: Path) -> int:
+        path = path.resolve()
+        while not path.exists() and path != path.parent:
+            path = path.parent
+        return path.stat().st_dev
+    return device(a) == device(b)
+
+def find_expired_cold_files_sync(cold_dir: Path, cutoff: datetime) -> List[Path]:
+    """Original (non-annotated) cold captures last modified before `cutoff`."""
+    cutoff_ts = cutoff.timestamp()
+    expired = []
+    for camera_dir in (p for p in cold_dir.iterdir() if p.is_dir()):
+        for path in camera_dir.glob("*.jpg"):
+            try:
+                if path.stat().st_mtime < cutoff_ts:
+                    expired.append(path)
+            except OSError:
+                continue
+    return expired
+
+class AsyncRetentionService:
+    def __init__(
+        self, db_session_factory, capture_catalog, captures_dir: Path, codec: JpegCodec,
+        max_captures_gb: float = 0, max_age_days: int = 0, min_free_percent: float = 0,
+        cold_dir: Optional[Path] = None, cold_jpeg_quality: int = 0, cold_max_age_days: int = 0,
+        io_max_mbps: float = 4.0, interval_sec: int = 300, batch_size: int = 50
+    ):
+        self._get_db_session = db_session_factory
+        self._catalog = capture_catalog
+        self._captures_dir = Path(captures_dir)
+        self._codec = codec
+        self._max_bytes = int(max_captures_gb * 1024 ** 3)
+        self._max_age_days = max_age_days
+        self._min_free_percent = min_free_percent
+        self._cold_dir = Path(cold_dir) if cold_dir else None
+        self._cold_jpeg_quality = cold_jpeg_quality
+        self._cold_max_age_days = cold_max_age_days
+        self._io_bytes_per_sec = io_max_mbps * 1024 ** 2
+        self._interval_sec = interval_sec
+        self._batch_size = batch_size
+        self._worker_task: Optional[asyncio.Task] = None
+        self._warned_same_filesystem = False
+
+    def start(self):
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._retention_worker())
+
+    def stop(self):
+        if self._worker_task and not self._worker_task.done():
+            self._worker_task.cancel()
+
+    async def _retention_worker(self):
+        while True:
+            try:
+                await asyncio.sleep(self._interval_sec)
+                await self.run_once()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Error in retention worker: {e}")
+
+    async def run_once(self) -> Dict[str, int]:
+        """One retention pass. Returns what was evicted."""
+        stats = {"evicted": 0, "bytes_freed": 0, "cold_deleted": 0}
+        camera_ids = [c for c in self._catalog.camera_ids if self._catalog.covers(c)]
+        if camera_ids:
+            # Moving a capture to a cold directory on the same filesystem frees no space.
+            frees_space = self._cold_dir is None or not await asyncio.to_thread(same_filesystem_sync, self._captures_dir, self._cold_dir)
+            if self._max_age_days > 0:
+                cutoff = datetime.now() - timedelta(days=self._max_age_days)
+                await self._evict_oldest(camera_ids, stats, frees_space, older_than=cutoff)
+            over_budget, space_needed = await self._bytes_over_budget(camera_ids, frees_space)
+            if over_budget > 0 or space_needed > 0:
+                await self._evict_oldest(camera_ids, stats, frees_space, over_budget=over_budget, space_needed=space_needed)
+        if self._cold_dir is not None and self._cold_max_age_days > 0 and self._cold_dir.is_dir():
+            stats["cold_deleted"] = await self._prune_cold_tier()
+        if any(stats.values()):
+            action = "moved to cold storage" if self._cold_dir else "deleted"
+            print(f"[Retention] {stats['evicted']} capture(s) {action} ({stats['bytes_freed'] / 1024 ** 2:.1f} MB freed), "
+                  f"{stats['cold_deleted']} cold capture(s) expired.")
+        return stats
+
+    async def _bytes_over_budget(self, camera_ids: List[str], frees_space: bool) -> Tuple[int, int]:
+        """
+        Returns (catalogued bytes over RETENTION_MAX_CAPTURES_GB, disk bytes to free
+        for RETENTION_MIN_FREE_PERCENT). Captures can only make room they take up,
+        so the second is capped at their total size.
+        """
+        if self._max_bytes <= 0 and self._min_free_percent <= 0:
+            return 0, 0
+        async with self._get_db_session() as session:
+            used = await session.scalar(
+                select(func.coalesce(func.sum(CaptureRecord.size_bytes), 0)).where(CaptureRecord.camera_id.in_(camera_ids))
+            )
+        over_budget = max(0, used - self._max_bytes) if self._max_bytes > 0 else 0
+        space_needed = 0
+        if self._min_free_percent > 0:
+            if frees_space:
+                usage = await asyncio.to_thread(shutil.disk_usage, self._captures_dir)
+                space_needed = min(used, max(0, int(usage.total * self._min_free_percent / 100) - usage.free))
+            elif not self._warned_same_filesystem:
+                self._warned_same_filesystem = True
+                print("RETENTION WARNING: RETENTION_COLD_DIR is on the captures filesystem; RETENTION_MIN_FREE_PERCENT is ignored.")
+        return over_budget, space_needed
+
+    async def _evict_oldest(
+        self, camera_ids: List[str], stats: Dict[str, int], frees_space: bool,
+        older_than: Optional[datetime] = None, over_budget: int = 0, space_needed: int = 0
+    ):
+        # Hot-tier bytes count against the capture budget; only bytes that leave
+        # the filesystem count towards free space.
+        removed_bytes = freed = 0
+        def satisfied() -> bool:
+            return older_than is None and removed_bytes >= over_budget and freed >= space_needed
+        while not satisfied():
+            query = select(CaptureRecord).where(CaptureRecord.camera_id.in_(camera_ids))
+            if older_than is not None:
+                query = query.where(CaptureRecord.captured_at < older_than)
+            async with self._get_db_session() as session:
+                result = await session.execute(query.order_by(CaptureRecord.captured_at, CaptureRecord.id).limit(self._batch_size))
+                records = list(result.scalars().all())
+            if not records:
+                return
+            evicted = []
+            for record in records:
+                if satisfied():
+                    break
+                image_path = self._captures_dir / record.camera_id / record.filename
+                result = await asyncio.to_thread(evict_capture_sync, image_path, self._cold_dir, self._codec, self._cold_jpeg_quality)
+                await self._throttle(result.bytes_freed)
+                if result.removed:
+                    evicted.append((record, result))
+                    removed_bytes += result.bytes_freed
+                    stats["evicted"] += 1
+                    if frees_space:
+                        freed += result.bytes_freed
+                        stats["bytes_freed"] += result.bytes_freed
+            if not evicted:
+                # Nothing could be moved (e.g. cold directory unavailable); retry next interval.
+                return
+            await self._forget(evicted)
+
+    async def _throttle(self, nbytes: int):
+        # Pace file I/O so retention never saturates the card's write bandwidth.
+        if nbytes:
+            await asyncio.sleep(nbytes / self._io_bytes_per_sec)
+
+    async def _forget(self, evicted: List[Tuple[CaptureRecord, EvictionResult]]):
+        """Drops the catalogue rows and repoints detection logs at the cold copies (or clears them)."""
+        new_paths = {}
+        for r, result in evicted:
+            cold_path = f"{COLD_WEB_PREFIX}/{r.camera_id}/{r.filename}"
+            annotated = f"{COLD_WEB_PREFIX}/{r.camera_id}/{ANNOTATED_DIR_NAME}/{r.filename}"
+            new_paths[r.web_path] = (cold_path if result.moved else None, annotated if result.annotated_moved else None)
+        async with self._get_db_session() as session:
+            await session.execute(delete(CaptureRecord).where(CaptureRecord.id.in_([r.id for r, _ in evicted])))
+            result = await session.execute(select(DetectionEventLog).where(DetectionEventLog.image_path.in_(list(new_paths))))
+            for log_entry in result.scalars().all():
+                log_entry.image_path, log_entry.annotated_image_path = new_paths[log_entry.image_path]
+            await session.commit()
+
+    async def _prune_cold_tier(self) -> int:
+        cutoff = datetime.now() - timedelta(days=self._cold_max_age_days)
+        expired = await asyncio.to_thread(find_expired_cold_files_sync, self._cold_dir, cutoff)
+        for i in range(0, len(expired), self._batch_size):
+            batch = expired[i:i + self._batch_size]
+            for path in batch:
+                result = await asyncio.to_thread(evict_capture_sync, path, None)
+                await self._throttle(result.bytes_freed)
+            web_paths = [f"{COLD_WEB_PREFIX}/{p.parent.name}/{p.name}" for p in batch]
+            async with self._get_db_session() as session:
+                result = await session.execute(select(DetectionEventLog).where(DetectionEventLog.image_path.in_(web_paths)))
+                for log_entry in result.scalars().all():
+                    log_entry.image_path = None
+                    log_entry.annotated_image_path = None
+                await session.commit()
+        return len(expired)
@@ -3,9 +3,11 @@ from typing import Dict, Optional, TYPE_CHECKING
 import psutil
 import asyncio
 
-from app.core.modbus_controller import AsyncModbusController
+from app.core.modbus_controller import AsyncModbusController, COIL_COUNT
 from app.core.camera_manager import CameraHealthStatus
 from app.core.modbus_poller import AsyncModbusPoller
+from app.core.modbus_scheduler import TransactionPriority
+from app.core.sensor_dispatcher import AsyncSensorEventDispatcher
 from app.services.llm_service import LlmApiService
 from app.services.tts_service import TtsApiService
 from config import ACTIVE_CAMERA_IDS
@@ -34,6 +36,7 @@ class AsyncSystemService:
         self,
         modbus_controller: AsyncModbusController,
         modbus_poller: AsyncModbusPoller,
+        sensor_dispatcher: AsyncSensorEventDispatcher,
         camera_manager: "AsyncCameraManager",
         detection_service: "AsyncDetectionService",
         orchestration_service: "AsyncOrchestrationService",
@@ -43,6 +46,7 @@ class AsyncSystemService:
     ):
         self._io = modbus_controller
         self._poller = modbus_poller
+        self._sensor_dispatcher = sensor_dispatcher
         self._camera = camera_manager
         self._detection_service = detection_service
         self._orchestration_service = orchestration_service
@@ -79,6 +83,7 @@ class AsyncSystemService:
             tts_ok_task = asyncio.create_task(self._tts_service.health_check())
             yolo_ok = self._settings.AI_STRATEGY.YOLO_ENABLED
             llm_ok, tts_ok = await asyncio.gather(llm_ok_task, tts_ok_task)
+            camera_telemetry = await self._camera.get_telemetry(summary=True)
 
             def get_input_state(channel: int) -> bool:
                 index = channel - 1
@@ -95,7 +100,13 @@ class AsyncSystemService:
                 "cpu_temperature": _get_rpi_cpu_temp(),
                 "uptime_seconds": int(time.monotonic() - self._app_start_time),
                 "camera_statuses": camera_statuses_payload,
+                "camera_telemetry": camera_telemetry,
                 "io_module_status": io_module_status,
+                "modbus": {
+                    **self._io.get_metrics(summary=True),
+                    "poller": self._poller.get_poll_stats(),
+                    "sensor_queue_depth": self._sensor_dispatcher.snapshot()["queue_depth"],
+                },
                 "sensor_1_status": not get_input_state(self._sensor_config.ENTRY_CHANNEL), 
                 "sensor_2_status": not get_input_state(self._sensor_config.EXIT_CHANNEL), 
                 "conveyor_relay_status": get_output_state("conveyor"),
@@ -117,17 +128,21 @@ class AsyncSystemService:
             print(f"FATAL ERROR in get_system_status: {e}")
             return {"error": "Failed to fetch system status."}
 
+    def get_modbus_metrics(self) -> Dict:
+        """Modbus round-trip latency per function code, error/timeout counters and poll rate."""
+        return {
+            **self._io.get_metrics(),
+            "poller": self._poller.get_poll_stats(),
+            "sensor_dispatch": self._sensor_dispatcher.snapshot(),
+        }
+
     async def emergency_stop(self):
         """Immediately stop all hardware operations via Modbus."""
         print("SYSTEM SERVICE: Initiating emergency stop of all hardware.")
-        tasks = [
-            self._io.write_coil(self._output_config.get("CONVEYOR"), False),
-            self._io.write_coil(self._output_config.get("GATE"), False),
-            self._io.write_coil(self._output_config.get("DIVERTER"), False),
-            self._io.write_coil(self._output_config.get("LED_GREEN"), False),
-            self._io.write_coil(self._output_config.get("LED_RED"), True),
-            self._io.write_coil(self._output_config.get("BUZZER"), False),
-            self._io.write_coil(self._output_config.get("CAMERA_LIGHT"), False),
-            self._io.write_coil(self._output_config.get("CAMERA_LIGHT_TWO"), False)
-        ]
-        await asyncio.gather(*tasks)
\ No newline at end of file
+        # A single FC15 frame that jumps ahead of every queued poll and actuator write.
+        # Every coil is set (unmapped ones off), so the frame never waits on a read-back.
+        await self._io.write_outputs({
+            **{address: False for address in range(COIL_COUNT)},
+            "CONVEYOR": False, "GATE": False, "DIVERTER": False, "LED_GREEN": False,
+            "LED_RED": True, "BUZZER": False, "CAMERA_LIGHT": False, "CAMERA_LIGHT_TWO": False,
+        }, priority=TransactionPriority.EMERGENCY)
\ No newline at end of file
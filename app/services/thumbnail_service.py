@@ -0,0 +1,112 @@
+"""
+Background generation of gallery thumbnails.
+
+Saved captures and annotated images are queued here. A worker creates a
+small JPEG (and optionally a WebP) in a `thumbs/` folder next to each image,
+so the gallery pages can load a few KB per tile instead of the full frame:
+
+    captures/rpi/event_X_1700000000.jpg
+    captures/rpi/thumbs/event_X_1700000000.jpg
+    captures/rpi/thumbs/event_X_1700000000.webp   (THUMBNAIL_WEBP_ENABLED)
+
+Generation never blocks the capture path: the queue is bounded, and a full
+queue drops the request. The captures API re-queues any image it finds
+without a thumbnail, so a dropped request is picked up on the next page view.
+"""
+import asyncio
+from pathlib import Path
+from typing import Optional
+
+import cv2
+
+from app.core.capture_writer import write_bytes_sync
+from app.core.stream_fanout import decode_to_width
+from app.utils.jpeg_codec import JpegCodec
+
+THUMBNAIL_DIR_NAME = "thumbs"
+
+def thumbnail_path(image_path: Path, suffix: str = ".jpg") -> Path:
+    """Where the thumbnail for `image_path` lives (works for filesystem and web paths)."""
+    return image_path.parent / THUMBNAIL_DIR_NAME / (image_path.stem + suffix)
+
+def generate_thumbnails_sync(
+    image_path: Path, codec: JpegCodec, max_width: int, quality: int,
+    webp_enabled: bool = False, webp_quality: int = 75, data: Optional[bytes] = None
+) -> bool:
+    """Writes the JPEG (and optional WebP) thumbnail for one image. Returns False on failure."""
+    try:
+        if data is None:
+            data = image_path.read_bytes()
+    except OSError as e:
+        print(f"THUMBNAIL ERROR: Cannot read '{image_path}': {e}")
+        return False
+    image = decode_to_width(codec, data, max_width)
+    if image is None:
+        print(f"THUMBNAIL ERROR: Failed to decode '{image_path.name}'.")
+        return False
+
+    jpeg_target = thumbnail_path(image_path)
+    jpeg_target.parent.mkdir(parents=True, exist_ok=True)
+    if not write_bytes_sync(jpeg_target, codec.encode(image, quality)):
+        return False
+    if webp_enabled:
+        ok, buffer = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, webp_quality])
+        if not ok or not write_bytes_sync(thumbnail_path(image_path, ".webp"), buffer.tobytes()):
+            print(f"THUMBNAIL WARNING: WebP encode failed for '{image_path.name}'.")
+    return True
+
+class AsyncThumbnailService:
+    def __init__(self, codec: JpegCodec, max_width: int = 320, quality: int = 70, webp_enabled: bool = False, webp_quality: int = 75, queue_size: int = 200):
+        self._codec = codec
+        self._max_width = max_width
+        self._quality = quality
+        self._webp_enabled = webp_enabled
+        self._webp_quality = webp_quality
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._pending = set()
+        self._worker_task: Optional[asyncio.Task] = None
+
+    @property
+    def webp_enabled(self) -> bool:
+        return self._webp_enabled
+
+    def start(self):
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._thumbnail_worker())
+
+    def stop(self):
+        if self._worker_task and not self._worker_task.done():
+            self._worker_task.cancel()
+
+    def enqueue(self, image_path: Path, data: Optional[bytes] = None) -> bool:
+        """
+        Queues a thumbnail for `image_path`. Passing the already-encoded `data`
+        saves re-reading the file. Never blocks; returns False if not queued.
+        """
+        image_path = Path(image_path)
+        if image_path in self._pending:
+            return True
+        try:
+            self._queue.put_nowait((image_path, data))
+        except asyncio.QueueFull:
+            print(f"Thumbnail Service Warning: Queue is full. Skipping '{image_path.name}' for now.")
+            return False
+        self._pending.add(image_path)
+        return True
+
+    async def _thumbnail_worker(self):
+        while True:
+            try:
+                image_path, data = await self._queue.get()
+                try:
+                    await asyncio.to_thread(
+                        generate_thumbnails_sync, image_path, self._codec, self._max_width, self._quality,
+                        self._webp_enabled, self._webp_quality, data
+                    )
+                finally:
+                    self._pending.discard(image_path)
+                    self._queue.task_done()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Error in thumbnail worker: {e}")
@@ -0,0 +1,42 @@
+"""
+Frame sharpness scoring for burst capture.
+
+Sharpness is the variance of the Laplacian of a downscaled grayscale
+image: edges produce large second derivatives, and motion blur smooths
+them out, so a blurred frame scores lower than a sharp one of the same
+scene. The scaled decode (1/4 by default) makes the score cheap enough to
+rank a handful of frames per trigger, and it also suppresses sensor noise
+that would otherwise inflate the score of dark frames.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from app.utils.jpeg_codec import JpegCodec, SUPPORTED_SCALES
+
+def laplacian_variance(gray: np.ndarray) -> float:
+    """Variance of the 3x3 Laplacian of a single-channel image."""
+    return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+def sharpness_score(codec: JpegCodec, jpeg_bytes: bytes, scale: int = 4) -> Optional[float]:
+    """Scores an encoded frame. Returns None if it cannot be decoded."""
+    # Round down to a scale the decoders support (1, 2, 4 or 8).
+    scale = max(s for s in SUPPORTED_SCALES if s <= max(1, scale))
+    gray = codec.decode(jpeg_bytes, scale=scale, grayscale=True)
+    if gray is None or gray.size == 0:
+        return None
+    return laplacian_variance(gray)
+
+def select_sharpest(codec: JpegCodec, frames: Sequence[bytes], scale: int = 4) -> Tuple[int, List[Optional[float]]]:
+    """
+    Returns (index of the sharpest frame, per-frame scores). Frames that fail to
+    decode score None and are never selected; if none decode, index 0 is returned.
+    """
+    scores = [sharpness_score(codec, data, scale) for data in frames]
+    best_index = 0
+    best_score = None
+    for index, score in enumerate(scores):
+        if score is not None and (best_score is None or score > best_score):
+            best_index, best_score = index, score
+    return best_index, scores
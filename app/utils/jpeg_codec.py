@@ -0,0 +1,170 @@
+"""
+Pluggable JPEG codec used by the camera services, the capture path and
+image annotation.
+
+Two backends are available:
+
+- "turbojpeg": libjpeg-turbo through PyTurboJPEG. Supports fast and scaled
+  decoding (1/2, 1/4, 1/8) for previews, and lossless cropping in the DCT
+  domain (no decode/re-encode).
+- "opencv": cv2.imencode / cv2.imdecode. Always available. Scaled decoding
+  uses OpenCV's IMREAD_REDUCED_* flags, and cropping falls back to
+  decode -> slice -> encode.
+
+`get_jpeg_codec("auto")` returns the turbojpeg backend when the library can
+be loaded and falls back to OpenCV otherwise. Only numpy/cv2 are required at
+import time so the standalone camera services can use this module.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+SUPPORTED_SCALES = (1, 2, 4, 8)
+
+_CV_REDUCED_COLOR = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+_CV_REDUCED_GRAY = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+
+# Start-of-frame markers carry the image size. 0xC4 (DHT), 0xC8 (JPG) and 0xCC (DAC) share the range but are not SOFs.
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """Returns (width, height) from the JPEG header without decoding, or None if it cannot be found."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    pos = 2
+    end = len(data)
+    while pos + 4 <= end:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        length = (data[pos + 2] << 8) | data[pos + 3]
+        if marker in _SOF_MARKERS:
+            if pos + 9 > end:
+                return None
+            height = (data[pos + 5] << 8) | data[pos + 6]
+            width = (data[pos + 7] << 8) | data[pos + 8]
+            return width, height
+        if marker == 0xDA:  # Start of scan: no SOF before the image data.
+            return None
+        pos += 2 + length
+    return None
+
+
+class JpegCodec:
+    """Common interface for JPEG backends. Images are BGR (or single-channel gray) uint8 arrays."""
+    name = "base"
+    lossless_crop = False
+
+    def encode(self, image: np.ndarray, quality: int = 90) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes, scale: int = 1, grayscale: bool = False) -> Optional[np.ndarray]:
+        """Decodes `data`, optionally downscaled by 1/`scale` during decoding. Returns None on failure."""
+        raise NotImplementedError
+
+    def crop(self, data: bytes, x: int, y: int, width: int, height: int, quality: int = 90) -> Optional[bytes]:
+        """Crops an encoded JPEG. Lossless backends may grow the region to the nearest 16px block."""
+        image = self.decode(data)
+        if image is None:
+            return None
+        img_h, img_w = image.shape[:2]
+        x, y = max(0, x), max(0, y)
+        region = image[y:min(img_h, y + height), x:min(img_w, x + width)]
+        if region.size == 0:
+            return None
+        return self.encode(region, quality)
+
+
+class OpenCvJpegCodec(JpegCodec):
+    name = "opencv"
+
+    def encode(self, image: np.ndarray, quality: int = 90) -> bytes:
+        ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        if not ok:
+            raise ValueError("cv2.imencode failed to encode the image.")
+        return buffer.tobytes()
+
+    def decode(self, data: bytes, scale: int = 1, grayscale: bool = False) -> Optional[np.ndarray]:
+        flags = (_CV_REDUCED_GRAY if grayscale else _CV_REDUCED_COLOR).get(scale)
+        if flags is None:
+            raise ValueError(f"Unsupported decode scale 1/{scale}. Use one of {SUPPORTED_SCALES}.")
+        return cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+
+
+class TurboJpegCodec(JpegCodec):
+    name = "turbojpeg"
+    lossless_crop = True
+
+    def __init__(self, lib_path: Optional[str] = None, fast_encode: bool = False, fast_decode: bool = True):
+        # Raises ImportError / RuntimeError when PyTurboJPEG or libturbojpeg is missing.
+        import turbojpeg
+        self._tj_module = turbojpeg
+        self._tj = turbojpeg.TurboJPEG(lib_path)
+        # Encoded images are kept (captures, QC uploads), so encoding uses the accurate
+        # DCT by default. Decodes only feed previews, thumbnails and annotation.
+        self._encode_flags = turbojpeg.TJFLAG_FASTDCT if fast_encode else 0
+        self._decode_flags = (turbojpeg.TJFLAG_FASTDCT | turbojpeg.TJFLAG_FASTUPSAMPLE) if fast_decode else 0
+
+    def encode(self, image: np.ndarray, quality: int = 90) -> bytes:
+        tj = self._tj_module
+        image = np.ascontiguousarray(image)
+        if image.ndim == 2:
+            return self._tj.encode(image, quality=int(quality), pixel_format=tj.TJPF_GRAY, jpeg_subsample=tj.TJSAMP_GRAY, flags=self._encode_flags)
+        return self._tj.encode(image, quality=int(quality), pixel_format=tj.TJPF_BGR, jpeg_subsample=tj.TJSAMP_420, flags=self._encode_flags)
+
+    def decode(self, data: bytes, scale: int = 1, grayscale: bool = False) -> Optional[np.ndarray]:
+        if scale not in SUPPORTED_SCALES:
+            raise ValueError(f"Unsupported decode scale 1/{scale}. Use one of {SUPPORTED_SCALES}.")
+        tj = self._tj_module
+        try:
+            image = self._tj.decode(
+                data,
+                pixel_format=tj.TJPF_GRAY if grayscale else tj.TJPF_BGR,
+                scaling_factor=(1, scale) if scale > 1 else None,
+                flags=self._decode_flags,
+            )
+        except (OSError, ValueError) as e:
+            print(f"JPEG CODEC ERROR: turbojpeg failed to decode buffer: {e}")
+            return None
+        if grayscale and image.ndim == 3:
+            image = image[:, :, 0]
+        return image
+
+    def crop(self, data: bytes, x: int, y: int, width: int, height: int, quality: int = 90) -> Optional[bytes]:
+        # The DCT-domain crop needs a block-aligned origin; round it down and grow
+        # the size so the requested region is still fully contained.
+        aligned_x, aligned_y = (max(0, x) // 16) * 16, (max(0, y) // 16) * 16
+        width += x - aligned_x
+        height += y - aligned_y
+        try:
+            return self._tj.crop(data, aligned_x, aligned_y, width, height)
+        except (OSError, ValueError) as e:
+            print(f"JPEG CODEC WARNING: Lossless crop failed ({e}). Falling back to decode/encode.")
+            return super().crop(data, x, y, width, height, quality)
+
+
+@lru_cache()
+def get_jpeg_codec(preference: str = "auto") -> JpegCodec:
+    """
+    Returns the shared codec for `preference` ("auto", "turbojpeg" or "opencv").
+    "turbojpeg" and "auto" fall back to OpenCV when libjpeg-turbo is unavailable.
+    """
+    if preference in ("auto", "turbojpeg"):
+        try:
+            codec = TurboJpegCodec()
+            print("[JPEG Codec] Using libjpeg-turbo backend.", flush=True)
+            return codec
+        except Exception as e:
+            if preference == "turbojpeg":
+                print(f"[JPEG Codec] WARNING: libjpeg-turbo requested but unavailable ({e}). Using OpenCV.", flush=True)
+    return OpenCvJpegCodec()
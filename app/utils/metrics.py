@@ -0,0 +1,103 @@
+"""
+Lightweight in-process metrics: rolling timing windows and counters.
+
+Only uses the standard library so it can be shared by the main application
+and the standalone camera services. All values are plain floats/ints and
+`snapshot()` returns JSON-serialisable dicts for the API and WebSocket.
+"""
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class RollingStats:
+    """Keeps the last `window` samples of a measurement and summarises them on demand."""
+
+    def __init__(self, window: int = 500):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def add(self, value: float):
+        with self._lock:
+            self._samples.append(value)
+            self._count += 1
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def last(self) -> Optional[float]:
+        return self._samples[-1] if self._samples else None
+
+    def snapshot(self, precision: int = 2) -> Dict[str, Optional[float]]:
+        with self._lock:
+            samples = sorted(self._samples)
+            total = self._count
+        if not samples:
+            return {"count": total, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+
+        def pct(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], precision)
+
+        return {
+            "count": total,
+            "mean": round(sum(samples) / len(samples), precision),
+            "p50": pct(0.50),
+            "p95": pct(0.95),
+            "p99": pct(0.99),
+            "max": round(samples[-1], precision),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._count = 0
+
+
+class Counters:
+    """A named set of monotonically increasing counters."""
+
+    def __init__(self, *names: str):
+        self._values: Dict[str, int] = {name: 0 for name in names}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: int = 1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def get(self, name: str) -> int:
+        return self._values.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram:
+    """
+    Cumulative counts of a measurement in fixed buckets (upper bounds, inclusive).
+    Unlike RollingStats it covers every sample since start, so rare slow outliers
+    stay visible.
+    """
+
+    def __init__(self, bounds):
+        self._bounds = tuple(sorted(bounds))
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._lock = threading.Lock()
+
+    def add(self, value: float):
+        index = len(self._bounds)
+        for i, bound in enumerate(self._bounds):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            counts = list(self._counts)
+        result = {f"le_{bound:g}": count for bound, count in zip(self._bounds, counts)}
+        result["inf"] = counts[-1]
+        return result
@@ -0,0 +1,76 @@
+"""
+Streaming ZIP archives for image downloads.
+
+`stream_zip` yields the archive piece by piece while it is being written,
+so memory use is bounded by the chunk size no matter how many gigabytes of
+images go into it. It relies on the standard library's support for writing
+to unseekable streams: each entry gets a local header, the raw data and a
+trailing data descriptor (sizes and CRC are only known after the data), and
+Zip64 records are added automatically for large files and archives.
+
+Images are already compressed, so entries are ZIP_STORED by default;
+deflating JPEGs costs CPU for next to no size reduction.
+
+The generator is synchronous (blocking file reads). Hand it directly to
+StreamingResponse, which iterates sync generators in the threadpool.
+"""
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+class _ChunkSink:
+    """Write-only, unseekable buffer that the ZipFile writes into and the generator drains."""
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_zip(
+    entries: Iterable[Tuple[Path, Optional[str]]],
+    compression: int = zipfile.ZIP_STORED,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Yields a ZIP archive of `entries` as (file path, name in archive). A name of
+    None uses the file name. Files that are missing or unreadable are skipped.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=compression) as archive:
+        for path, arcname in entries:
+            path = Path(path)
+            try:
+                info = zipfile.ZipInfo.from_file(path, arcname or path.name)
+                source = open(path, "rb")
+            except OSError as e:
+                print(f"ZIP STREAM WARNING: Skipping '{path}': {e}")
+                continue
+            info.compress_type = compression
+            with source, archive.open(info, mode="w") as dest:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Closing the archive writes the central directory.
+    data = sink.drain()
+    if data:
+        yield data
@@ -14,5 +14,8 @@ if settings.CAMERA_MODE in ['rpi', 'both']:
     ACTIVE_CAMERA_IDS.append('rpi')
 if settings.CAMERA_MODE in ['usb', 'both']:
     ACTIVE_CAMERA_IDS.append('usb')
+if settings.CAMERA_MODE == 'replay':
+    # The replay service publishes on the channels of the camera it stands in for.
+    ACTIVE_CAMERA_IDS.append(settings.CAMERA_REPLAY_CAMERA_ID)
 
 print(f"[Main App Config] Mode: '{settings.CAMERA_MODE}'. Active cameras: {ACTIVE_CAMERA_IDS}")
\ No newline at end of file
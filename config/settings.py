@@ -2,7 +2,7 @@
 
 from functools import lru_cache
 from typing import Literal, Optional, List
-from pydantic import Field
+from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # --- Nested Settings Classes for Core Components ---
@@ -84,12 +84,30 @@ class ModbusSettings(BaseSettings):
     DEVICE_ADDRESS_INPUTS: int = 1
     DEVICE_ADDRESS_OUTPUTS: int = 2
     TIMEOUT_SEC: float = 0.5
+    INPUT_COUNT: int = Field(4, description="Discrete inputs on the input module: 4, 8, 16 or 32.")
     POLLING_MS: int = 50
+    IDLE_POLLING_MS: int = Field(250, gt=0, description="Poll period while no run is active (the line is stopped or paused).")
+    COIL_RECONCILE_SEC: float = Field(5.0, gt=0, description="How often the poller reads the coils back to verify the controller's shadow copy.")
+    RECONNECT_MIN_SEC: float = Field(0.1, gt=0, description="First reconnect delay after the Modbus link fails; doubles on every failed attempt.")
+    RECONNECT_MAX_SEC: float = Field(5.0, gt=0, description="Upper bound for the reconnect delay.")
+
+    @field_validator("INPUT_COUNT")
+    @classmethod
+    def _check_input_count(cls, value: int) -> int:
+        if value not in (4, 8, 16, 32):
+            raise ValueError("MODBUS_INPUT_COUNT must be 4, 8, 16 or 32")
+        return value
 
 class SensorSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix='SENSORS_', case_sensitive=False)
     ENTRY_CHANNEL: int = 1
     EXIT_CHANNEL: int = 3
+    # Optional inputs; 0 means not wired. All sensors are NPN (LOW = triggered).
+    REJECT_CONFIRM_CHANNEL: int = Field(0, ge=0, description="Input confirming a rejected item left the line.")
+    ESTOP_CHANNEL: int = Field(0, ge=0, description="Emergency stop input; triggering it switches all outputs off and stops the line in any mode (an active run is aborted). No run can start while it is held.")
+    DOOR_INTERLOCK_CHANNEL: int = Field(0, ge=0, description="Guard door input; opening the door switches all outputs off and stops the line in any mode (an active run is aborted). No run can start while it is open.")
+    EVENT_BACKLOG: int = Field(256, gt=0, description="Sensor events that may wait for the detection service before new ones are dropped.")
+    DEBOUNCE_MS: int = Field(0, ge=0, description="A sensor must hold a new level this long before the change is accepted. 0 accepts it on the first sample.")
 
 class LoggingSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix='LOGGING_', case_sensitive=False)
@@ -148,9 +166,34 @@ class AppSettings(BaseSettings):
     PROJECT_VERSION: str = "12.0.0-HybridAI"
     APP_ENV: Literal["development", "production"] = "development"
     TIMEZONE: str = "UTC"
-    CAMERA_MODE: Literal['rpi', 'usb', 'both', 'none'] = 'both'
-    CAMERA_TRIGGER_DELAY_MS: int = 100
+    CAMERA_MODE: Literal['rpi', 'usb', 'both', 'replay', 'none'] = Field('both', description="'replay' expects services/camera_service_replay.py in place of a real camera.")
+    CAMERA_REPLAY_CAMERA_ID: Literal['rpi', 'usb'] = Field('usb', description="With CAMERA_MODE=replay, the camera the replay service publishes as.")
+    CAMERA_TRIGGER_DELAY_MS: int = Field(100, description="Offset from the entry-sensor edge to the frame used for QC.")
+    CAMERA_FRAME_HISTORY_SIZE: int = Field(90, ge=1, description="Recent frames kept per camera for trigger-aligned capture (about 3 s at 30 fps).")
+    CAMERA_BURST_SIZE: int = Field(1, ge=1, le=15, description="Frames around the trigger to consider for QC; the sharpest is kept. 1 disables burst selection.")
+    CAMERA_BURST_DECODE_SCALE: int = Field(4, ge=1, le=8, description="Downscale factor (1, 2, 4 or 8) used when scoring burst frames for sharpness.")
+    CAMERA_IDLE_PUBLISH_ENABLED: bool = Field(True, description="While the line is idle and no live view is open, cameras publish only keep-alive and changed frames.")
+    CAMERA_PUBLISH_POLICY_INTERVAL_SEC: float = Field(0.5, gt=0, le=5, description="How often the camera publish policy is re-evaluated and refreshed in Redis.")
     CAMERA_CAPTURES_DIR: str = "web/static/captures"
+    THUMBNAIL_MAX_WIDTH: int = Field(320, ge=64, le=1280, description="Width of gallery thumbnails written to thumbs/ next to each capture.")
+    THUMBNAIL_JPEG_QUALITY: int = Field(70, ge=10, le=100)
+    THUMBNAIL_WEBP_ENABLED: bool = Field(False, description="Also write a WebP thumbnail; the gallery prefers it when present.")
+    THUMBNAIL_WEBP_QUALITY: int = Field(75, ge=10, le=100)
+    RETENTION_ENABLED: bool = Field(False, description="Run the background capture retention service. Off by default: it deletes (or moves) captures.")
+    RETENTION_INTERVAL_SEC: int = Field(300, ge=30, description="How often retention checks the budget and age limits.")
+    RETENTION_MAX_CAPTURES_GB: float = Field(0, ge=0, description="Disk budget for catalogued captures; the oldest are evicted beyond it. 0 disables.")
+    RETENTION_MAX_AGE_DAYS: int = Field(0, ge=0, description="Evict captures older than this. 0 disables.")
+    RETENTION_MIN_FREE_PERCENT: float = Field(0, ge=0, le=90, description="Evict the oldest captures while the captures filesystem has less free space than this (at most the space the captures use). 0 disables.")
+    RETENTION_COLD_DIR: str = Field("", description="Move evicted captures here (ideally another drive) instead of deleting them. Served at /cold.")
+    RETENTION_COLD_JPEG_QUALITY: int = Field(0, ge=0, le=100, description="Re-encode captures moved to the cold directory at this quality. 0 moves them unchanged.")
+    RETENTION_COLD_MAX_AGE_DAYS: int = Field(0, ge=0, description="Delete cold captures older than this. 0 keeps them.")
+    RETENTION_IO_MAX_MBPS: float = Field(4.0, gt=0, description="Upper bound on the disk throughput retention may use, in MB/s.")
+    CAMERA_SAVE_MODE: Literal['passthrough', 'reencode'] = Field('passthrough', description="'passthrough' writes the camera's JPEG bytes as-is; 'reencode' decodes and re-encodes with JPEG_CODEC.")
+    CAMERA_WRITER_THREADS: int = Field(2, ge=1, le=8, description="Size of the dedicated thread pool that writes captures to disk.")
+    CAMERA_STREAM_JPEG_QUALITY: int = Field(75, ge=10, le=100, description="Quality of downscaled live-stream variants (?width=).")
+    CAMERA_STREAM_MIN_WIDTH: int = Field(160, ge=16, description="Smallest width a live-stream client may request.")
+    JPEG_CODEC: Literal['auto', 'turbojpeg', 'opencv'] = Field('auto', description="JPEG backend. 'auto' uses libjpeg-turbo when available and falls back to OpenCV.")
+    JPEG_QUALITY: int = Field(95, ge=10, le=100, description="Quality for JPEGs encoded by the main app (re-encoded captures, annotated images).")
     UI_ANIMATION_TRANSIT_TIME_SEC: int = Field(5, gt=0)
     SERVER: ServerSettings = ServerSettings()
     SECURITY: SecuritySettings = SecuritySettings()
@@ -11,7 +11,7 @@ import redis.asyncio as redis
 # --- Core Application Imports ---
 PROJECT_ROOT = Path(__file__).parent
 from config import settings, ACTIVE_CAMERA_IDS
-from app.models.database import engine, Base, AsyncSessionFactory
+from app.models.database import engine, Base, AsyncSessionFactory, add_missing_columns
 
 # --- Routers ---
 from app.api.v1 import api_router as api_v1_router
@@ -29,15 +29,20 @@ from app.websocket.connection_manager import manager as websocket_manager
 from app.core.modbus_controller import AsyncModbusController
 from app.core.camera_manager import AsyncCameraManager
 from app.core.modbus_poller import AsyncModbusPoller
+from app.core.sensor_dispatcher import AsyncSensorEventDispatcher
 
 # --- Application Services ---
 from app.services.detection_service import AsyncDetectionService
 from app.services.system_service import AsyncSystemService
 from app.services.notification_service import AsyncNotificationService
+from app.services.thumbnail_service import AsyncThumbnailService
+from app.services.capture_catalog import AsyncCaptureCatalog
+from app.services.retention_service import AsyncRetentionService
 from app.services.orchestration_service import AsyncOrchestrationService
 from app.services.audio_service import AsyncAudioService, TTS_CACHE_DIR
 from app.services.llm_service import LlmApiService
 from app.services.tts_service import TtsApiService
+from app.utils.jpeg_codec import get_jpeg_codec
 
 
 class NoCacheStaticFiles(StaticFiles):
@@ -54,6 +59,7 @@ async def lifespan(app: FastAPI):
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
     print("Database tables verified.")
     
     app.state.redis_client = redis.from_url(f"redis://{settings.REDIS.HOST}:{settings.REDIS.PORT}")
@@ -67,6 +73,8 @@ async def lifespan(app: FastAPI):
     # --- THIS IS THE FIX (Part 1): Connect to Modbus on startup ---
     await app.state.modbus_controller.connect()
     # --- END OF FIX ---
+    # Reconnects (with backoff) whenever the link fails, including a failed connect above.
+    app.state.modbus_controller.start_supervisor()
 
     app.state.orchestration_service = AsyncOrchestrationService(
         modbus_controller=app.state.modbus_controller, db_session_factory=AsyncSessionFactory,
@@ -74,30 +82,58 @@ async def lifespan(app: FastAPI):
         audio_service=app.state.audio_service, llm_service=app.state.llm_service
     )
     app.state.notification_service = AsyncNotificationService(db_session_factory=AsyncSessionFactory)
+    app.state.thumbnail_service = AsyncThumbnailService(
+        codec=get_jpeg_codec(settings.JPEG_CODEC), max_width=settings.THUMBNAIL_MAX_WIDTH,
+        quality=settings.THUMBNAIL_JPEG_QUALITY, webp_enabled=settings.THUMBNAIL_WEBP_ENABLED,
+        webp_quality=settings.THUMBNAIL_WEBP_QUALITY
+    )
+    app.state.capture_catalog = AsyncCaptureCatalog(
+        db_session_factory=AsyncSessionFactory, captures_dir=PROJECT_ROOT / settings.CAMERA_CAPTURES_DIR,
+        camera_ids=ACTIVE_CAMERA_IDS
+    )
+    app.state.retention_service = AsyncRetentionService(
+        db_session_factory=AsyncSessionFactory, capture_catalog=app.state.capture_catalog,
+        captures_dir=PROJECT_ROOT / settings.CAMERA_CAPTURES_DIR, codec=get_jpeg_codec(settings.JPEG_CODEC),
+        max_captures_gb=settings.RETENTION_MAX_CAPTURES_GB, max_age_days=settings.RETENTION_MAX_AGE_DAYS,
+        min_free_percent=settings.RETENTION_MIN_FREE_PERCENT,
+        cold_dir=PROJECT_ROOT / settings.RETENTION_COLD_DIR if settings.RETENTION_COLD_DIR else None,
+        cold_jpeg_quality=settings.RETENTION_COLD_JPEG_QUALITY, cold_max_age_days=settings.RETENTION_COLD_MAX_AGE_DAYS,
+        io_max_mbps=settings.RETENTION_IO_MAX_MBPS, interval_sec=settings.RETENTION_INTERVAL_SEC
+    )
     app.state.camera_manager = AsyncCameraManager(
         notification_service=app.state.notification_service, captures_dir=settings.CAMERA_CAPTURES_DIR,
-        redis_client=app.state.redis_client, active_camera_ids=ACTIVE_CAMERA_IDS
+        redis_client=app.state.redis_client, active_camera_ids=ACTIVE_CAMERA_IDS,
+        thumbnail_service=app.state.thumbnail_service, capture_catalog=app.state.capture_catalog,
+        line_active_provider=app.state.orchestration_service.is_line_active
     )
     app.state.detection_service = AsyncDetectionService(
         modbus_controller=app.state.modbus_controller, camera_manager=app.state.camera_manager,
         orchestration_service=app.state.orchestration_service, redis_client=app.state.redis_client,
         conveyor_settings=settings.CONVEYOR, db_session_factory=AsyncSessionFactory,
         active_camera_ids=ACTIVE_CAMERA_IDS, audio_service=app.state.audio_service,
-        llm_service=app.state.llm_service
+        llm_service=app.state.llm_service, thumbnail_service=app.state.thumbnail_service
+    )
+    # Delivers sensor events to the detection service one at a time, in edge order.
+    app.state.sensor_dispatcher = AsyncSensorEventDispatcher(
+        handler=app.state.detection_service.handle_sensor_event, max_backlog=settings.SENSORS.EVENT_BACKLOG
     )
     app.state.modbus_poller = AsyncModbusPoller(
         modbus_controller=app.state.modbus_controller,
-        event_callback=app.state.detection_service.handle_sensor_event,
-        sensor_config=settings.SENSORS
+        event_callback=app.state.sensor_dispatcher.dispatch,
+        sensor_config=settings.SENSORS,
+        line_active_provider=app.state.orchestration_service.is_line_active
     )
     app.state.system_service = AsyncSystemService(
         modbus_controller=app.state.modbus_controller, modbus_poller=app.state.modbus_poller,
+        sensor_dispatcher=app.state.sensor_dispatcher,
         camera_manager=app.state.camera_manager, detection_service=app.state.detection_service,
         orchestration_service=app.state.orchestration_service, llm_service=app.state.llm_service,
         tts_service=app.state.tts_service, settings=settings
     )
     
     app.state.orchestration_service.set_detection_service(app.state.detection_service)
+    app.state.detection_service.set_system_service(app.state.system_service)
+    app.state.orchestration_service.set_modbus_poller(app.state.modbus_poller)
 
     startup_audio_path = TTS_CACHE_DIR / "startup_complete.wav"
     if not startup_audio_path.exists():
@@ -108,6 +144,11 @@ async def lifespan(app: FastAPI):
     app.state.active_camera_ids = ACTIVE_CAMERA_IDS
 
     app.state.notification_service.start()
+    app.state.thumbnail_service.start()
+    app.state.capture_catalog.start()
+    if settings.RETENTION_ENABLED:
+        app.state.retention_service.start()
+    app.state.sensor_dispatcher.start()
     app.state.modbus_poller.start()
     app.state.camera_manager.start()
     app.state.orchestration_service.start_background_tasks()
@@ -158,7 +199,11 @@ async def lifespan(app: FastAPI):
     
     app.state.orchestration_service.stop_background_tasks()
     await app.state.modbus_poller.stop()
+    app.state.sensor_dispatcher.stop()
     app.state.notification_service.stop()
+    app.state.thumbnail_service.stop()
+    app.state.capture_catalog.stop()
+    app.state.retention_service.stop()
     await app.state.camera_manager.stop()
     await app.state.modbus_controller.disconnect()
     await app.state.redis_client.close()
@@ -171,6 +216,10 @@ def create_app() -> FastAPI:
     app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
     app.mount("/static", NoCacheStaticFiles(directory=PROJECT_ROOT / "web/static"), name="static")
     app.mount("/captures", NoCacheStaticFiles(directory=PROJECT_ROOT / settings.CAMERA_CAPTURES_DIR), name="captures")
+    if settings.RETENTION_COLD_DIR:
+        cold_dir = PROJECT_ROOT / settings.RETENTION_COLD_DIR
+        cold_dir.mkdir(parents=True, exist_ok=True)
+        app.mount("/cold", NoCacheStaticFiles(directory=cold_dir), name="cold")
     app.include_router(api_v1_router, prefix="/api/v1")
     app.include_router(ai_strategy_router.router, prefix="/api/v1/ai-strategy", tags=["AI & Audio Strategy"])
     app.include_router(web_router)
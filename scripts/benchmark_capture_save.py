@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Compares the two capture save paths used by AsyncCameraManager.capture_and_save_image:
+
+- reencode:    decode + encode with the JPEG codec (the original behaviour)
+- passthrough: write the camera's JPEG bytes straight to disk
+
+Run from the project root:  python scripts/benchmark_capture_save.py
+"""
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app.core.capture_writer import AsyncFileWriter, write_bytes_sync, write_reencoded_sync
+
+# --- Configuration ---
+WIDTH, HEIGHT = 1280, 720
+JPEG_QUALITY = 90
+ITERATIONS = 100
+
+def make_test_jpeg() -> bytes:
+    """Builds a frame with gradients and noise so the JPEG size is realistic."""
+    x = np.linspace(0, 255, WIDTH, dtype=np.float32)
+    y = np.linspace(0, 255, HEIGHT, dtype=np.float32)
+    gradient = (np.add.outer(y, x) / 2).astype(np.uint8)
+    noise = np.random.default_rng(0).integers(0, 40, (HEIGHT, WIDTH), dtype=np.uint8)
+    frame = cv2.merge([gradient, cv2.add(gradient, noise), cv2.subtract(gradient, noise)])
+    cv2.rectangle(frame, (400, 200), (880, 520), (30, 30, 200), -1)
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    assert ok
+    return buffer.tobytes()
+
+def time_sync(label: str, func, out_dir: Path, jpeg_bytes: bytes):
+    timings = []
+    for i in range(ITERATIONS):
+        path = out_dir / f"{label}_{i}.jpg"
+        start = time.perf_counter()
+        func(path, jpeg_bytes)
+        timings.append((time.perf_counter() - start) * 1000)
+    report(label, timings)
+
+async def time_async_pool(out_dir: Path, jpeg_bytes: bytes):
+    writer = AsyncFileWriter(max_workers=2)
+    timings = []
+    for i in range(ITERATIONS):
+        path = out_dir / f"pool_{i}.jpg"
+        start = time.perf_counter()
+        await writer.write(path, jpeg_bytes)
+        timings.append((time.perf_counter() - start) * 1000)
+    writer.shutdown()
+    report("passthrough (async pool)", timings)
+
+def report(label: str, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<28} mean={statistics.mean(timings):7.2f} ms  p50={statistics.median(timings):7.2f} ms  p95={p95:7.2f} ms")
+
+def main():
+    jpeg_bytes = make_test_jpeg()
+    print(f"--- Capture Save Benchmark ---")
+    print(f"Frame: {WIDTH}x{HEIGHT}, JPEG quality {JPEG_QUALITY}, {len(jpeg_bytes) / 1024:.0f} KiB, {ITERATIONS} iterations")
+    print("------------------------------")
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        time_sync("reencode", write_reencoded_sync, out_dir, jpeg_bytes)
+        time_sync("passthrough", write_bytes_sync, out_dir, jpeg_bytes)
+        asyncio.run(time_async_pool(out_dir, jpeg_bytes))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Per-frame cost of each available JPEG backend in app.utils.jpeg_codec:
+
+- encode:          BGR frame -> JPEG (what the camera services do per frame)
+- decode:          full-resolution decode (re-encoded captures, annotation)
+- decode 1/2, 1/4: scaled decode used for previews
+- crop:            cut a 400x300 region out of the encoded frame
+                   (lossless DCT crop on libjpeg-turbo, decode/encode on OpenCV)
+
+Run from the project root:  python scripts/benchmark_jpeg.py
+"""
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app.utils.jpeg_codec import OpenCvJpegCodec, TurboJpegCodec
+
+# --- Configuration ---
+WIDTH, HEIGHT = 1280, 720
+JPEG_QUALITY = 90
+ITERATIONS = 100
+
+def make_test_frame() -> np.ndarray:
+    """Builds a frame with gradients and noise so the JPEG size is realistic."""
+    x = np.linspace(0, 255, WIDTH, dtype=np.float32)
+    y = np.linspace(0, 255, HEIGHT, dtype=np.float32)
+    gradient = (np.add.outer(y, x) / 2).astype(np.uint8)
+    noise = np.random.default_rng(0).integers(0, 40, (HEIGHT, WIDTH), dtype=np.uint8)
+    frame = cv2.merge([gradient, cv2.add(gradient, noise), cv2.subtract(gradient, noise)])
+    cv2.rectangle(frame, (400, 200), (880, 520), (30, 30, 200), -1)
+    return frame
+
+def time_op(func) -> list:
+    timings = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)
+
+def report(label: str, timings):
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"  {label:<12} mean={statistics.mean(timings):7.2f} ms  p50={statistics.median(timings):7.2f} ms  p95={p95:7.2f} ms")
+
+def load_codecs():
+    codecs = [OpenCvJpegCodec()]
+    try:
+        codecs.append(TurboJpegCodec())
+    except Exception as e:
+        print(f"libjpeg-turbo backend unavailable ({e}); benchmarking OpenCV only.")
+    return codecs
+
+def main():
+    frame = make_test_frame()
+    print("--- JPEG Codec Benchmark ---")
+    print(f"Frame: {WIDTH}x{HEIGHT}, JPEG quality {JPEG_QUALITY}, {ITERATIONS} iterations")
+    print("----------------------------")
+    for codec in load_codecs():
+        jpeg = codec.encode(frame, JPEG_QUALITY)
+        crop_mode = "lossless" if codec.lossless_crop else "decode/encode"
+        print(f"{codec.name} ({len(jpeg) / 1024:.0f} KiB per frame, crop: {crop_mode})")
+        report("encode", time_op(lambda: codec.encode(frame, JPEG_QUALITY)))
+        report("decode", time_op(lambda: codec.decode(jpeg)))
+        report("decode 1/2", time_op(lambda: codec.decode(jpeg, scale=2)))
+        report("decode 1/4", time_op(lambda: codec.decode(jpeg, scale=4)))
+        report("crop", time_op(lambda: codec.crop(jpeg, 440, 210, 400, 300, JPEG_QUALITY)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+Drives the real AsyncModbusController and AsyncModbusPoller against the Modbus
+RTU simulator (scripts/modbus_simulator.py) and reports:
+
+- missed edges:      sensor edges from the waveform with no matching SensorEvent
+- edge time error:   SensorEvent.timestamp (the poller's estimate) minus the time
+                     the simulator changed the input; negative = estimated early
+- delivery latency:  when the event reached the callback, after the input changed
+- bus metrics:   the controller's own round-trip and poll-rate statistics
+
+Run from the project root:
+    python scripts/benchmark_modbus.py --boxes 50 --belt-speed 1.0 --box-length-mm 100
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import settings
+from scripts.modbus_simulator import ModbusRtuSimulator, box_waveform, load_script
+
+def match_edges(applied, events):
+    """
+    Pairs each applied edge with the first event of the same sensor and state
+    whose estimated time lies within half the distance to the neighbouring edges
+    on that sensor. `events` are (SensorEvent, received at). Returns
+    (edge time errors in ms, delivery latencies in ms, missed edges).
+    """
+    errors, delivery, missed = [], [], []
+    by_channel = {}
+    for edge in applied:
+        by_channel.setdefault(edge[1], []).append(edge)
+    for channel, edges in by_channel.items():
+        channel_events = [e for e in events if e[0].sensor_id == channel]
+        for i, (t, _, blocked) in enumerate(edges):
+            window_start = (edges[i - 1][0] + t) / 2 if i > 0 else float("-inf")
+            window_end = (t + edges[i + 1][0]) / 2 if i + 1 < len(edges) else float("inf")
+            state = "triggered" if blocked else "cleared"
+            match = next((e for e in channel_events
+                          if window_start <= e[0].timestamp < window_end and e[0].new_state.value == state), None)
+            if match is None:
+                missed.append((t, channel, blocked))
+            else:
+                errors.append((match[0].timestamp - t) * 1000)
+                delivery.append((match[1] - t) * 1000)
+    return errors, delivery, missed
+
+def report(label: str, timings):
+    if not timings:
+        print(f"{label:<22} no samples")
+        return
+    timings = sorted(timings)
+    pct = lambda p: timings[min(len(timings) - 1, int(len(timings) * p))]
+    print(f"{label:<22} mean={statistics.mean(timings):7.2f} ms  p50={pct(0.50):7.2f} ms  "
+          f"p95={pct(0.95):7.2f} ms  p99={pct(0.99):7.2f} ms  max={timings[-1]:7.2f} ms")
+
+async def run(args):
+    if args.script:
+        edges = load_script(args.script)
+    else:
+        edges = box_waveform(
+            args.boxes, args.box_length_mm, args.gap_mm, args.belt_speed, args.sensor_spacing_mm,
+            settings.SENSORS.ENTRY_CHANNEL, settings.SENSORS.EXIT_CHANNEL, args.jitter, 0.5, args.seed
+        )
+    simulator = ModbusRtuSimulator(baudrate=args.baudrate)
+    settings.MODBUS.PORT = simulator.start()
+    settings.MODBUS.BAUDRATE = args.baudrate
+
+    # Imported after the port is set: the controller reads settings when it is created.
+    from app.core.modbus_controller import AsyncModbusController
+    from app.core.modbus_poller import AsyncModbusPoller
+
+    events = []
+    def on_event(event):
+        events.append((event, time.monotonic()))
+
+    controller = await AsyncModbusController.get_instance()
+    if not await controller.connect():
+        simulator.stop()
+        raise SystemExit("Could not connect to the simulator.")
+    controller.start_supervisor()
+    poller = AsyncModbusPoller(modbus_controller=controller, event_callback=on_event, sensor_config=settings.SENSORS)
+    poller.start()
+    await asyncio.sleep(0.3)
+
+    print(f"--- Modbus Benchmark ---")
+    print(f"{args.baudrate} baud, poll interval {settings.MODBUS.POLLING_MS} ms, {len(edges)} edges over {edges[-1][0]:.1f}s")
+    print("------------------------")
+    await asyncio.wrap_future(simulator.play(edges))
+    await asyncio.sleep(0.5)
+    await poller.stop()
+    metrics = controller.get_metrics()
+    await controller.disconnect()
+    simulator.stop()
+
+    errors, delivery, missed = match_edges(simulator.applied_edges, events)
+    print(f"Edges: {len(simulator.applied_edges)}  detected: {len(errors)}  missed: {len(missed)}")
+    report("Edge time error", errors)
+    report("Edge time |error|", [abs(e) for e in errors])
+    report("Delivery latency", delivery)
+    print(f"Achieved poll rate:    {metrics['poll_rate_hz']} Hz")
+    for name, fc in metrics["function_codes"].items():
+        if fc["counters"]["requests"]:
+            latency = fc["latency_ms"]
+            print(f"{name:<26} n={fc['counters']['requests']:<5} p50={latency['p50']} ms  p95={latency['p95']} ms  "
+                  f"errors={fc['counters']['errors']} timeouts={fc['counters']['timeouts']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Poller edge latency against the Modbus RTU simulator.")
+    parser.add_argument("--baudrate", type=int, default=settings.MODBUS.BAUDRATE)
+    parser.add_argument("--script", type=Path, help="JSON edge script (see modbus_simulator.py).")
+    parser.add_argument("--boxes", type=int, default=30)
+    parser.add_argument("--box-length-mm", type=float, default=200)
+    parser.add_argument("--gap-mm", type=float, default=300)
+    parser.add_argument("--belt-speed", type=float, default=0.5, help="Belt speed in m/s.")
+    parser.add_argument("--sensor-spacing-mm", type=float, default=600)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+"""
+Modbus RTU slave simulator for the USR-IO4040 (inputs) / USR-IO8000 (outputs)
+pair, so the controller and poller can be exercised without hardware.
+
+A pymodbus RTU server answers on one end of a pseudo-terminal link and the
+application opens the other end as if it were /dev/ttyUSB0. The link between
+the two ptys is paced at the configured baud rate (10 bits per byte, 8N1), so
+round-trip times match a real RS-485 bus rather than a memory copy.
+
+Sensor inputs follow a waveform of boxes passing the entry and exit sensors
+(box length, gap, belt speed, sensor spacing; optionally randomised) or a
+scripted JSON list of edges. Sensors are NPN: a blocked sensor reads LOW.
+Every coil write is recorded with its time.
+
+Run from the project root:
+    python scripts/modbus_simulator.py --link /tmp/ttyMODBUS --boxes 100
+then start the app with MODBUS_PORT=/tmp/ttyMODBUS.
+
+Script format (--script): [{"t": 0.50, "channel": 1, "blocked": true}, ...]
+with t in seconds from the start of playback and 1-based input channels.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tty
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from pymodbus.datastore import ModbusSequentialDataBlock, ModbusServerContext, ModbusSlaveContext
+from pymodbus.server import ModbusSerialServer
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import settings
+
+BITS_PER_BYTE = 10  # Start bit, 8 data bits, stop bit.
+
+# (seconds from playback start, 1-based channel, blocked)
+Edge = Tuple[float, int, bool]
+
+def box_waveform(
+    boxes: int, box_length_mm: float, gap_mm: float, belt_speed_mps: float, sensor_spacing_mm: float,
+    entry_channel: int, exit_channel: int, jitter: float = 0.0, start_delay_sec: float = 0.5, seed: Optional[int] = None
+) -> List[Edge]:
+    """
+    Edges produced by `boxes` boxes passing the entry sensor and, `sensor_spacing_mm`
+    further down the belt, the exit sensor. `jitter` varies each box length and gap
+    by up to that fraction.
+    """
+    rng = random.Random(seed)
+    speed_mm_per_sec = belt_speed_mps * 1000.0
+    edges: List[Edge] = []
+    position_mm = 0.0
+    for _ in range(boxes):
+        length = box_length_mm * (1 + rng.uniform(-jitter, jitter))
+        gap = gap_mm * (1 + rng.uniform(-jitter, jitter))
+        enter = start_delay_sec + position_mm / speed_mm_per_sec
+        leave = enter + length / speed_mm_per_sec
+        offset = sensor_spacing_mm / speed_mm_per_sec
+        edges += [(enter, entry_channel, True), (leave, entry_channel, False),
+                  (enter + offset, exit_channel, True), (leave + offset, exit_channel, False)]
+        position_mm += length + gap
+    return sorted(edges)
+
+def load_script(path: Path) -> List[Edge]:
+    return sorted((float(e["t"]), int(e["channel"]), bool(e["blocked"])) for e in json.loads(Path(path).read_text()))
+
+class RecordingCoilBlock(ModbusSequentialDataBlock):
+    """Coil block that records every write as (time.monotonic(), address, value)."""
+    def __init__(self, address, values):
+        super().__init__(address, values)
+        self.writes: List[Tuple[float, int, bool]] = []
+
+    def setValues(self, address, values):
+        now = time.monotonic()
+        values = values if isinstance(values, list) else [values]
+        for offset, value in enumerate(values):
+            self.writes.append((now, address + offset, bool(value)))
+        super().setValues(address, values)
+
+class PacedPtyLink:
+    """
+    Two pseudo-terminals joined back to back, forwarding bytes in both directions
+    after the time they would take on the wire at `baudrate`.
+    """
+    def __init__(self, baudrate: int):
+        self._byte_time = BITS_PER_BYTE / baudrate
+        self._fds = []
+        self.server_port, server_master = self._open_pty()
+        self.client_port, client_master = self._open_pty()
+        self._threads = [
+            threading.Thread(target=self._forward, args=(client_master, server_master), daemon=True),
+            threading.Thread(target=self._forward, args=(server_master, client_master), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _open_pty(self) -> Tuple[str, int]:
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        # Keep our slave descriptor open so the master does not see EOF between opens.
+        self._fds += [master, slave]
+        return os.ttyname(slave), master
+
+    def _forward(self, source: int, target: int):
+        while True:
+            try:
+                data = os.read(source, 256)
+            except OSError:
+                return
+            if not data:
+                return
+            time.sleep(len(data) * self._byte_time)
+            try:
+                os.write(target, data)
+            except OSError:
+                return
+
+    def close(self):
+        for fd in self._fds:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+class ModbusRtuSimulator:
+    """
+    The simulated I/O modules. `start()` runs the server in a background thread
+    and returns the serial port for the application; `play()` drives the inputs.
+    """
+    def __init__(
+        self, baudrate: int = settings.MODBUS.BAUDRATE, input_unit: int = settings.MODBUS.DEVICE_ADDRESS_INPUTS,
+        output_unit: int = settings.MODBUS.DEVICE_ADDRESS_OUTPUTS, input_count: int = 32, coil_count: int = 8
+    ):
+        self._baudrate = baudrate
+        self._inputs = ModbusSequentialDataBlock(0, [True] * input_count)  # NPN: idle sensors read HIGH.
+        self.coils = RecordingCoilBlock(0, [False] * coil_count)
+        self._context = ModbusServerContext(slaves={
+            input_unit: ModbusSlaveContext(di=self._inputs, zero_mode=True),
+            output_unit: ModbusSlaveContext(co=self.coils, zero_mode=True),
+        }, single=False)
+        # Edges as applied: (time.monotonic(), channel, blocked).
+        self.applied_edges: List[Tuple[float, int, bool]] = []
+        self._link: Optional[PacedPtyLink] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[ModbusSerialServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> str:
+        self._link = PacedPtyLink(self._baudrate)
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), daemon=True)
+        self._thread.start()
+        if not ready.wait(timeout=10):
+            raise RuntimeError("Modbus simulator did not start.")
+        return self._link.client_port
+
+    def _run(self, ready: threading.Event):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._serve(ready))
+        except asyncio.CancelledError:
+            pass
+
+    async def _serve(self, ready: threading.Event):
+        # The pymodbus transport binds to the running loop, so create the server inside it.
+        self._server = ModbusSerialServer(
+            self._context, port=self._link.server_port, baudrate=self._baudrate,
+            bytesize=8, parity="N", stopbits=1,
+        )
+        asyncio.get_running_loop().call_soon(ready.set)
+        await self._server.serve_forever()
+
+    def set_input(self, channel: int, blocked: bool):
+        """Sets a 1-based input channel. Call from the simulator thread (see play)."""
+        self._inputs.setValues(channel - 1, [not blocked])
+        self.applied_edges.append((time.monotonic(), channel, blocked))
+
+    def play(self, edges: List[Edge]) -> "asyncio.Future":
+        """Plays `edges` on the simulator thread; returns a concurrent future that resolves when done."""
+        return asyncio.run_coroutine_threadsafe(self._play(edges), self._loop)
+
+    async def _play(self, edges: List[Edge]):
+        start = time.monotonic()
+        for t, channel, blocked in edges:
+            # Sleep coarsely, then spin for the last millisecond to keep edge times precise.
+            delay = start + t - time.monotonic()
+            if delay > 0.002:
+                await asyncio.sleep(delay - 0.001)
+            while time.monotonic() < start + t:
+                pass
+            self.set_input(channel, blocked)
+
+    def stop(self):
+        if self._loop and self._server:
+            asyncio.run_coroutine_threadsafe(self._server.shutdown(), self._loop)
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._link:
+            self._link.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated Modbus RTU I/O modules on a pseudo-terminal.")
+    parser.add_argument("--link", help="Create a symlink to the client port here, e.g. /tmp/ttyMODBUS.")
+    parser.add_argument("--baudrate", type=int, default=settings.MODBUS.BAUDRATE)
+    parser.add_argument("--script", type=Path, help="JSON edge script; overrides the box waveform.")
+    parser.add_argument("--boxes", type=int, default=20)
+    parser.add_argument("--box-length-mm", type=float, default=200)
+    parser.add_argument("--gap-mm", type=float, default=300)
+    parser.add_argument("--belt-speed", type=float, default=0.5, help="Belt speed in m/s.")
+    parser.add_argument("--sensor-spacing-mm", type=float, default=600)
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random variation of box length and gap (0..1).")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--start-delay", type=float, default=5.0, help="Seconds before the first box, to start the app.")
+    parser.add_argument("--coil-log", type=Path, help="Write recorded coil writes to this CSV file on exit.")
+    args = parser.parse_args()
+
+    if args.script:
+        edges = load_script(args.script)
+    else:
+        edges = box_waveform(
+            args.boxes, args.box_length_mm, args.gap_mm, args.belt_speed, args.sensor_spacing_mm,
+            settings.SENSORS.ENTRY_CHANNEL, settings.SENSORS.EXIT_CHANNEL, args.jitter, args.start_delay, args.seed
+        )
+
+    simulator = ModbusRtuSimulator(baudrate=args.baudrate)
+    port = simulator.start()
+    if args.link:
+        if os.path.islink(args.link):
+            os.unlink(args.link)
+        os.symlink(port, args.link)
+        port = args.link
+    print(f"--- Modbus RTU Simulator ---")
+    print(f"Port: {port} at {args.baudrate} baud; {len(edges)} sensor edges over {edges[-1][0] if edges else 0:.1f}s")
+    print("Press Ctrl+C to stop.")
+    start = time.monotonic()
+    try:
+        simulator.play(edges).result()
+        print("Waveform complete; still serving. Press Ctrl+C to stop.")
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+        if args.link and os.path.islink(args.link):
+            os.unlink(args.link)
+        print(f"{len(simulator.coils.writes)} coil write(s) recorded.")
+        if args.coil_log:
+            with open(args.coil_log, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["seconds", "address", "value"])
+                for t, address, value in simulator.coils.writes:
+                    writer.writerow([f"{t - start:.4f}", address, int(value)])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+Pipelined capture -> encode -> publish loop shared by the camera services.
+
+The original services ran capture, JPEG encode and Redis publish one after
+another on a single thread, so encode time capped the frame rate and a Redis
+stall blocked capture. Here each stage runs on its own thread(s):
+
+    capture thread --raw queue--> encoder pool --encoded queue--> publisher thread
+
+- Capture never blocks: if the encoders are behind, the oldest queued raw
+  frame is dropped to make room (counted as `capture_dropped`).
+- The encoder pool has `encoder_threads` workers. Both JPEG backends
+  (OpenCV and libjpeg-turbo via ctypes) release the GIL, so encodes run in
+  parallel.
+- The publisher keeps frames in capture order. A frame that finishes encoding
+  after a newer one has been published is dropped as `stale_dropped`. If the
+  publisher itself stalls, the oldest encoded frame is dropped
+  (`publish_dropped`).
+
+An optional PublishPolicy gates frames right after capture. While the line
+is idle and nobody is watching the live view, the main app switches it to
+"idle": only a periodic keep-alive frame, or a frame that visibly differs
+from the last published one, is encoded and published (the rest are counted
+as `idle_skipped`).
+
+Each stage keeps rolling timing statistics. A reporter thread logs them
+every `log_interval_sec` and hands the same snapshot to `telemetry_sink`
+(the services store it in Redis for the main application's telemetry API).
+"""
+import json
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.core.frame_transport import FramePublisher, PUBLISH_POLICY_FULL, PUBLISH_POLICY_IDLE
+from app.utils.metrics import Counters, RollingStats
+
+
+# Crop edges are snapped to this many pixels (the JPEG MCU size for 4:2:0),
+# so cropped frames encode without partial blocks at the edges.
+ROI_ALIGN = 16
+
+
+class RegionOfInterest:
+    """
+    Crop rectangle applied to every frame before it is encoded.
+
+    Set from the command listener thread as normalised [x, y, width, height]
+    fractions of the frame (so one profile works at any resolution) and read
+    by the encoder threads. The rectangle is swapped as a single tuple, so no
+    lock is needed.
+    """
+    def __init__(self, align: int = ROI_ALIGN):
+        self._align = align
+        self._roi: Optional[Tuple[float, float, float, float]] = None
+
+    @property
+    def value(self) -> Optional[Tuple[float, float, float, float]]:
+        return self._roi
+
+    def set(self, roi) -> bool:
+        """Sets the crop from [x, y, w, h] fractions; None or the full frame clears it. Returns False if invalid."""
+        if roi is None:
+            self._roi = None
+            return True
+        try:
+            x, y, w, h = (float(v) for v in roi)
+        except (TypeError, ValueError):
+            return False
+        x, y = min(max(x, 0.0), 1.0), min(max(y, 0.0), 1.0)
+        w, h = min(w, 1.0 - x), min(h, 1.0 - y)
+        if w <= 0 or h <= 0:
+            return False
+        self._roi = None if (x, y, w, h) == (0.0, 0.0, 1.0, 1.0) else (x, y, w, h)
+        return True
+
+    def pixel_bounds(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        """(x0, y0, x1, y1) of the crop in a width x height frame, edges snapped outwards to the alignment."""
+        roi = self._roi
+        if roi is None:
+            return 0, 0, width, height
+        x, y, w, h = roi
+        a = self._align
+        x0, y0 = int(x * width) // a * a, int(y * height) // a * a
+        x1 = min(width, -(-int(round((x + w) * width)) // a) * a)
+        y1 = min(height, -(-int(round((y + h) * height)) // a) * a)
+        return x0, y0, max(x1, x0 + 1), max(y1, y0 + 1)
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """Returns a view of the region (no copy); the full frame when no ROI is set."""
+        if self._roi is None:
+            return frame
+        x0, y0, x1, y1 = self.pixel_bounds(frame.shape[1], frame.shape[0])
+        return frame[y0:y1, x0:x1]
+
+
+class PublishPolicy:
+    """
+    Decides which captured frames are worth encoding and publishing.
+
+    "full" publishes everything. "idle" publishes a keep-alive frame every
+    `keepalive_interval_sec` (well inside the main app's 5 s health timeout)
+    plus any frame whose mean absolute difference from the last published
+    frame, on a ~`probe_width` px wide grayscale thumbnail, exceeds
+    `change_threshold` grey levels. The thumbnail is a strided view, so the
+    check costs microseconds.
+
+    The mode is set from the set_publish_policy command and from the
+    `camera:publish_policy:{id}` key (see `watch`). When the key expires,
+    e.g. because the main app is down, the policy falls back to full rate.
+    """
+    def __init__(self, keepalive_interval_sec: float = 1.0, change_threshold: float = 6.0, probe_width: int = 64):
+        self._keepalive_interval_sec = keepalive_interval_sec
+        self._change_threshold = change_threshold
+        self._probe_width = probe_width
+        self._mode = PUBLISH_POLICY_FULL
+        self._last_published_at = 0.0
+        self._reference: Optional[np.ndarray] = None
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    def set(self, policy: Optional[Dict[str, Any]]) -> bool:
+        """Applies a {"mode": "full" | "idle"} policy; None means full. Returns True if the mode changed."""
+        mode = (policy or {}).get("mode", PUBLISH_POLICY_FULL)
+        if mode not in (PUBLISH_POLICY_FULL, PUBLISH_POLICY_IDLE):
+            mode = PUBLISH_POLICY_FULL
+        changed = mode != self._mode
+        self._mode = mode
+        return changed
+
+    def _probe(self, image: np.ndarray) -> np.ndarray:
+        step = max(1, image.shape[1] // self._probe_width)
+        probe = image[::step, ::step]
+        if probe.ndim == 3:
+            probe = probe.mean(axis=2)
+        return probe.astype(np.float32)
+
+    def should_publish(self, image: np.ndarray, now: float) -> bool:
+        if self._mode == PUBLISH_POLICY_FULL:
+            self._reference = None
+            self._last_published_at = now
+            return True
+        probe = self._probe(image)
+        publish = (
+            now - self._last_published_at >= self._keepalive_interval_sec
+            or self._reference is None
+            or self._reference.shape != probe.shape
+            or float(np.abs(probe - self._reference).mean()) > self._change_threshold
+        )
+        if publish:
+            self._reference = probe
+            self._last_published_at = now
+        return publish
+
+    def watch(self, redis_client, key: str, name: str, interval_sec: float = 1.0):
+        """Polls the policy key forever (run in a daemon thread)."""
+        while True:
+            try:
+                raw = redis_client.get(key)
+                if self.set(json.loads(raw) if raw else None):
+                    print(f"[{name}] Publish policy: {self._mode}", flush=True)
+            except Exception as e:
+                print(f"[{name}] Failed to read publish policy: {e}", flush=True)
+            time.sleep(interval_sec)
+
+
+class _RawFrame(NamedTuple):
+    seq: int
+    captured_at: float
+    image: np.ndarray
+
+
+class _EncodedFrame(NamedTuple):
+    seq: int
+    captured_at: float
+    jpeg: bytes
+
+
+def _put_latest(q: queue.Queue, item) -> bool:
+    """Puts without blocking, evicting the oldest item if the queue is full. Returns True if something was dropped."""
+    dropped = False
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped = True
+            except queue.Empty:
+                pass
+
+
+class CameraPipeline:
+    def __init__(
+        self,
+        name: str,
+        grab_frame: Callable[[], Optional[np.ndarray]],
+        encode_frame: Callable[[np.ndarray], bytes],
+        publisher: FramePublisher,
+        encoder_threads: int = 2,
+        log_interval_sec: float = 5.0,
+        telemetry_sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+        publish_policy: Optional[PublishPolicy] = None,
+    ):
+        self._name = name
+        self._grab_frame = grab_frame
+        self._encode_frame = encode_frame
+        self._publisher = publisher
+        self._encoder_threads = max(1, encoder_threads)
+        self._log_interval_sec = log_interval_sec
+        self._telemetry_sink = telemetry_sink
+        self._publish_policy = publish_policy
+
+        self._raw_queue: queue.Queue = queue.Queue(maxsize=self._encoder_threads * 2)
+        self._encoded_queue: queue.Queue = queue.Queue(maxsize=self._encoder_threads * 2)
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._last_published_seq = 0
+
+        self.capture_interval_ms = RollingStats()
+        self.capture_ms = RollingStats()
+        self.encode_ms = RollingStats()
+        self.publish_ms = RollingStats()
+        self.pipeline_latency_ms = RollingStats()
+        self.counters = Counters("captured", "published", "capture_dropped", "publish_dropped", "stale_dropped", "encode_errors", "idle_skipped")
+
+    def _encoder_worker(self):
+        while not self._stop_event.is_set():
+            try:
+                raw = self._raw_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            start = time.perf_counter()
+            try:
+                jpeg = self._encode_frame(raw.image)
+            except Exception as e:
+                self.counters.inc("encode_errors")
+                print(f"[{self._name}] Encode error: {e}", flush=True)
+                continue
+            self.encode_ms.add((time.perf_counter() - start) * 1000)
+            if _put_latest(self._encoded_queue, _EncodedFrame(raw.seq, raw.captured_at, jpeg)):
+                self.counters.inc("publish_dropped")
+
+    def _publisher_worker(self):
+        while not self._stop_event.is_set():
+            try:
+                frame = self._encoded_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if frame.seq <= self._last_published_seq:
+                self.counters.inc("stale_dropped")
+                continue
+            start = time.perf_counter()
+            try:
+                self._publisher.publish(frame.jpeg, frame.captured_at)
+            except Exception as e:
+                print(f"[{self._name}] Publish error: {e}", flush=True)
+                time.sleep(0.5)
+                continue
+            self.publish_ms.add((time.perf_counter() - start) * 1000)
+            self.pipeline_latency_ms.add((time.monotonic() - frame.captured_at) * 1000)
+            self._last_published_seq = frame.seq
+            self.counters.inc("published")
+
+    def telemetry(self, capture_fps: float = 0.0, publish_fps: float = 0.0) -> Dict[str, Any]:
+        """A JSON-serialisable snapshot of the pipeline statistics."""
+        return {
+            "service": self._name,
+            "transport": self._publisher.transport,
+            "encoder_threads": self._encoder_threads,
+            "publish_policy": self._publish_policy.mode if self._publish_policy else PUBLISH_POLICY_FULL,
+            "capture_fps": round(capture_fps, 2),
+            "publish_fps": round(publish_fps, 2),
+            "counters": self.counters.snapshot(),
+            "capture_interval_ms": self.capture_interval_ms.snapshot(),
+            "capture_ms": self.capture_ms.snapshot(),
+            "encode_ms": self.encode_ms.snapshot(),
+            "publish_ms": self.publish_ms.snapshot(),
+            "pipeline_latency_ms": self.pipeline_latency_ms.snapshot(),
+            "reported_at": time.time(),
+        }
+
+    def _log_stats(self, stats: Dict[str, Any]):
+        counters = stats["counters"]
+        def fmt(key: str) -> str:
+            snap = stats[key]
+            return f"mean={snap['mean']}ms p95={snap['p95']}ms" if snap["mean"] is not None else "n/a"
+        print(
+            f"[{self._name}] fps={stats['capture_fps']}/{stats['publish_fps']} (capture/publish) "
+            f"captured={counters['captured']} published={counters['published']} "
+            f"dropped(capture={counters['capture_dropped']}, publish={counters['publish_dropped']}, stale={counters['stale_dropped']}) "
+            f"policy={stats['publish_policy']} idle_skipped={counters['idle_skipped']} | "
+            f"interval {fmt('capture_interval_ms')} | capture {fmt('capture_ms')} | "
+            f"encode {fmt('encode_ms')} | publish {fmt('publish_ms')} | latency {fmt('pipeline_latency_ms')}",
+            flush=True
+        )
+
+    def _reporter_worker(self):
+        last_time = time.monotonic()
+        last_captured, last_published = 0, 0
+        while not self._stop_event.wait(self._log_interval_sec):
+            now = time.monotonic()
+            elapsed = max(now - last_time, 1e-6)
+            captured, published = self.counters.get("captured"), self.counters.get("published")
+            stats = self.telemetry((captured - last_captured) / elapsed, (published - last_published) / elapsed)
+            last_time, last_captured, last_published = now, captured, published
+            self._log_stats(stats)
+            if self._telemetry_sink:
+                try:
+                    self._telemetry_sink(stats)
+                except Exception as e:
+                    print(f"[{self._name}] Telemetry report failed: {e}", flush=True)
+
+    def run(self):
+        """Starts the encoder/publisher threads and runs the capture loop on the calling thread."""
+        for i in range(self._encoder_threads):
+            t = threading.Thread(target=self._encoder_worker, name=f"{self._name}-encoder-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._publisher_worker, name=f"{self._name}-publisher", daemon=True)
+        t.start()
+        self._threads.append(t)
+        t = threading.Thread(target=self._reporter_worker, name=f"{self._name}-reporter", daemon=True)
+        t.start()
+        self._threads.append(t)
+        print(f"[{self._name}] Pipeline started with {self._encoder_threads} encoder thread(s).", flush=True)
+
+        seq = 0
+        last_capture = None
+        try:
+            while not self._stop_event.is_set():
+                start = time.perf_counter()
+                image = self._grab_frame()
+                captured_at = time.monotonic()
+                if image is None:
+                    continue
+                self.capture_ms.add((time.perf_counter() - start) * 1000)
+                if last_capture is not None:
+                    self.capture_interval_ms.add((captured_at - last_capture) * 1000)
+                last_capture = captured_at
+                self.counters.inc("captured")
+                if self._publish_policy and not self._publish_policy.should_publish(image, captured_at):
+                    self.counters.inc("idle_skipped")
+                    continue
+
+                seq += 1
+                if _put_latest(self._raw_queue, _RawFrame(seq, captured_at, image)):
+                    self.counters.inc("capture_dropped")
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop_event.set()
+        for t in self._threads:
+            t.join(timeout=1.0)
+        self._threads.clear()
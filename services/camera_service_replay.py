@@ -0,0 +1,297 @@
+"""
+Standalone replay camera service for load testing without camera hardware.
+
+Replays a directory of images (JPEG/PNG, in file-name order) or a video file
+as if it were the RPi or USB camera:
+
+- It publishes on the same channels as the camera it stands in for
+  (CAMERA_REPLAY_CAMERA_ID), through the same capture -> encode -> publish
+  pipeline and frame transport, so AsyncCameraManager, the live stream and the
+  capture-to-QC path cannot tell the difference.
+- Frames are paced to CAMERA_REPLAY_FPS and resized to the configured
+  resolution (0 keeps the source size). The source loops by default.
+- It listens on `camera:commands:{id}` like the real services. 'brightness'
+  and 'gain' are simulated as a brightness offset and a contrast gain,
+  'roi' crops exactly as on the real cameras, and the remaining controls
+  are logged and ignored. Gain is interpreted on the scale of the camera
+  being replaced (RPi analogue gain 1-16, USB CAP_PROP_GAIN 0-255) and
+  mapped onto at most MAX_SIMULATED_CONTRAST, so a profile tuned for real
+  hardware does not wash out the replayed frames.
+
+Example, with CAMERA_MODE=replay in the main app's .env:
+
+    CAMERA_REPLAY_SOURCE=/data/conveyor_clip.mp4 CAMERA_REPLAY_FPS=60 \
+        python services/camera_service_replay.py
+"""
+import time
+import cv2
+import redis
+import traceback
+import json
+import sys
+import threading
+from pathlib import Path
+from typing import List, Literal, Optional
+import numpy as np
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+# --- Constants and Paths ---
+PROJECT_ROOT = Path(__file__).parent.parent
+ENV_PATH = PROJECT_ROOT / ".env"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+MAX_SIMULATED_CONTRAST = 2.0
+# (no gain, maximum gain) of each real camera's 'gain' control.
+GAIN_RANGES = {'rpi': (1.0, 16.0), 'usb': (0.0, 255.0)}
+
+# Allow importing the shared frame transport from the main application package.
+sys.path.insert(0, str(PROJECT_ROOT))
+from app.core.frame_transport import FramePublisher, DEFAULT_SLOT_COUNT, DEFAULT_SLOT_SIZE, telemetry_key, publish_policy_key
+from services.camera_pipeline import CameraPipeline, PublishPolicy, RegionOfInterest
+from app.utils.jpeg_codec import get_jpeg_codec
+
+class ReplaySettings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=str(ENV_PATH), env_prefix='CAMERA_REPLAY_', case_sensitive=False, extra='ignore')
+    SOURCE: str = Field(..., description="Directory of images or a video file to replay.")
+    CAMERA_ID: Literal['rpi', 'usb'] = 'usb'
+    FPS: float = Field(30.0, gt=0)
+    RESOLUTION_WIDTH: int = Field(0, ge=0)
+    RESOLUTION_HEIGHT: int = Field(0, ge=0)
+    LOOP: bool = True
+    PRELOAD_MAX_FRAMES: int = Field(300, ge=0, description="Image directories up to this size are decoded once and kept in memory.")
+    JPEG_QUALITY: int = Field(90, ge=10, le=100)
+    FRAME_TRANSPORT: Literal['redis', 'shm'] = 'redis'
+    SHM_SLOTS: int = Field(DEFAULT_SLOT_COUNT, ge=2)
+    SHM_SLOT_BYTES: int = Field(DEFAULT_SLOT_SIZE, ge=64 * 1024)
+    ENCODER_THREADS: int = Field(2, ge=1, le=8)
+    TELEMETRY_INTERVAL_SEC: float = Field(5.0, gt=0)
+    IDLE_KEEPALIVE_SEC: float = Field(1.0, gt=0, le=4.0)
+    IDLE_CHANGE_THRESHOLD: float = Field(6.0, ge=0)
+    JPEG_CODEC: Literal['auto', 'turbojpeg', 'opencv'] = 'auto'
+
+class RedisSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=str(ENV_PATH), env_prefix='REDIS_', case_sensitive=False, extra='ignore')
+    HOST: str = 'localhost'
+    PORT: int = 6379
+
+# Simulated camera controls, replaced as a whole by apply_camera_settings.
+simulated_controls = {"brightness": 128, "gain": 0}
+# The camera this replay stands in for, set in main(); selects the gain scale.
+replayed_camera_id = 'usb'
+region_of_interest = RegionOfInterest()
+# Full rate vs. idle keep-alive/change-only publishing, set by the main app.
+publish_policy = None
+
+def _resize(frame: np.ndarray, width: int, height: int) -> np.ndarray:
+    if not width or not height or (frame.shape[1], frame.shape[0]) == (width, height):
+        return frame
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+class ImageDirectorySource:
+    """Images in a directory, in file-name order. Small sets are decoded once up front."""
+    def __init__(self, directory: Path, width: int, height: int, loop: bool, preload_max: int):
+        self._paths: List[Path] = sorted(p for p in directory.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        if not self._paths:
+            raise RuntimeError(f"No images found in '{directory}'.")
+        self._width, self._height, self._loop = width, height, loop
+        self._index = 0
+        self._frames: Optional[List[np.ndarray]] = None
+        if len(self._paths) <= preload_max:
+            self._frames = [f for f in (self._load(p) for p in self._paths) if f is not None]
+        print(f"[Replay Camera Service] {len(self._paths)} image(s) from '{directory}'"
+              f"{' (preloaded)' if self._frames is not None else ''}.", flush=True)
+
+    def _load(self, path: Path) -> Optional[np.ndarray]:
+        frame = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if frame is None:
+            print(f"[Replay Camera Service] WARNING: Could not decode '{path.name}'. Skipping.", flush=True)
+            return None
+        return _resize(frame, self._width, self._height)
+
+    def read(self) -> Optional[np.ndarray]:
+        count = len(self._frames) if self._frames is not None else len(self._paths)
+        for _ in range(count):
+            if self._index >= count:
+                if not self._loop:
+                    return None
+                self._index = 0
+            i = self._index
+            self._index += 1
+            frame = self._frames[i] if self._frames is not None else self._load(self._paths[i])
+            if frame is not None:
+                return frame
+        return None
+
+    def close(self):
+        pass
+
+class VideoFileSource:
+    """Frames of a video file, rewound at the end when looping."""
+    def __init__(self, path: Path, width: int, height: int, loop: bool):
+        self._capture = cv2.VideoCapture(str(path))
+        if not self._capture.isOpened():
+            raise RuntimeError(f"Could not open video '{path}'.")
+        self._width, self._height, self._loop = width, height, loop
+        print(f"[Replay Camera Service] Video '{path.name}' ({int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))} frames).", flush=True)
+
+    def read(self) -> Optional[np.ndarray]:
+        ret, frame = self._capture.read()
+        if not ret and self._loop:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._capture.read()
+        return _resize(frame, self._width, self._height) if ret else None
+
+    def close(self):
+        self._capture.release()
+
+def open_source(settings: ReplaySettings):
+    source = Path(settings.SOURCE).expanduser()
+    if not source.is_absolute():
+        source = PROJECT_ROOT / source
+    if source.is_dir():
+        return ImageDirectorySource(source, settings.RESOLUTION_WIDTH, settings.RESOLUTION_HEIGHT, settings.LOOP, settings.PRELOAD_MAX_FRAMES)
+    if source.is_file():
+        return VideoFileSource(source, settings.RESOLUTION_WIDTH, settings.RESOLUTION_HEIGHT, settings.LOOP)
+    raise RuntimeError(f"Replay source '{source}' does not exist.")
+
+def _control_value(settings_dict: dict, name: str, cast):
+    # Profiles store unset controls as None; keep the current simulated value then.
+    value = settings_dict.get(name)
+    return simulated_controls[name] if value is None else cast(value)
+
+def apply_camera_settings(settings_dict: dict):
+    """Simulates the controls a replay can honour and records the rest."""
+    global simulated_controls
+    print("\n--- Applying New Replay Camera Settings from Command ---", flush=True)
+    if 'roi' in settings_dict:
+        if region_of_interest.set(settings_dict['roi']):
+            print(f"  -> Region of interest: {region_of_interest.value or 'full frame'}", flush=True)
+        else:
+            print(f"  -> Ignoring invalid region of interest: {settings_dict['roi']}", flush=True)
+    controls = {
+        "brightness": _control_value(settings_dict, 'brightness', int),
+        # Fractional gains (e.g. 2.5 on the RPi camera) change the simulated contrast too.
+        "gain": _control_value(settings_dict, 'gain', float),
+    }
+    simulated_controls = controls
+    print(f"  -> Brightness: {controls['brightness']} (simulated)", flush=True)
+    print(f"  -> Gain: {controls['gain']} (simulated)", flush=True)
+    ignored = sorted(k for k in settings_dict if k not in ('roi', 'brightness', 'gain'))
+    if ignored:
+        print(f"  -> Not simulated: {', '.join(ignored)}", flush=True)
+    print("-------------------------------------------\n", flush=True)
+
+def simulated_contrast(gain: float, camera_id: str) -> float:
+    """Maps a real camera's gain onto a contrast multiplier between 1 and MAX_SIMULATED_CONTRAST."""
+    no_gain, max_gain = GAIN_RANGES[camera_id]
+    fraction = min(max((gain - no_gain) / (max_gain - no_gain), 0.0), 1.0)
+    return 1.0 + fraction * (MAX_SIMULATED_CONTRAST - 1.0)
+
+def apply_simulated_controls(frame: np.ndarray) -> np.ndarray:
+    controls = simulated_controls
+    beta = controls['brightness'] - 128
+    alpha = simulated_contrast(controls['gain'], replayed_camera_id)
+    if beta == 0 and alpha == 1.0:
+        return frame
+    return cv2.convertScaleAbs(frame, alpha=alpha, beta=beta)
+
+def command_listener(redis_client: redis.Redis, channel: str):
+    """A thread that listens for commands and applies settings."""
+    pubsub = redis_client.pubsub()
+    pubsub.subscribe(channel)
+    print(f"[Command Listener] Subscribed to '{channel}' for live commands.", flush=True)
+    for message in pubsub.listen():
+        if message['type'] == 'message':
+            try:
+                command = json.loads(message['data'])
+                if command.get('action') == 'apply_settings':
+                    settings_to_apply = command.get('settings')
+                    if isinstance(settings_to_apply, dict):
+                        apply_camera_settings(settings_to_apply)
+                elif command.get('action') == 'set_publish_policy' and publish_policy:
+                    if publish_policy.set(command.get('policy')):
+                        print(f"[Command Listener] Publish policy: {publish_policy.mode}", flush=True)
+            except Exception as e:
+                print(f"[Command Listener] Error processing command: {e}", flush=True)
+
+def main():
+    global publish_policy, replayed_camera_id
+    replay_settings = ReplaySettings()
+    redis_settings = RedisSettings()
+    cam_id = replayed_camera_id = replay_settings.CAMERA_ID
+    redis_client = None
+    publisher = None
+    source = None
+    pipeline = None
+
+    try:
+        source = open_source(replay_settings)
+
+        redis_client = redis.Redis(host=redis_settings.HOST, port=redis_settings.PORT, decode_responses=False)
+        redis_client.ping()
+        print("[Replay Camera Service] Redis connection successful.", flush=True)
+
+        publish_policy = PublishPolicy(replay_settings.IDLE_KEEPALIVE_SEC, replay_settings.IDLE_CHANGE_THRESHOLD)
+        listener_thread = threading.Thread(target=command_listener, args=(redis_client, f"camera:commands:{cam_id}"), daemon=True)
+        listener_thread.start()
+
+        publisher = FramePublisher(
+            redis_client, cam_id, transport=replay_settings.FRAME_TRANSPORT,
+            slot_count=replay_settings.SHM_SLOTS, slot_size=replay_settings.SHM_SLOT_BYTES
+        )
+        print(f"[Replay Camera Service] Replaying as '{cam_id}' at {replay_settings.FPS} FPS. "
+              f"Publishing to '{publisher.channel}' ({publisher.transport}).", flush=True)
+
+        # Deadline pacing: a slow read or encode is caught up on the next frame
+        # instead of drifting the overall rate.
+        frame_interval = 1.0 / replay_settings.FPS
+        next_frame_at = time.monotonic()
+        def grab_frame():
+            nonlocal next_frame_at
+            delay = next_frame_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_frame_at = max(next_frame_at + frame_interval, time.monotonic() - frame_interval)
+            frame = source.read()
+            if frame is None:
+                print("[Replay Camera Service] End of source reached.", flush=True)
+                pipeline.stop()
+                return None
+            return apply_simulated_controls(frame)
+
+        codec = get_jpeg_codec(replay_settings.JPEG_CODEC)
+        print(f"[Replay Camera Service] JPEG codec: {codec.name}", flush=True)
+        def encode_frame(frame):
+            return codec.encode(region_of_interest.crop(frame), replay_settings.JPEG_QUALITY)
+
+        def publish_telemetry(stats):
+            redis_client.set(telemetry_key(cam_id), json.dumps(stats), ex=max(15, int(replay_settings.TELEMETRY_INTERVAL_SEC * 3)))
+
+        # While the line is idle and no live view is open, only keep-alive and
+        # changed frames are encoded and published.
+        threading.Thread(
+            target=publish_policy.watch, args=(redis_client, publish_policy_key(cam_id), "Replay Camera Service"), daemon=True
+        ).start()
+
+        pipeline = CameraPipeline(
+            "Replay Camera Service", grab_frame=grab_frame, encode_frame=encode_frame,
+            publisher=publisher, encoder_threads=replay_settings.ENCODER_THREADS,
+            log_interval_sec=replay_settings.TELEMETRY_INTERVAL_SEC, telemetry_sink=publish_telemetry,
+            publish_policy=publish_policy
+        )
+        pipeline.run()
+
+    except Exception as e:
+        print(f"[Replay Camera Service] FATAL ERROR: {e}", flush=True)
+        print(traceback.format_exc(), flush=True)
+    finally:
+        if source:
+            source.close()
+        if publisher:
+            publisher.close()
+        if redis_client:
+            redis_client.close()
+        print("[Replay Camera Service] Exited.", flush=True)
+
+if __name__ == "__main__":
+    main()
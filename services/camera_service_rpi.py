@@ -13,8 +13,10 @@ import cv2
 import redis
 import traceback
 import json
+import sys
 import threading
 from pathlib import Path
+from typing import Literal
 from pydantic import Field, ValidationError
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -22,7 +24,19 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 camera = None
 
 # --- Robust Path and Configuration ---
-ENV_PATH = Path(__file__).parent.parent / ".env"
+PROJECT_ROOT = Path(__file__).parent.parent
+ENV_PATH = PROJECT_ROOT / ".env"
+
+# Allow importing the shared frame transport from the main application package.
+sys.path.insert(0, str(PROJECT_ROOT))
+from app.core.frame_transport import FramePublisher, DEFAULT_SLOT_COUNT, DEFAULT_SLOT_SIZE, telemetry_key, publish_policy_key
+from services.camera_pipeline import CameraPipeline, PublishPolicy, RegionOfInterest
+from app.utils.jpeg_codec import get_jpeg_codec
+
+# Crop applied before encoding; set by the 'roi' key of apply_settings commands.
+region_of_interest = RegionOfInterest()
+# Full rate vs. idle keep-alive/change-only publishing, set by the main app.
+publish_policy = None
 
 class RpiSettings(BaseSettings):
     model_config = SettingsConfigDict(env_file=str(ENV_PATH), env_prefix='CAMERA_RPI_', case_sensitive=False, extra='ignore')
@@ -31,6 +45,14 @@ class RpiSettings(BaseSettings):
     RESOLUTION_HEIGHT: int = 720
     FPS: int = 30
     JPEG_QUALITY: int = Field(90, ge=10, le=100)
+    FRAME_TRANSPORT: Literal['redis', 'shm'] = 'redis'
+    SHM_SLOTS: int = Field(DEFAULT_SLOT_COUNT, ge=2)
+    SHM_SLOT_BYTES: int = Field(DEFAULT_SLOT_SIZE, ge=64 * 1024)
+    ENCODER_THREADS: int = Field(2, ge=1, le=8)
+    TELEMETRY_INTERVAL_SEC: float = Field(5.0, gt=0)
+    IDLE_KEEPALIVE_SEC: float = Field(1.0, gt=0, le=4.0)
+    IDLE_CHANGE_THRESHOLD: float = Field(6.0, ge=0)
+    JPEG_CODEC: Literal['auto', 'turbojpeg', 'opencv'] = 'auto'
 
 class RedisSettings(BaseSettings):
     model_config = SettingsConfigDict(env_file=str(ENV_PATH), env_prefix='REDIS_', case_sensitive=False, extra='ignore')
@@ -39,9 +61,18 @@ class RedisSettings(BaseSettings):
 
 REDIS_COMMAND_CHANNEL = "camera:commands:rpi"
 
+def apply_region_of_interest(roi):
+    """Crops frames to [x, y, width, height] (fractions of the frame) before encoding; None restores the full frame."""
+    if region_of_interest.set(roi):
+        print(f"[RPI Camera Service] Region of interest: {region_of_interest.value or 'full frame'}", flush=True)
+    else:
+        print(f"[RPI Camera Service] Ignoring invalid region of interest: {roi}", flush=True)
+
 def apply_camera_settings(settings_dict: dict):
     """Applies a dictionary of settings to the global picamera2 object."""
     global camera
+    if 'roi' in settings_dict:
+        apply_region_of_interest(settings_dict['roi'])
     if camera is None:
         print("[RPI Camera Service] Error: Cannot apply settings, camera is not available.", flush=True)
         return
@@ -102,11 +133,14 @@ def command_listener(redis_client: redis.Redis):
                     settings_to_apply = command.get('settings')
                     if isinstance(settings_to_apply, dict):
                         apply_camera_settings(settings_to_apply)
+                elif command.get('action') == 'set_publish_policy' and publish_policy:
+                    if publish_policy.set(command.get('policy')):
+                        print(f"[Command Listener] Publish policy: {publish_policy.mode}", flush=True)
             except Exception as e:
                 print(f"[Command Listener] Error processing command: {e}", flush=True)
 
 def main():
-    global camera
+    global camera, publish_policy
     try:
         rpi_cam_settings = RpiSettings()
         redis_settings = RedisSettings()
@@ -122,6 +156,7 @@ def main():
             raise
 
     redis_client = None
+    publisher = None
     try:
         from picamera2 import Picamera2
         
@@ -150,6 +185,7 @@ def main():
         redis_client.ping()
         print("[RPI Camera Service] Redis connection successful.", flush=True)
 
+        publish_policy = PublishPolicy(rpi_cam_settings.IDLE_KEEPALIVE_SEC, rpi_cam_settings.IDLE_CHANGE_THRESHOLD)
         listener_thread = threading.Thread(target=command_listener, args=(redis_client,), daemon=True)
         listener_thread.start()
 
@@ -167,14 +203,36 @@ def main():
         apply_camera_settings({'autofocus': True, 'white_balance_temp': 0})
         
         camera.start()
-        frame_channel = 'camera:frames:rpi'
-        print(f"[RPI Camera Service] Camera started. Publishing to '{frame_channel}'.", flush=True)
+        publisher = FramePublisher(
+            redis_client, 'rpi', transport=rpi_cam_settings.FRAME_TRANSPORT,
+            slot_count=rpi_cam_settings.SHM_SLOTS, slot_size=rpi_cam_settings.SHM_SLOT_BYTES
+        )
+        print(f"[RPI Camera Service] Camera started. Publishing to '{publisher.channel}' ({publisher.transport}).", flush=True)
         time.sleep(2) 
 
-        while True:
-            frame = camera.capture_array()
-            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, rpi_cam_settings.JPEG_QUALITY])
-            redis_client.publish(frame_channel, buffer.tobytes())
+        codec = get_jpeg_codec(rpi_cam_settings.JPEG_CODEC)
+        print(f"[RPI Camera Service] JPEG codec: {codec.name}", flush=True)
+        def encode_frame(frame):
+            return codec.encode(region_of_interest.crop(frame), rpi_cam_settings.JPEG_QUALITY)
+
+        # Pipeline statistics are stored in Redis (with an expiry, so a dead
+        # service disappears) for the main app's camera telemetry API.
+        def publish_telemetry(stats):
+            redis_client.set(telemetry_key('rpi'), json.dumps(stats), ex=max(15, int(rpi_cam_settings.TELEMETRY_INTERVAL_SEC * 3)))
+
+        # While the line is idle and no live view is open, only keep-alive and
+        # changed frames are encoded and published.
+        threading.Thread(
+            target=publish_policy.watch, args=(redis_client, publish_policy_key('rpi'), "RPI Camera Service"), daemon=True
+        ).start()
+
+        pipeline = CameraPipeline(
+            "RPI Camera Service", grab_frame=camera.capture_array, encode_frame=encode_frame,
+            publisher=publisher, encoder_threads=rpi_cam_settings.ENCODER_THREADS,
+            log_interval_sec=rpi_cam_settings.TELEMETRY_INTERVAL_SEC, telemetry_sink=publish_telemetry,
+            publish_policy=publish_policy
+        )
+        pipeline.run()
 
     except ImportError:
         print("[RPI Camera Service] FATAL ERROR: The 'picamera2' library is not installed.", flush=True)
@@ -184,6 +242,8 @@ def main():
     finally:
         if 'camera' in locals() and camera and camera.is_open:
             camera.stop()
+        if publisher:
+            publisher.close()
         if 'redis_client' in locals() and redis_client:
             redis_client.close()
         print("[RPI Camera Service] Exited.", flush=True)
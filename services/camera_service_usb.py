@@ -16,14 +16,29 @@ import cv2
 import redis
 import traceback
 import json
+import sys
 import threading
 from pathlib import Path
+from typing import Literal
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # --- Constants and Paths ---
-ENV_PATH = Path(__file__).parent.parent / ".env"
+PROJECT_ROOT = Path(__file__).parent.parent
+ENV_PATH = PROJECT_ROOT / ".env"
+
+# Allow importing the shared frame transport from the main application package.
+sys.path.insert(0, str(PROJECT_ROOT))
+from app.core.frame_transport import FramePublisher, DEFAULT_SLOT_COUNT, DEFAULT_SLOT_SIZE, telemetry_key, publish_policy_key
+from services.camera_pipeline import CameraPipeline, PublishPolicy, RegionOfInterest
+from app.utils.jpeg_codec import get_jpeg_codec
+
 REDIS_COMMAND_CHANNEL = "camera:commands:usb"
 camera = None # Global camera object
+# Crop applied before encoding; set by the 'roi' key of apply_settings commands.
+region_of_interest = RegionOfInterest()
+# Full rate vs. idle keep-alive/change-only publishing, set by the main app.
+publish_policy = None
 
 # --- Simple Settings Loader for Essential Hardware Config ONLY ---
 class UsbHardwareSettings(BaseSettings):
@@ -35,10 +50,27 @@ class UsbHardwareSettings(BaseSettings):
     )
     DEVICE_INDEX: int = 0
     JPEG_QUALITY: int = 90
+    FRAME_TRANSPORT: Literal['redis', 'shm'] = 'redis'
+    SHM_SLOTS: int = Field(DEFAULT_SLOT_COUNT, ge=2)
+    SHM_SLOT_BYTES: int = Field(DEFAULT_SLOT_SIZE, ge=64 * 1024)
+    ENCODER_THREADS: int = Field(2, ge=1, le=8)
+    TELEMETRY_INTERVAL_SEC: float = Field(5.0, gt=0)
+    IDLE_KEEPALIVE_SEC: float = Field(1.0, gt=0, le=4.0)
+    IDLE_CHANGE_THRESHOLD: float = Field(6.0, ge=0)
+    JPEG_CODEC: Literal['auto', 'turbojpeg', 'opencv'] = 'auto'
+
+def apply_region_of_interest(roi):
+    """Crops frames to [x, y, width, height] (fractions of the frame) before encoding; None restores the full frame."""
+    if region_of_interest.set(roi):
+        print(f"[USB Camera Service] Region of interest: {region_of_interest.value or 'full frame'}", flush=True)
+    else:
+        print(f"[USB Camera Service] Ignoring invalid region of interest: {roi}", flush=True)
 
 def apply_camera_settings(settings_dict: dict):
     """Applies a dictionary of settings to the global camera object."""
     global camera
+    if 'roi' in settings_dict:
+        apply_region_of_interest(settings_dict['roi'])
     if camera is None or not camera.isOpened():
         print("[USB Camera Service] Error: Cannot apply settings, camera is not available.", flush=True)
         return
@@ -96,13 +128,17 @@ def command_listener(redis_client: redis.Redis):
                     settings_to_apply = command.get('settings')
                     if isinstance(settings_to_apply, dict):
                         apply_camera_settings(settings_to_apply)
+                elif command.get('action') == 'set_publish_policy' and publish_policy:
+                    if publish_policy.set(command.get('policy')):
+                        print(f"[Command Listener] Publish policy: {publish_policy.mode}", flush=True)
             except Exception as e:
                 print(f"[Command Listener] Error processing command: {e}", flush=True)
 
 def main():
-    global camera
+    global camera, publish_policy
     hardware_settings = UsbHardwareSettings()
     redis_client = None
+    publisher = None
 
     try:
         # Connect to Redis, ensuring it handles raw bytes
@@ -110,6 +146,7 @@ def main():
         redis_client.ping()
         print("[USB Camera Service] Redis connection successful.", flush=True)
 
+        publish_policy = PublishPolicy(hardware_settings.IDLE_KEEPALIVE_SEC, hardware_settings.IDLE_CHANGE_THRESHOLD)
         listener_thread = threading.Thread(target=command_listener, args=(redis_client,), daemon=True)
         listener_thread.start()
 
@@ -122,30 +159,45 @@ def main():
         # Apply default "auto" settings on startup
         apply_camera_settings({})
         
-        frame_channel = 'camera:frames:usb'
-        print(f"[USB Camera Service] Starting capture loop. Publishing to '{frame_channel}'.", flush=True)
+        publisher = FramePublisher(
+            redis_client, 'usb', transport=hardware_settings.FRAME_TRANSPORT,
+            slot_count=hardware_settings.SHM_SLOTS, slot_size=hardware_settings.SHM_SLOT_BYTES
+        )
+        print(f"[USB Camera Service] Starting capture loop. Publishing to '{publisher.channel}' ({publisher.transport}).", flush=True)
         time.sleep(1)
 
-        frame_count = 0
-        last_log_time = time.time()
-        while True:
+        def grab_frame():
             ret, frame = camera.read()
             if not ret:
                 print("[USB Camera Service] WARNING: camera.read() returned False. Check camera connection.", flush=True)
-                time.sleep(1) 
-                continue
-
-            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, hardware_settings.JPEG_QUALITY])
-            # Publish the raw bytes of the JPEG image
-            redis_client.publish(frame_channel, buffer.tobytes())
-            frame_count += 1
-            
-            # Log status every 5 seconds
-            current_time = time.time()
-            if current_time - last_log_time >= 5.0:
-                print(f"[USB Camera Service] Published {frame_count} frames to '{frame_channel}' in the last 5 seconds.", flush=True)
-                frame_count = 0
-                last_log_time = current_time
+                time.sleep(1)
+                return None
+            return frame
+
+        codec = get_jpeg_codec(hardware_settings.JPEG_CODEC)
+        print(f"[USB Camera Service] JPEG codec: {codec.name}", flush=True)
+        def encode_frame(frame):
+            return codec.encode(region_of_interest.crop(frame), hardware_settings.JPEG_QUALITY)
+
+        # Capture, encode and publish run as separate pipeline stages. Per-stage
+        # timing and drop counters are logged and stored in Redis (with an
+        # expiry, so a dead service disappears) for the main app's telemetry API.
+        def publish_telemetry(stats):
+            redis_client.set(telemetry_key('usb'), json.dumps(stats), ex=max(15, int(hardware_settings.TELEMETRY_INTERVAL_SEC * 3)))
+
+        # While the line is idle and no live view is open, only keep-alive and
+        # changed frames are encoded and published.
+        threading.Thread(
+            target=publish_policy.watch, args=(redis_client, publish_policy_key('usb'), "USB Camera Service"), daemon=True
+        ).start()
+
+        pipeline = CameraPipeline(
+            "USB Camera Service", grab_frame=grab_frame, encode_frame=encode_frame,
+            publisher=publisher, encoder_threads=hardware_settings.ENCODER_THREADS,
+            log_interval_sec=hardware_settings.TELEMETRY_INTERVAL_SEC, telemetry_sink=publish_telemetry,
+            publish_policy=publish_policy
+        )
+        pipeline.run()
 
     except Exception as e:
         print(f"[USB Camera Service] FATAL ERROR: {e}", flush=True)
@@ -153,6 +205,8 @@ def main():
     finally:
         if camera and camera.isOpened():
             camera.release()
+        if publisher:
+            publisher.close()
         if redis_client:
             redis_client.close()
         print("[USB Camera Service] Exited.", flush=True)
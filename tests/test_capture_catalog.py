@@ -0,0 +1,104 @@
+"""
+Tests for the SQLite-backed capture catalogue (keyset paging and reconcile).
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.models import Base, CaptureRecord
+from app.services.capture_catalog import AsyncCaptureCatalog, PageCursor
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'catalog.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+@pytest.fixture
+def catalog(session_factory, tmp_path):
+    return AsyncCaptureCatalog(session_factory, tmp_path / "captures", ["usb"])
+
+
+async def add_rows(session_factory, rows):
+    async with session_factory() as session:
+        session.add_all([CaptureRecord(camera_id="usb", filename=name, captured_at=at, size_bytes=1) for name, at in rows])
+        await session.commit()
+
+
+async def all_pages(catalog, page_size):
+    names, cursor = [], None
+    while True:
+        records, has_more, cursor = await catalog.list_page("usb", page_size, after=cursor)
+        names.extend(r.filename for r in records)
+        if not has_more:
+            assert cursor is None
+            return names
+
+
+def test_page_cursor_round_trip():
+    cursor = PageCursor(datetime(2024, 5, 1, 12, 30, 15, 250000), 42)
+    assert PageCursor.decode(cursor.encode()) == cursor
+    with pytest.raises(ValueError):
+        PageCursor.decode("not-a-cursor")
+
+
+async def test_equal_timestamps_page_by_id_without_gaps_or_repeats(catalog, session_factory):
+    t0 = datetime(2024, 5, 1, 12, 0, 0)
+    # Five captures share one timestamp, so pages must split them by id.
+    await add_rows(session_factory, [(f"same_{i}.jpg", t0) for i in range(5)] + [("older.jpg", t0 - timedelta(seconds=1))])
+
+    names = await all_pages(catalog, page_size=2)
+
+    assert names == ["same_4.jpg", "same_3.jpg", "same_2.jpg", "same_1.jpg", "same_0.jpg", "older.jpg"]
+
+
+async def test_last_page_has_no_cursor(catalog, session_factory):
+    t0 = datetime(2024, 5, 1, 12, 0, 0)
+    await add_rows(session_factory, [(f"c_{i}.jpg", t0 + timedelta(seconds=i)) for i in range(4)])
+
+    first, has_more, cursor = await catalog.list_page("usb", 2)
+    assert [r.filename for r in first] == ["c_3.jpg", "c_2.jpg"] and has_more
+    # The cursor survives the trip through the query string.
+    last, has_more, cursor = await catalog.list_page("usb", 2, after=PageCursor.decode(cursor.encode()))
+    assert [r.filename for r in last] == ["c_1.jpg", "c_0.jpg"]
+    assert has_more is False and cursor is None
+    assert await catalog.list_page("usb", 2, after=PageCursor(last[-1].captured_at, last[-1].id)) == ([], False, None)
+
+
+async def test_reconcile_indexes_new_files_and_drops_rows_for_removed_ones(catalog, session_factory, tmp_path):
+    camera_dir = tmp_path / "captures" / "usb"
+    camera_dir.mkdir(parents=True)
+    (camera_dir / "on_disk.jpg").write_bytes(b"x" * 10)
+    (camera_dir / "both.jpg").write_bytes(b"x" * 20)
+    (camera_dir / "notes.txt").write_text("ignored")
+    old = datetime.now() - timedelta(hours=1)
+    os.utime(camera_dir / "on_disk.jpg", (old.timestamp(), old.timestamp()))
+    await add_rows(session_factory, [("both.jpg", old), ("deleted.jpg", old)])
+
+    assert not catalog.covers("usb")
+    await catalog.reconcile("usb")
+
+    assert catalog.covers("usb")
+    async with session_factory() as session:
+        rows = {r.filename: r for r in (await session.execute(select(CaptureRecord))).scalars()}
+    assert sorted(rows) == ["both.jpg", "on_disk.jpg"]
+    assert rows["on_disk.jpg"].size_bytes == 10
+    assert abs((rows["on_disk.jpg"].captured_at - old).total_seconds()) < 1
+
+
+async def test_reconcile_keeps_rows_recorded_after_the_scan_started(catalog, session_factory):
+    # Saved by a live capture while the (empty) directory was being scanned.
+    await add_rows(session_factory, [("live.jpg", datetime.now() + timedelta(seconds=5))])
+
+    await catalog.reconcile("usb")
+
+    records, _, _ = await catalog.list_page("usb", 10)
+    assert [r.filename for r in records] == ["live.jpg"]
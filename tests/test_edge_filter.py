@@ -0,0 +1,67 @@
+"""
+Tests for the sensor edge timing and debounce filter used by the Modbus poller.
+"""
+import pytest
+
+from app.core.edge_filter import SensorEdgeFilter
+
+BLOCKED, CLEAR = False, True  # NPN: a blocked sensor reads LOW.
+
+
+def feed(f, samples, **limits):
+    """Feeds (time, level) samples like the poller does; returns the accepted edges."""
+    edges, previous = [], None
+    for sampled_at, level in samples:
+        if level != f.level or f.pending:
+            edge = f.update(level, sampled_at, previous, **limits)
+            if edge is not None:
+                edges.append(edge)
+        previous = sampled_at
+    return edges
+
+
+def test_edge_is_timed_at_midpoint_between_samples():
+    f = SensorEdgeFilter()
+    block, release = feed(f, [(1.00, CLEAR), (1.05, BLOCKED), (1.10, BLOCKED), (1.30, CLEAR)])
+    assert block.level is BLOCKED
+    assert block.timestamp == pytest.approx(1.025)
+    assert release.timestamp == pytest.approx(1.20)
+    assert release.pulse_ms == pytest.approx(175)
+
+
+def test_first_sample_without_history_is_timed_at_the_sample():
+    f = SensorEdgeFilter()
+    assert f.update(BLOCKED, 2.0).timestamp == pytest.approx(2.0)
+
+
+def test_flicker_shorter_than_debounce_is_dropped():
+    f = SensorEdgeFilter()
+    assert feed(f, [(0.00, CLEAR), (0.01, BLOCKED), (0.02, CLEAR)], debounce_sec=0.02) == []
+    assert f.level is CLEAR
+    assert f.counters.get("glitches_filtered") == 1
+
+    # A held change is accepted with the original edge time.
+    (edge,) = feed(f, [(0.02, CLEAR), (0.03, BLOCKED), (0.05, BLOCKED)], debounce_sec=0.02)
+    assert edge.timestamp == pytest.approx(0.025)
+
+
+def test_minimum_and_maximum_pulse_limits():
+    f = SensorEdgeFilter()
+    # Blocked for ~100 ms against a 150 ms minimum: not a product.
+    samples = [(0.00, CLEAR), (0.05, BLOCKED), (0.10, BLOCKED), (0.15, CLEAR)]
+    assert feed(f, samples, min_pulse_sec=0.15) == []
+    assert f.counters.get("short_pulses_filtered") == 1
+
+    samples = [(0.15, CLEAR), (0.20, BLOCKED), (0.40, BLOCKED), (0.80, BLOCKED), (0.90, CLEAR)]
+    block, release = feed(f, samples, min_pulse_sec=0.15, max_pulse_sec=0.5)
+    assert block.timestamp == pytest.approx(0.175)
+    assert release.too_long
+    assert f.counters.get("long_pulses") == 1
+
+
+def test_reset_reports_a_release_only_when_blocked():
+    f = SensorEdgeFilter()
+    assert f.reset() is False
+    f.update(BLOCKED, 0.1)
+    assert f.reset() is True
+    assert f.level is CLEAR
@@ -0,0 +1,73 @@
+"""
+Tests for the shared-memory frame ring used by the camera services.
+"""
+import uuid
+
+import pytest
+
+from app.core.frame_transport import SharedFrameRing, pack_frame, unpack_frame
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing.create(f"test_{uuid.uuid4().hex[:8]}", slot_count=4, slot_size=1024)
+    yield ring
+    ring.close()
+
+
+def test_write_then_read_round_trips_payload_and_timestamp(ring):
+    seq = ring.write(b"\xff\xd8frame-1", 12.5)
+    assert seq == 1
+    assert ring.latest_seq() == 1
+    assert ring.read(seq) == (1, 12.5, b"\xff\xd8frame-1")
+    assert ring.read() == (1, 12.5, b"\xff\xd8frame-1")  # Latest by default.
+
+
+def test_reader_attached_by_name_sees_frames(ring):
+    ring.write(b"abc", 1.0)
+    cam_id = ring._shm.name.replace("rpi_counter_frames_", "")
+    reader = SharedFrameRing.attach(cam_id)
+    try:
+        assert reader.read() == (1, 1.0, b"abc")
+    finally:
+        reader.close()
+
+
+def test_lapped_reader_gets_none(ring):
+    first = ring.write(b"old", 1.0)
+    for i in range(ring.slot_count):
+        ring.write(f"new-{i}".encode(), 2.0 + i)
+    # Slot of `first` now holds a newer frame.
+    assert ring.read(first) is None
+    assert ring.read()[2] == f"new-{ring.slot_count - 1}".encode()
+
+
+def test_torn_read_is_discarded(ring):
+    class WriterLapsDuringCopy(SharedFrameRing):
+        def view(self, seq):
+            slot = super().view(seq)
+            # The writer recycles the slot while the reader holds the view.
+            for i in range(self.slot_count):
+                ring.write(b"X" * 10, 9.0)
+            return slot
+
+    seq = ring.write(b"frame", 1.0)
+    reader = WriterLapsDuringCopy(ring._shm, owner=False)
+    assert reader.read(seq) is None
+
+
+def test_oversize_frame_is_rejected(ring):
+    assert ring.write(b"x" * (ring.slot_size + 1), 1.0) is None
+    assert ring.latest_seq() == 0
+    assert ring.write(b"x" * ring.slot_size, 1.0) == 1
+
+
+def test_unknown_sequence_numbers_are_rejected(ring):
+    ring.write(b"a", 1.0)
+    assert ring.read(0) is None
+    assert ring.read(2) is None  # Not written yet.
+
+
+def test_redis_envelope_round_trip_and_bare_jpeg():
+    assert unpack_frame(pack_frame(b"\xff\xd8jpeg", 3.25)) == (3.25, b"\xff\xd8jpeg")
+    assert unpack_frame(b"\xff\xd8bare") == (None, b"\xff\xd8bare")
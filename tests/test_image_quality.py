@@ -0,0 +1,51 @@
+"""
+Tests for burst-capture sharpness scoring.
+"""
+import cv2
+import numpy as np
+
+from app.utils.image_quality import laplacian_variance, select_sharpest, sharpness_score
+from app.utils.jpeg_codec import OpenCvJpegCodec
+
+
+def _checkerboard(size: int = 320, square: int = 16) -> np.ndarray:
+    ys, xs = np.indices((size, size))
+    board = (((ys // square) + (xs // square)) % 2 * 255).astype(np.uint8)
+    return cv2.merge([board, board, board])
+
+
+def _motion_blur(image: np.ndarray, length: int) -> np.ndarray:
+    kernel = np.zeros((length, length), np.float32)
+    kernel[length // 2, :] = 1.0 / length
+    return cv2.filter2D(image, -1, kernel)
+
+
+def test_laplacian_variance_is_zero_for_flat_image():
+    assert laplacian_variance(np.full((64, 64), 128, np.uint8)) == 0.0
+
+
+def test_blur_lowers_sharpness_score():
+    codec = OpenCvJpegCodec()
+    sharp = codec.encode(_checkerboard())
+    blurred = codec.encode(_motion_blur(_checkerboard(), 15))
+    assert sharpness_score(codec, sharp) > sharpness_score(codec, blurred)
+
+
+def test_select_sharpest_picks_unblurred_frame_and_skips_corrupt_ones():
+    codec = OpenCvJpegCodec()
+    frames = [
+        codec.encode(_motion_blur(_checkerboard(), 21)),
+        b"not a jpeg",
+        codec.encode(_checkerboard()),
+        codec.encode(_motion_blur(_checkerboard(), 9)),
+    ]
+    best_index, scores = select_sharpest(codec, frames)
+    assert best_index == 2
+    assert scores[1] is None
+    assert len(scores) == len(frames)
+
+
+def test_select_sharpest_falls_back_to_first_frame_when_nothing_decodes():
+    best_index, scores = select_sharpest(OpenCvJpegCodec(), [b"bad", b"worse"])
+    assert best_index == 0
+    assert scores == [None, None]
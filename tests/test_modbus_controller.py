@@ -0,0 +1,141 @@
+"""
+Tests for the Modbus controller's coil shadow and FC15 batching, using a stub pymodbus client.
+"""
+import asyncio
+import time
+
+import pytest
+from pymodbus.exceptions import ModbusIOException
+
+from app.core.modbus_controller import COIL_COUNT, AsyncModbusController, ModbusTelemetry
+from app.core.modbus_scheduler import TransactionPriority
+
+
+class StubResponse:
+    def __init__(self, bits=None, error=False):
+        self.bits = bits
+        self._error = error
+
+    def isError(self):
+        return self._error
+
+
+class StubClient:
+    """Records coil reads and writes; `device_coils` is what the module reports."""
+
+    def __init__(self):
+        self.calls = []
+        self.device_coils = [False] * COIL_COUNT
+        self.fail_writes = False
+
+    async def connect(self):
+        return True
+
+    def close(self):
+        pass
+
+    async def read_coils(self, address, count, slave):
+        self.calls.append(("read_coils",))
+        return StubResponse(bits=list(self.device_coils))
+
+    async def write_coils(self, address, values, slave):
+        self.calls.append(("write_coils", list(values)))
+        if self.fail_writes:
+            return StubResponse(error=True)
+        self.device_coils = list(values)
+        return StubResponse()
+
+
+@pytest.fixture
+async def controller():
+    controller = AsyncModbusController()
+    controller.client = StubClient()
+    controller._is_connected = True
+    yield controller
+    controller.scheduler.stop()
+
+
+def coils(*on):
+    return [i in on for i in range(COIL_COUNT)]
+
+
+async def test_fc15_frame_is_built_from_the_shadow(controller):
+    controller._coil_shadow, controller._coil_shadow_valid = coils(2), True
+
+    assert await controller.write_outputs({5: True, 2: True})
+    assert await controller.write_outputs({2: False})
+
+    assert controller.client.calls == [("write_coils", coils(2, 5)), ("write_coils", coils(5))]
+    assert controller.get_coil_states() == coils(5)
+
+
+async def test_partial_write_reads_back_only_when_the_shadow_is_unknown(controller):
+    controller.client.device_coils = coils(0, 7)  # Set before we started.
+
+    assert await controller.write_outputs({3: True})
+    assert controller.client.calls == [("read_coils",), ("write_coils", coils(0, 3, 7))]
+
+    controller.client.calls.clear()
+    assert await controller.write_outputs({3: False})
+    assert controller.client.calls == [("write_coils", coils(0, 7))]
+
+
+async def test_full_write_needs_no_read_back(controller):
+    assert not controller.coil_shadow_valid
+
+    assert await controller.write_outputs({address: False for address in range(COIL_COUNT)}, TransactionPriority.EMERGENCY)
+
+    assert controller.client.calls == [("write_coils", coils())]
+    assert controller.coil_shadow_valid
+
+
+async def test_queued_older_write_cannot_undo_a_later_emergency_stop(controller):
+    controller._coil_shadow, controller._coil_shadow_valid = coils(), True
+    gate = asyncio.Event()
+
+    async def busy():
+        await gate.wait()
+
+    busy_future = controller.scheduler.submit(TransactionPriority.STATUS_READ, busy)
+    await asyncio.sleep(0)
+    start_conveyor = asyncio.create_task(controller.write_outputs({0: True, 1: True}))
+    await asyncio.sleep(0)
+    estop = asyncio.create_task(controller.write_outputs({0: False}, TransactionPriority.EMERGENCY))
+    await asyncio.sleep(0)
+    gate.set()
+
+    assert await estop and await start_conveyor
+    await busy_future
+    # The e-stop goes first; the older write then only sends what is still its own (coil 1).
+    assert controller.client.calls == [("write_coils", coils()), ("write_coils", coils(1))]
+    assert controller.get_coil_states()[0] is False
+
+
+async def test_failed_write_invalidates_the_shadow_until_it_is_re_read(controller):
+    controller._coil_shadow, controller._coil_shadow_valid = coils(4), True
+    controller.client.fail_writes = True
+
+    assert not await controller.write_outputs({1: True})
+    assert not controller.coil_shadow_valid
+    assert not controller.is_connected
+    assert controller.get_coil_state(4) is None
+
+    # After reconnecting, a partial write must not trust the old shadow.
+    controller.client.fail_writes = False
+    controller.client.device_coils = coils()  # The module reset during the outage.
+    controller.client.calls.clear()
+    assert await controller.connect()
+    assert await controller.write_outputs({1: True})
+    assert controller.client.calls == [("read_coils",), ("write_coils", coils(1))]
+
+
+def test_poll_interval_survives_failures_of_other_function_codes():
+    telemetry = ModbusTelemetry()
+    telemetry.record_success("fc02_read_discrete_inputs", time.perf_counter())
+    telemetry.record_failure("fc15_write_coils", ModbusIOException("No response received"))
+    assert telemetry._last_input_read_at is not None
+    telemetry.record_success("fc02_read_discrete_inputs", time.perf_counter())
+    assert telemetry.input_poll_interval_ms.snapshot()["count"] == 1
+
+    telemetry.record_failure("fc02_read_discrete_inputs", ModbusIOException("No response received"))
+    assert telemetry._last_input_read_at is None
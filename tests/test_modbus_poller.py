@@ -0,0 +1,149 @@
+"""
+Tests for the Modbus poller's input role engine, driven by a fake controller.
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.modbus_controller import InputSample, ModbusHealthStatus
+from app.core.modbus_poller import AsyncModbusPoller
+from app.core.sensor_events import SensorRole, SensorState, channel_role_map
+
+
+def sensor_config(**channels):
+    values = dict(ENTRY_CHANNEL=1, EXIT_CHANNEL=3, REJECT_CONFIRM_CHANNEL=0, ESTOP_CHANNEL=0, DOOR_INTERLOCK_CHANNEL=0, DEBOUNCE_MS=0)
+    values.update(channels)
+    return SimpleNamespace(**values)
+
+
+class FakeController:
+    """Serves queued input samples; None simulates a lost link."""
+
+    def __init__(self, input_count=8):
+        self.input_count = input_count
+        self.health_status = ModbusHealthStatus.DISCONNECTED
+        self.samples = []
+        self.input_reads = 0
+        self.coil_reads = 0
+        self.coil_read_gate = asyncio.Event()
+        self.coil_read_gate.set()
+
+    def idle(self):
+        return [True] * self.input_count
+
+    async def read_digital_inputs(self):
+        self.input_reads += 1
+        bits = self.samples.pop(0) if self.samples else self.idle()
+        return None if bits is None else InputSample(bits, time.monotonic())
+
+    async def read_coils(self):
+        self.coil_reads += 1
+        await self.coil_read_gate.wait()
+        return [False] * 8
+
+    def get_coil_states(self):
+        return [False] * 8
+
+
+def make_poller(controller, events, **channels):
+    poller = AsyncModbusPoller(controller, events.append, sensor_config(**channels))
+    poller.polling_interval_sec = 0.001
+    return poller
+
+
+async def test_coil_reconcile_runs_beside_the_poll_loop():
+    controller = FakeController()
+    controller.coil_read_gate.clear()  # The coil read hangs behind other bus traffic.
+    poller = make_poller(controller, [])
+    poller.coil_reconcile_interval_sec = 0.0  # Due on every tick.
+
+    poller.start()
+    await asyncio.sleep(0.05)
+    reads_while_blocked = controller.input_reads
+    coil_reads_while_blocked = controller.coil_reads
+    controller.coil_read_gate.set()
+    await asyncio.sleep(0.02)
+    await poller.stop()
+
+    assert reads_while_blocked > 5  # Input polling carried on.
+    assert coil_reads_while_blocked == 1  # No second reconcile while one is in flight.
+    assert controller.coil_reads >= 2
+
+
+def levels(input_count, *low_channels):
+    """Input levels with the given 1-based channels LOW (NPN: triggered)."""
+    return [channel not in low_channels for channel in range(1, input_count + 1)]
+
+
+def feed(poller, *samples):
+    for i, bits in enumerate(samples):
+        poller._process_inputs(bits, sampled_at=float(i))
+
+
+@pytest.mark.parametrize("input_count, high_channel", [(8, 8), (16, 16), (32, 32), (32, 9)])
+def test_roles_on_any_channel_of_8_16_and_32_input_boards(input_count, high_channel):
+    events = []
+    poller = make_poller(FakeController(input_count), events, ENTRY_CHANNEL=1, ESTOP_CHANNEL=high_channel)
+
+    feed(poller, levels(input_count), levels(input_count, high_channel), levels(input_count, 1, high_channel), levels(input_count))
+
+    assert [(e.sensor_id, e.role, e.new_state) for e in events] == [
+        (high_channel, SensorRole.ESTOP, SensorState.TRIGGERED),
+        (1, SensorRole.ENTRY, SensorState.TRIGGERED),
+        (1, SensorRole.ENTRY, SensorState.CLEARED),
+        (high_channel, SensorRole.ESTOP, SensorState.CLEARED),
+    ]
+
+
+def test_estop_on_channel_8_of_8_is_reported_as_held():
+    events = []
+    poller = make_poller(FakeController(8), events, ESTOP_CHANNEL=8, DOOR_INTERLOCK_CHANNEL=7)
+    poller._input_channels = levels(8, 8)
+
+    assert poller.triggered_roles() == [SensorRole.ESTOP]
+    poller._input_channels = levels(8, 3, 7, 8)
+    assert poller.triggered_roles() == [SensorRole.EXIT, SensorRole.DOOR_INTERLOCK, SensorRole.ESTOP]
+
+
+def test_unwatched_channels_do_not_raise_events():
+    events = []
+    poller = make_poller(FakeController(8), events)
+
+    feed(poller, levels(8), levels(8, 2, 4, 8), levels(8))
+
+    assert events == []
+
+
+def test_channels_beyond_the_board_are_ignored():
+    poller = make_poller(FakeController(8), [], ESTOP_CHANNEL=9)
+
+    assert 9 not in poller._channel_roles
+    assert set(poller._channel_roles.values()) == {SensorRole.ENTRY, SensorRole.EXIT}
+
+
+def test_duplicate_channel_assignment_is_rejected():
+    with pytest.raises(ValueError, match="channel 3"):
+        channel_role_map(sensor_config(ESTOP_CHANNEL=3))
+    assert channel_role_map(sensor_config(REJECT_CONFIRM_CHANNEL=0)) == {1: SensorRole.ENTRY, 3: SensorRole.EXIT}
+
+
+async def test_link_loss_clears_triggered_sensors():
+    events = []
+    controller = FakeController(8)
+    controller.samples = [levels(8, 1, 8), None]
+    poller = make_poller(controller, events, ESTOP_CHANNEL=8)
+    poller.coil_reconcile_interval_sec = 60.0
+
+    poller.start()
+    await asyncio.sleep(0.02)
+    await poller.stop()
+
+    assert [(e.sensor_id, e.new_state) for e in events] == [
+        (1, SensorState.TRIGGERED), (8, SensorState.TRIGGERED),
+        (1, SensorState.CLEARED), (8, SensorState.CLEARED),
+    ]
+    assert events[-1].role == SensorRole.ESTOP
+    # Idle samples after the link returns raise no second CLEARED.
+    assert len(events) == 4
@@ -0,0 +1,133 @@
+"""
+Tests for the Modbus bus transaction scheduler, using fake bus operations.
+"""
+import asyncio
+
+import pytest
+
+from app.core.modbus_scheduler import ModbusTransactionScheduler, TransactionPriority
+
+EXPIRED = object()
+
+
+class FakeBus:
+    """Records the operations executed on the 'bus', in order."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    def op(self, name, result=None):
+        async def operation():
+            self.calls.append(name)
+            await self.gate.wait()
+            return name if result is None else result
+        return operation
+
+
+@pytest.fixture
+async def scheduler():
+    scheduler = ModbusTransactionScheduler()
+    yield scheduler
+    scheduler.stop()
+
+
+async def hold_bus(scheduler, bus):
+    """Puts a blocked transaction on the bus so later submissions queue up behind it."""
+    bus.gate.clear()
+    future = scheduler.submit(TransactionPriority.STATUS_READ, bus.op("busy"))
+    await asyncio.sleep(0)
+    assert bus.calls == ["busy"]
+    return future
+
+
+async def test_emergency_runs_before_queued_work(scheduler):
+    bus = FakeBus()
+    busy = await hold_bus(scheduler, bus)
+    futures = [
+        scheduler.submit(TransactionPriority.STATUS_READ, bus.op("status")),
+        scheduler.submit(TransactionPriority.ACTUATOR_WRITE, bus.op("actuator")),
+        scheduler.submit(TransactionPriority.INPUT_POLL, bus.op("poll")),
+        scheduler.submit(TransactionPriority.EMERGENCY, bus.op("estop")),
+    ]
+    bus.gate.set()
+    await asyncio.gather(busy, *futures)
+
+    assert bus.calls == ["busy", "estop", "poll", "actuator", "status"]
+    assert scheduler.counters.snapshot()["executed"] == 5
+
+
+async def test_expired_read_returns_failure_value_without_touching_the_bus(scheduler):
+    bus = FakeBus()
+    busy = await hold_bus(scheduler, bus)
+    read = scheduler.submit(TransactionPriority.INPUT_POLL, bus.op("poll"), failure_value=EXPIRED, deadline_sec=0.01)
+    await asyncio.sleep(0.03)
+    bus.gate.set()
+
+    assert await read is EXPIRED
+    await busy
+    assert bus.calls == ["busy"]
+    assert scheduler.counters.snapshot()["expired"] == 1
+
+
+async def test_shared_reads_resolve_all_waiters_from_one_call(scheduler):
+    bus = FakeBus()
+    busy = await hold_bus(scheduler, bus)
+    reads = [scheduler.submit(TransactionPriority.INPUT_POLL, bus.op(f"read_{i}"), key="read_inputs") for i in range(3)]
+    assert reads[0] is reads[1] is reads[2]
+    bus.gate.set()
+
+    assert await asyncio.gather(*reads) == ["read_0"] * 3
+    await busy
+    assert bus.calls == ["busy", "read_0"]
+    assert scheduler.counters.snapshot()["coalesced"] == 2
+
+
+async def test_shared_read_takes_the_highest_priority_of_its_callers(scheduler):
+    bus = FakeBus()
+    busy = await hold_bus(scheduler, bus)
+    write = scheduler.submit(TransactionPriority.ACTUATOR_WRITE, bus.op("write"))
+    first = scheduler.submit(TransactionPriority.STATUS_READ, bus.op("coils"), key="read_coils")
+    second = scheduler.submit(TransactionPriority.EMERGENCY, bus.op("coils_again"), key="read_coils")
+    bus.gate.set()
+    await asyncio.gather(busy, write, first, second)
+
+    assert bus.calls == ["busy", "coils", "write"]
+
+
+async def test_superseded_write_resolves_with_the_newer_result(scheduler):
+    bus = FakeBus()
+    busy = await hold_bus(scheduler, bus)
+    key = ("write_coil", 3)
+    older = scheduler.submit(TransactionPriority.ACTUATOR_WRITE, bus.op("on"), key=key, merge=ModbusTransactionScheduler.MERGE_SUPERSEDE)
+    newer = scheduler.submit(TransactionPriority.ACTUATOR_WRITE, bus.op("off"), key=key, merge=ModbusTransactionScheduler.MERGE_SUPERSEDE)
+    assert older is not newer
+    bus.gate.set()
+
+    assert await older == "off" and await newer == "off"
+    await busy
+    assert bus.calls == ["busy", "off"]
+
+
+async def test_stop_fails_queued_and_in_flight_work(scheduler):
+    bus = FakeBus()
+    busy = await hold_bus(scheduler, bus)
+    queued = scheduler.submit(TransactionPriority.ACTUATOR_WRITE, bus.op("write"), failure_value=False)
+
+    scheduler.stop()
+
+    assert await asyncio.wait_for(busy, 1) is None  # The in-flight read's failure value.
+    assert await asyncio.wait_for(queued, 1) is False
+    assert bus.calls == ["busy"]
+    assert scheduler.queue_depth() == 0
+
+
+async def test_cancelled_worker_resolves_the_in_flight_transaction(scheduler):
+    bus = FakeBus()
+    busy = await hold_bus(scheduler, bus)
+
+    scheduler._worker_task.cancel()
+
+    assert await asyncio.wait_for(busy, 1) is None
+    assert scheduler.counters.snapshot()["cancelled"] == 1
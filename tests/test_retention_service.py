@@ -0,0 +1,157 @@
+"""
+Tests for the capture retention service against a SQLite catalogue and tmp_path files.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.models import Base, CaptureRecord, DetectionEventLog
+from app.services import retention_service
+from app.services.retention_service import AsyncRetentionService
+
+DiskUsage = namedtuple("DiskUsage", "total used free")
+T0 = datetime(2024, 5, 1, 12, 0, 0)
+
+
+class FakeCatalog:
+    camera_ids = ["usb"]
+
+    def covers(self, camera_id):
+        return True
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'retention.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+@pytest.fixture
+def captures_dir(tmp_path):
+    return tmp_path / "captures"
+
+
+def make_service(session_factory, captures_dir, **kwargs):
+    return AsyncRetentionService(session_factory, FakeCatalog(), captures_dir, codec=None, io_max_mbps=1024, **kwargs)
+
+
+async def add_captures(session_factory, captures_dir, captures, size=100, annotated=False, logged=False):
+    """Writes `size`-byte files for (filename, captured_at) pairs and catalogues them."""
+    (captures_dir / "usb" / "annotated").mkdir(parents=True, exist_ok=True)
+    async with session_factory() as session:
+        for filename, captured_at in captures:
+            (captures_dir / "usb" / filename).write_bytes(b"x" * size)
+            if annotated:
+                (captures_dir / "usb" / "annotated" / filename).write_bytes(b"a" * size)
+            session.add(CaptureRecord(camera_id="usb", filename=filename, captured_at=captured_at, size_bytes=size))
+            if logged:
+                session.add(DetectionEventLog(
+                    run_log_id=1, image_path=f"/captures/usb/{filename}",
+                    annotated_image_path=f"/captures/usb/annotated/{filename}" if annotated else None
+                ))
+        await session.commit()
+
+
+async def catalogued(session_factory):
+    async with session_factory() as session:
+        result = await session.execute(select(CaptureRecord.filename).order_by(CaptureRecord.captured_at))
+        return list(result.scalars().all())
+
+
+async def event_paths(session_factory):
+    async with session_factory() as session:
+        result = await session.execute(select(DetectionEventLog).order_by(DetectionEventLog.id))
+        return [(e.image_path, e.annotated_image_path) for e in result.scalars().all()]
+
+
+def minutes(n):
+    return T0 + timedelta(minutes=n)
+
+
+async def test_size_budget_evicts_oldest_until_under_budget(session_factory, captures_dir):
+    await add_captures(session_factory, captures_dir, [(f"c{i}.jpg", minutes(i)) for i in range(4)])
+    service = make_service(session_factory, captures_dir, max_captures_gb=250 / 1024 ** 3)
+
+    stats = await service.run_once()
+
+    assert stats == {"evicted": 2, "bytes_freed": 200, "cold_deleted": 0}
+    assert await catalogued(session_factory) == ["c2.jpg", "c3.jpg"]
+    assert sorted(p.name for p in (captures_dir / "usb").glob("*.jpg")) == ["c2.jpg", "c3.jpg"]
+
+
+async def test_age_limit_evicts_only_expired_captures(session_factory, captures_dir):
+    now = datetime.now()
+    await add_captures(session_factory, captures_dir, [("old.jpg", now - timedelta(days=3)), ("new.jpg", now)])
+    service = make_service(session_factory, captures_dir, max_age_days=1)
+
+    stats = await service.run_once()
+
+    assert stats["evicted"] == 1
+    assert await catalogued(session_factory) == ["new.jpg"]
+    assert not (captures_dir / "usb" / "old.jpg").exists()
+
+
+async def test_free_space_deficit_is_capped_at_catalogue_size(session_factory, captures_dir, monkeypatch):
+    await add_captures(session_factory, captures_dir, [(f"c{i}.jpg", minutes(i)) for i in range(3)])
+    # A nearly full card: far more to free than the captures take up.
+    monkeypatch.setattr(retention_service.shutil, "disk_usage", lambda path: DiskUsage(10 ** 12, 10 ** 12, 0))
+    service = make_service(session_factory, captures_dir, min_free_percent=10)
+
+    assert await service._bytes_over_budget(["usb"], frees_space=True) == (0, 300)
+    stats = await service.run_once()
+
+    assert stats["evicted"] == 3 and stats["bytes_freed"] == 300
+    assert await catalogued(session_factory) == []
+
+
+async def test_same_device_cold_move_does_not_count_as_freed(session_factory, captures_dir, tmp_path, monkeypatch):
+    await add_captures(session_factory, captures_dir, [(f"c{i}.jpg", minutes(i)) for i in range(3)])
+    monkeypatch.setattr(retention_service.shutil, "disk_usage", lambda path: DiskUsage(10 ** 12, 10 ** 12, 0))
+    cold_dir = tmp_path / "cold"
+    service = make_service(session_factory, captures_dir, max_captures_gb=150 / 1024 ** 3, min_free_percent=10, cold_dir=cold_dir)
+
+    stats = await service.run_once()
+
+    # The budget still moves captures out of the hot tier, but the free-space
+    # target is ignored instead of draining the whole catalogue.
+    assert stats == {"evicted": 2, "bytes_freed": 0, "cold_deleted": 0}
+    assert await catalogued(session_factory) == ["c2.jpg"]
+    assert sorted(p.name for p in (cold_dir / "usb").glob("*.jpg")) == ["c0.jpg", "c1.jpg"]
+
+
+async def test_cross_device_cold_move_frees_space_and_repoints_event_log(session_factory, captures_dir, tmp_path, monkeypatch):
+    await add_captures(session_factory, captures_dir, [("c0.jpg", minutes(0)), ("c1.jpg", minutes(1))], annotated=True, logged=True)
+    monkeypatch.setattr(retention_service, "same_filesystem_sync", lambda a, b: False)
+    cold_dir = tmp_path / "cold"
+    # Hot-tier usage counts originals only, so a 150-byte budget evicts c0 (and its annotated copy).
+    service = make_service(session_factory, captures_dir, max_captures_gb=150 / 1024 ** 3, cold_dir=cold_dir)
+
+    stats = await service.run_once()
+
+    assert stats == {"evicted": 1, "bytes_freed": 200, "cold_deleted": 0}
+    assert (cold_dir / "usb" / "c0.jpg").exists() and (cold_dir / "usb" / "annotated" / "c0.jpg").exists()
+    assert not (captures_dir / "usb" / "c0.jpg").exists()
+    assert await event_paths(session_factory) == [
+        ("/cold/usb/c0.jpg", "/cold/usb/annotated/c0.jpg"),
+        ("/captures/usb/c1.jpg", "/captures/usb/annotated/c1.jpg"),
+    ]
+
+
+async def test_deleted_captures_clear_event_log_paths(session_factory, captures_dir):
+    await add_captures(session_factory, captures_dir, [("c0.jpg", minutes(0)), ("c1.jpg", minutes(1))], annotated=True, logged=True)
+    service = make_service(session_factory, captures_dir, max_captures_gb=150 / 1024 ** 3)
+
+    await service.run_once()
+
+    assert not (captures_dir / "usb" / "annotated" / "c0.jpg").exists()
+    assert await event_paths(session_factory) == [
+        (None, None),
+        ("/captures/usb/c1.jpg", "/captures/usb/annotated/c1.jpg"),
+    ]
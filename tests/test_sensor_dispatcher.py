@@ -0,0 +1,107 @@
+"""
+Tests for the ordered, bounded sensor event dispatcher.
+"""
+import asyncio
+
+import pytest
+
+from app.core.sensor_dispatcher import AsyncSensorEventDispatcher
+from app.core.sensor_events import SensorEvent, SensorRole, SensorState
+
+TRIGGERED, CLEARED = SensorState.TRIGGERED, SensorState.CLEARED
+
+
+def event(sensor_id, new_state, role=SensorRole.ENTRY):
+    return SensorEvent(sensor_id=sensor_id, new_state=new_state, role=role)
+
+
+class RecordingHandler:
+    """Records events; while `gate` is clear, handling blocks (a slow handler)."""
+
+    def __init__(self):
+        self.handled = []
+        self.active = 0
+        self.max_active = 0
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def __call__(self, e):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await self.gate.wait()
+        await asyncio.sleep(0)
+        self.handled.append((e.sensor_id, e.new_state))
+        self.active -= 1
+
+
+@pytest.fixture
+async def handler():
+    return RecordingHandler()
+
+
+@pytest.fixture
+async def dispatcher(handler):
+    dispatcher = AsyncSensorEventDispatcher(handler, max_backlog=3)
+    dispatcher.start()
+    yield dispatcher
+    dispatcher.stop()
+
+
+async def drain(dispatcher, count):
+    """Waits until `count` events have been handled."""
+    while dispatcher.snapshot()["counters"]["dispatched"] < count:
+        await asyncio.sleep(0.001)
+
+
+async def test_events_are_handled_one_at_a_time_in_dispatch_order(dispatcher, handler):
+    sequence = [(1, TRIGGERED), (3, TRIGGERED), (1, CLEARED)]
+    for sensor_id, state in sequence:
+        dispatcher.dispatch(event(sensor_id, state, SensorRole.ENTRY if sensor_id == 1 else SensorRole.EXIT))
+
+    await drain(dispatcher, len(sequence))
+
+    assert handler.handled == sequence
+    assert handler.max_active == 1
+
+
+async def test_full_backlog_drops_new_product_events_but_keeps_safety_events(dispatcher, handler):
+    handler.gate.clear()  # The handler is stuck on the first event.
+    dispatcher.dispatch(event(1, TRIGGERED))
+    await asyncio.sleep(0)
+    assert handler.active == 1
+
+    dispatcher.dispatch(event(3, TRIGGERED, SensorRole.EXIT))
+    dispatcher.dispatch(event(1, CLEARED))
+    dispatcher.dispatch(event(3, CLEARED, SensorRole.EXIT))
+    # The backlog (3) is now full.
+    dispatcher.dispatch(event(1, TRIGGERED))                            # dropped
+    dispatcher.dispatch(event(8, TRIGGERED, SensorRole.ESTOP))          # kept
+    dispatcher.dispatch(event(5, TRIGGERED, SensorRole.REJECT_CONFIRM)) # dropped
+    dispatcher.dispatch(event(7, TRIGGERED, SensorRole.DOOR_INTERLOCK)) # kept
+    snapshot = dispatcher.snapshot()
+    assert snapshot["queue_depth"] == 5 and snapshot["counters"]["dropped"] == 2
+
+    handler.gate.set()
+    await drain(dispatcher, 6)
+
+    assert handler.handled == [
+        (1, TRIGGERED), (3, TRIGGERED), (1, CLEARED), (3, CLEARED), (8, TRIGGERED), (7, TRIGGERED),
+    ]
+    assert dispatcher.snapshot()["max_depth"] == 5
+
+
+async def test_handler_errors_do_not_stop_dispatching(handler):
+    async def failing_handler(e):
+        if e.sensor_id == 1:
+            raise RuntimeError("boom")
+        await handler(e)
+
+    dispatcher = AsyncSensorEventDispatcher(failing_handler)
+    dispatcher.start()
+    dispatcher.dispatch(event(1, TRIGGERED))
+    dispatcher.dispatch(event(3, TRIGGERED, SensorRole.EXIT))
+    await drain(dispatcher, 2)
+    dispatcher.stop()
+
+    assert handler.handled == [(3, TRIGGERED)]
+    assert dispatcher.snapshot()["counters"]["handler_errors"] == 1
@@ -0,0 +1,44 @@
+"""
+Tests for the streaming ZIP generator used by the image download endpoints.
+"""
+import io
+import os
+import zipfile
+
+from app.utils.zip_stream import stream_zip
+
+
+def test_stream_zip_round_trips_files_as_stored_entries(tmp_path):
+    files = []
+    for i in range(3):
+        path = tmp_path / f"capture_{i}.jpg"
+        path.write_bytes(os.urandom(50_000 + i))
+        files.append(path)
+
+    chunks = list(stream_zip([(p, None) for p in files], chunk_size=8192))
+    assert len(chunks) > len(files)  # Data is yielded while files are being read.
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == [p.name for p in files]
+        for path in files:
+            info = archive.getinfo(path.name)
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert info.flag_bits & 0x08  # Sizes and CRC follow the data in a descriptor.
+            assert archive.read(path.name) == path.read_bytes()
+
+
+def test_stream_zip_skips_missing_files_and_honours_arcname(tmp_path):
+    present = tmp_path / "a.jpg"
+    present.write_bytes(b"jpeg-bytes")
+
+    data = b"".join(stream_zip([(tmp_path / "missing.jpg", None), (present, "renamed.jpg")]))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == ["renamed.jpg"]
+        assert archive.read("renamed.jpg") == b"jpeg-bytes"
+
+
+def test_stream_zip_of_nothing_is_a_valid_empty_archive():
+    with zipfile.ZipFile(io.BytesIO(b"".join(stream_zip([])))) as archive:
+        assert archive.namelist() == []
@@ -159,7 +159,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     function switchLiveCamera(camId) {
         activeCameraId = camId;
-        elements.liveCameraFeed.src = `/api/v1/camera/stream/${camId}`;
+        elements.liveCameraFeed.src = `/api/v1/camera/stream/${camId}?width=960&max_fps=15`;
         elements.cameraSelectBtns.forEach(btn => btn.classList.toggle('active', btn.dataset.cameraId === camId));
     }
 
@@ -2,6 +2,7 @@ const galleryContainer = document.getElementById('gallery-container');
 const loader = document.getElementById('loader');
 const cameraId = galleryContainer.dataset.cameraId;
 let currentPage = 1;
+let nextCursor = null;
 let isLoading = false;
 let hasMore = true;
 
@@ -11,18 +12,21 @@ async function loadImages() {
     loader.style.display = 'block';
 
     try {
-        const response = await fetch(`/api/v1/camera/captures/${cameraId}?page=${currentPage}&page_size=12`);
+        const response = await fetch(`/api/v1/camera/captures/${cameraId}?page=${currentPage}&page_size=12` + (nextCursor ? `&cursor=${encodeURIComponent(nextCursor)}` : ''));
         if (!response.ok) throw new Error('Failed to load images');
         const data = await response.json();
         
-        data.images.forEach(imagePath => {
+        data.images.forEach((imagePath, index) => {
+            // Tiles show the small thumbnail; the link still opens the full capture.
+            const thumbPath = (data.thumbnails && data.thumbnails[index]) || imagePath;
             const item = document.createElement('div');
             item.className = 'gallery-item';
-            item.innerHTML = `<a href="${imagePath}" target="_blank"><img src="${imagePath}" loading="lazy"></a>`;
+            item.innerHTML = `<a href="${imagePath}" target="_blank"><img src="${thumbPath}" loading="lazy"></a>`;
             galleryContainer.appendChild(item);
         });
         
         hasMore = data.has_more;
+        nextCursor = data.next_cursor;
         currentPage++;
     } catch (error) {
         console.error('Error loading images:', error);
@@ -8,6 +8,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const CAMERA_ID = 'rpi'; 
 
     let currentPage = 1;
+    let nextCursor = null;
     let isLoading = false;
     let hasMore = true;
 
@@ -17,14 +18,14 @@ document.addEventListener('DOMContentLoaded', () => {
         loader.style.display = 'block';
 
         try {
-            const response = await fetch(`/api/v1/camera/captures/${CAMERA_ID}?page=${currentPage}&page_size=10`);
+            const response = await fetch(`/api/v1/camera/captures/${CAMERA_ID}?page=${currentPage}&page_size=10` + (nextCursor ? `&cursor=${encodeURIComponent(nextCursor)}` : ''));
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             const data = await response.json();
             
             if (data.images.length > 0) {
-                data.images.forEach(imagePath => {
+                data.images.forEach((imagePath, index) => {
                     const galleryItem = document.createElement('div');
         galleryContainer.appendChild(galleryItem); // <--- THIS IS LINE 43, THE CRASH POINT
 
@@ -33,7 +34,8 @@ document.addEventListener('DOMContentLoaded', () => {
                     link.target = '_blank';
 
                     const img = document.createElement('img');
-                    img.src = imagePath;
+                    // Tiles show the small thumbnail; the link still opens the full capture.
+                    img.src = (data.thumbnails && data.thumbnails[index]) || imagePath;
                     img.className = 'img-fluid';
                     img.alt = 'Captured Image';
                     img.loading = 'lazy';
@@ -43,6 +45,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     galleryContainer.appendChild(galleryItem);
                 });
                 hasMore = data.has_more;
+                nextCursor = data.next_cursor;
                 currentPage++;
             } else {
                 hasMore = false;
@@ -37,6 +37,12 @@ document.addEventListener('DOMContentLoaded', () => {
         };
     }
 
+    // Region of interest as [x, y, width, height], or null unless all four fields are filled in.
+    const readRoi = () => {
+        const values = ['x', 'y', 'width', 'height'].map(k => parseFloat(document.getElementById(`camera-profile-roi-${k}`).value));
+        return values.some(isNaN) ? null : values;
+    };
+
     const sendPreviewSettings = async () => {
         const cameraId = previewSelect.value;
         if (!cameraId) return;
@@ -50,6 +56,8 @@ document.addEventListener('DOMContentLoaded', () => {
         };
         
         const payload = Object.fromEntries(Object.entries(settings).filter(([_, v]) => !isNaN(v)));
+        // Without a complete ROI the preview shows the full frame.
+        payload.roi = readRoi() || [0, 0, 1, 1];
         
         try {
             await api.post(`/camera/preview_settings/${cameraId}`, payload);
@@ -154,6 +162,8 @@ document.addEventListener('DOMContentLoaded', () => {
             autofocus: document.getElementById('camera-profile-autofocus').checked,
             description: document.getElementById('camera-profile-desc').value,
         };
+        const roi = readRoi();
+        [data.roi_x, data.roi_y, data.roi_width, data.roi_height] = roi || [null, null, null, null];
         const promise = id ? api.put(`/profiles/camera/${id}`, data) : api.post('/profiles/camera', data);
         try {
             await promise;